@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark the simple query fast path on a realistic query mix.
+
+The mix has ``--simple`` simple queries (single words, quoted phrases,
+``keyword:value`` and SPIRES ``find keyword value``) and otherwise
+generated queries of 2 to 6 terms.  Every query is parsed by the
+converters with and without :mod:`~invenio_query_parser.fastpath`, and
+the trees are checked to be equal.
+
+Usage: ``python -m benchmarks.fastpath [--queries N] [--simple RATIO]
+[--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import random
+
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter
+from invenio_query_parser.generator import QueryGenerator
+
+from .suite import metadata, summarize, timer
+
+CONVERTERS = {
+    'invenio': InvenioSyntaxConverter,
+    'spires': SpiresToInvenioSyntaxConverter,
+}
+
+
+def query_mix(grammar, count, simple, seed):
+    """Return ``count`` queries, a ``simple`` fraction of them simple."""
+    chooser = random.Random(seed)
+    generator = QueryGenerator(seed)
+    queries = []
+    for _ in range(count):
+        if chooser.random() < simple:
+            query = next(generator.generate(1, grammar, 1))
+            if chooser.random() < 0.2:
+                query = '"%s"' % query.split()[-1]
+        else:
+            query = next(generator.generate(1, grammar,
+                                            chooser.randint(2, 6)))
+        queries.append(query)
+    return queries
+
+
+def measure(converter, queries):
+    latencies, trees = [], []
+    for query in queries:
+        start = timer()
+        try:
+            tree = converter.parse_query(query)
+        except SyntaxError:
+            tree = None
+        latencies.append(timer() - start)
+        trees.append(tree)
+    return latencies, trees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--simple', type=float, default=0.7,
+                        help='fraction of simple queries')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    data = {'meta': metadata(), 'results': {}}
+    print('%-8s %8s %12s %12s %10s %10s %8s' % (
+        'grammar', 'path', 'queries/s', 'mean us', 'p50 us', 'p95 us',
+        'fast'))
+    for grammar in sorted(CONVERTERS):
+        queries = query_mix(grammar, args.queries, args.simple, args.seed)
+        converter = CONVERTERS[grammar]()
+        converter.config.warmup()
+        fast = sum(converter.fast_path(query) is not None
+                   for query in queries)
+        full = CONVERTERS[grammar]()
+        full.fast_path = None
+        results = {}
+        reference = None
+        for name, instance in (('full', full), ('fast', converter)):
+            latencies, trees = measure(instance, queries)
+            if reference is None:
+                reference = trees
+            elif trees != reference:
+                raise AssertionError('The fast path changed a tree')
+            result = summarize(latencies)
+            del result['samples_us']
+            result['throughput'] = len(latencies) / sum(latencies)
+            result['fast_ratio'] = fast / float(len(queries))
+            results[name] = result
+            print('%-8s %8s %12.0f %12.1f %10.1f %10.1f %8s' % (
+                grammar, name, result['throughput'], result['mean_us'],
+                result['p50_us'], result['p95_us'],
+                '%.0f%%' % (100 * result['fast_ratio'])
+                if name == 'fast' else '-'))
+        data['results'][grammar] = results
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
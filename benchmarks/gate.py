@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Fail when the benchmark suite got slower than a baseline revision.
+
+Benchmark timings of one process move together: frequency scaling,
+cache state or another process on the machine slow a whole run down.
+The stages of :mod:`benchmarks.suite` are therefore timed in ``--runs``
+independent processes, alternating between the baseline and the current
+tree, and the median latency of each stage in each run is kept.  A
+stage regresses when the median of its run medians grew by more than
+``--threshold`` and by more than ``--min-delta`` microseconds, and a
+one-sided exact Mann-Whitney U test of the run medians is significant
+at ``--alpha``; the command then exits with status 1.  With 5 runs per
+side the smallest p-value is 1/252, so use at least 5 runs.  It exits
+with status 3 when a stage was only measured on one side.
+
+Stages are compared by name: each side benchmarks its own corpus, so
+queries added to the tests do not break the gate.
+
+Baselines depend on the machine, so none is committed.  CI measures the
+merge base on the same machine::
+
+    python -m benchmarks.gate --base $(git merge-base origin/master HEAD)
+
+Run medians may also be stored with ``--save`` and compared later with
+``--baseline FILE`` (and ``--current FILE``).
+
+Usage: ``python -m benchmarks.gate (--base REV | --baseline FILE)
+[--current FILE] [--save FILE] [--runs 5] [--threshold 0.15]
+[--min-delta 5] [--alpha 0.01]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+def _u_counts(n1, n2):
+    """Return the number of orderings of two samples giving each U."""
+    # counts[i][j][u]: orderings of i and j values with statistic u.
+    counts = [[[1] for _ in range(n2 + 1)]]
+    for i in range(1, n1 + 1):
+        row = [[1]]
+        for j in range(1, n2 + 1):
+            # The largest value comes from the first sample, above the j
+            # values of the second one, or from the second sample.
+            first, second = counts[i - 1][j], row[j - 1]
+            size = max(len(first) + j, len(second))
+            merged = [0] * size
+            for u, count in enumerate(first):
+                merged[u + j] += count
+            for u, count in enumerate(second):
+                merged[u] += count
+            row.append(merged)
+        counts.append(row)
+    return counts[n1][n2]
+
+
+def mann_whitney(current, baseline):
+    """Return the p-value of ``current`` being larger than ``baseline``.
+
+    The exact distribution of the U statistic is used, which suits the
+    few run medians compared; ties count for one half.
+    """
+    u = sum(1.0 if new > old else 0.5 if new == old else 0.0
+            for new in current for old in baseline)
+    counts = _u_counts(len(current), len(baseline))
+    total = float(sum(counts))
+    return sum(count for value, count in enumerate(counts)
+               if value >= u) / total
+
+
+def compare(current, baseline, threshold, alpha, min_delta):
+    """Return ``(rows, regressed, unchecked)`` comparing run medians.
+
+    ``current`` and ``baseline`` map stage names to the list of their
+    median latencies, one per run, in microseconds.  ``unchecked`` is
+    true when a stage was only measured on one side.
+    """
+    rows = []
+    regressed = unchecked = False
+    for name in sorted(set(current) | set(baseline)):
+        if not current.get(name) or not baseline.get(name):
+            rows.append((name, None, None, None, None, 'MISSING'))
+            unchecked = True
+            continue
+        new, old = current[name], baseline[name]
+        before, after = median(old), median(new)
+        delta = after / before - 1 if before else 0.0
+        p_value = mann_whitney(new, old)
+        if delta > threshold and after - before > min_delta and \
+                p_value < alpha:
+            verdict = 'REGRESSION'
+            regressed = True
+        elif delta < -threshold and before - after > min_delta and \
+                mann_whitney(old, new) < alpha:
+            verdict = 'faster'
+        else:
+            verdict = 'ok'
+        rows.append((name, before, after, delta, p_value, verdict))
+    return rows, regressed, unchecked
+
+
+def report(rows, out=sys.stdout):
+    print('%-16s %11s %11s %8s %9s  %s' % (
+        'stage', 'base p50 us', 'p50 us', 'delta', 'p-value', 'verdict'),
+        file=out)
+    for name, before, after, delta, p_value, verdict in rows:
+        if before is None:
+            print('%-16s %11s %11s %8s %9s  %s' % (
+                name, '-', '-', '-', '-', verdict), file=out)
+        else:
+            print('%-16s %11.1f %11.1f %+7.1f%% %9.2g  %s' % (
+                name, before, after, delta * 100, p_value, verdict),
+                file=out)
+
+
+def run_suite(root, repeat):
+    """Return the stage medians of one suite process run in ``root``."""
+    handle, path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(
+                [sys.executable, '-m', 'benchmarks.suite', '--no-memory',
+                 '--repeat', str(repeat), '--output', path],
+                cwd=root, stdout=devnull)
+        with open(path) as data_file:
+            results = json.load(data_file)['results']
+    finally:
+        os.remove(path)
+    return dict((name, result['p50_us'])
+                for name, result in results.items() if 'p50_us' in result)
+
+
+def export(revision, directory):
+    """Extract the tree of a git ``revision`` into ``directory``."""
+    archive = subprocess.check_output(
+        ['git', 'archive', '--format=tar', revision], cwd=ROOT)
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+def collect(roots, runs, repeat):
+    """Return the run medians of each stage for each tree of ``roots``.
+
+    Runs alternate between the trees so that slow periods of the machine
+    affect all of them alike.
+    """
+    medians = [{} for _ in roots]
+    for _ in range(runs):
+        for root, stages in zip(roots, medians):
+            for name, value in run_suite(root, repeat).items():
+                stages.setdefault(name, []).append(value)
+    return medians
+
+
+def load(path):
+    with open(path) as data_file:
+        return json.load(data_file)['medians']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    baseline = parser.add_mutually_exclusive_group(required=True)
+    baseline.add_argument('--base', metavar='REV',
+                          help='git revision to measure as the baseline')
+    baseline.add_argument('--baseline', metavar='FILE',
+                          help='run medians saved with --save')
+    parser.add_argument('--current', metavar='FILE',
+                        help='run medians saved with --save to check '
+                             'instead of running the suite')
+    parser.add_argument('--save', metavar='FILE',
+                        help='store the run medians of the current tree')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='suite processes per tree')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed passes over the corpus in each run')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='tolerated median slowdown (0.15 is 15%%)')
+    parser.add_argument('--min-delta', type=float, default=5.0,
+                        help='tolerated median slowdown in microseconds')
+    parser.add_argument('--alpha', type=float, default=0.01,
+                        help='significance level of the test')
+    args = parser.parse_args()
+
+    roots = [] if args.current else [ROOT]
+    directory = None
+    try:
+        if args.base:
+            directory = tempfile.mkdtemp()
+            export(args.base, directory)
+            roots.insert(0, directory)
+        measured = collect(roots, args.runs, args.repeat)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+    base = measured.pop(0) if args.base else load(args.baseline)
+    current = load(args.current) if args.current else measured.pop()
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump({'medians': current}, output, indent=0,
+                      sort_keys=True)
+
+    rows, regressed, unchecked = compare(
+        current, base, args.threshold, args.alpha, args.min_delta)
+    report(rows)
+    if regressed:
+        return 1
+    if unchecked:
+        print('some stages were only measured on one side')
+        return 3
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Measure the import time of the parser modules with ``-X importtime``.
+
+Usage: ``python -m benchmarks.importtime [--runs N] [--schema FILE]...
+[--mapping FILE]... [--warmup]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+MODULES = (
+    'invenio_query_parser.parser',
+    'invenio_query_parser.contrib.spires.parser',
+)
+
+PROGRAM = '''
+import json, sys, time
+import invenio_query_parser.config as config
+config.JSON_SCHEMA_PATHS, config.ELASTIC_MAPPINGS_PATHS = json.loads(
+    sys.argv[1])
+start = time.time()
+import {module} as module
+if json.loads(sys.argv[2]):
+    module.warmup()
+sys.stdout.write(repr(time.time() - start))
+'''
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)')
+
+
+def run(module, schemas, mappings, warmup):
+    """Return ``(wall time, {module: (self us, cumulative us)})``."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.getcwd()] + [p for p in [env.get('PYTHONPATH')] if p])
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c',
+         PROGRAM.format(module=module),
+         json.dumps([schemas, mappings]), json.dumps(warmup)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+        universal_newlines=True)
+    out, err = process.communicate()
+    if process.returncode:
+        raise RuntimeError(err)
+    modules = {}
+    for line in err.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)),
+                                       int(match.group(2)))
+    return float(out), modules
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--schema', action='append', default=[])
+    parser.add_argument('--mapping', action='append', default=[])
+    parser.add_argument('--warmup', action='store_true',
+                        help='include warmup() in the wall time')
+    args = parser.parse_args()
+
+    for module in MODULES:
+        runs = [run(module, args.schema, args.mapping, args.warmup)
+                for _ in range(args.runs)]
+        print('%s: %.1f ms wall (median of %d)' % (
+            module, 1000 * median([wall for wall, _ in runs]), args.runs))
+        names = sorted(set(name for _, modules in runs for name in modules
+                           if name.startswith(('invenio_query_parser',
+                                               'pypeg2'))))
+        for name in names:
+            times = [modules[name] for _, modules in runs if name in modules]
+            print('  %-50s self %8d us  cumulative %8d us' % (
+                name, median([t[0] for t in times]),
+                median([t[1] for t in times])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark incremental parsing of queries typed one key at a time.
+
+Queries of growing length are typed character by character.  Once all
+but the last operand is typed, the latency of each further keystroke is
+measured for a parse from scratch with ``parse_query`` and for
+``parse_incremental`` given the state of the previous keystroke.  The
+latter should stay flat as the queries grow.
+
+Usage: ``python -m benchmarks.incremental [--terms N ...] [--repeat N]
+[--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import random
+
+from .suite import metadata, summarize, timer
+from .validation import CONVERTERS
+
+OPERANDS = {
+    'invenio': ['author:ellis', 'title:"dark matter"', 'year:2000->2005',
+                '(higgs or boson)', '-reportnumber:CERN', 'j:Phys.Rev.'],
+    'spires': ['a ellis', 't dark matter', 'date > 2000', 'ellis',
+               'j Phys.Rev.', 'refersto:a witten'],
+}
+
+PREFIXES = {'invenio': '', 'spires': 'find '}
+
+
+def build(grammar, terms, chooser):
+    """Return a query of ``terms`` operands joined by boolean operators."""
+    operands = [chooser.choice(OPERANDS[grammar]) for _ in range(terms)]
+    query = operands[0]
+    for operand in operands[1:]:
+        query += chooser.choice([' and ', ' or ']) + operand
+    return PREFIXES[grammar] + query
+
+
+def keystrokes(converter, query, call, typed):
+    """Return the latencies of typing the end of ``query``."""
+    state = None
+    latencies = []
+    for end in range(1, len(query) + 1):
+        text = query[:end]
+        start = timer()
+        try:
+            if call == 'parse':
+                converter.parse_query(text)
+            else:
+                state = converter.parse_incremental(text, state)
+        except SyntaxError:
+            pass
+        if end > typed:
+            latencies.append(timer() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, nargs='+',
+                        default=[2, 4, 8, 16, 32])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    data = {'meta': metadata(), 'results': {}}
+    print('%-8s %-12s %6s %8s %12s %10s %10s' % (
+        'grammar', 'call', 'terms', 'chars', 'mean us', 'p50 us', 'p95 us'))
+    for grammar in sorted(CONVERTERS):
+        converter = CONVERTERS[grammar]()
+        converter.config.warmup()
+        results = data['results'][grammar] = {}
+        for terms in args.terms:
+            chooser = random.Random(args.seed)
+            queries = [build(grammar, terms, chooser)
+                       for _ in range(args.repeat)]
+            for call in ('parse', 'incremental'):
+                latencies = []
+                for query in queries:
+                    last = max(query.rfind(' and '), query.rfind(' or '))
+                    latencies.extend(keystrokes(converter, query, call, last))
+                result = summarize(latencies)
+                del result['samples_us']
+                result['chars'] = sum(map(len, queries)) // len(queries)
+                results.setdefault(call, {})[terms] = result
+                print('%-8s %-12s %6d %8d %12.1f %10.1f %10.1f' % (
+                    grammar, call, terms, result['chars'], result['mean_us'],
+                    result['p50_us'], result['p95_us']))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Measure the memory cost of parsing and of keeping query trees.
+
+Three modes, all selectable:
+
+``--per-parse``
+    tracemalloc peak bytes and net allocated blocks of each parse.
+``--retained``
+    bytes retained by cached trees, in total and per node type.
+``--soak N``
+    parse ``N`` generated queries and check that the resident set size
+    stays flat; exits with status 1 if it grew more than ``--max-growth``
+    MiB after the first tenth of the run.
+
+Usage: ``python -m benchmarks.memory [--per-parse] [--retained] [--soak
+N]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+
+from invenio_query_parser import ast
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.generator import QueryGenerator
+
+from .suite import corpus, percentile, warmup
+
+
+def rss():
+    """Return the resident set size in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError):
+        # Peak, not current, RSS: only meaningful while it grows.
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def per_parse(converter, queries):
+    """Return the peak bytes and net blocks of each parse."""
+    peaks, blocks = [], []
+    tracemalloc.start()
+    for query in queries:
+        gc.collect()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        blocks_before = sys.getallocatedblocks()
+        tree = converter.parse_query(query)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        del tree
+        gc.collect()
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+    tracemalloc.stop()
+    return peaks, blocks
+
+
+def node_size(node):
+    """Return the bytes of a node, its attribute dictionary and value."""
+    size = sys.getsizeof(node)
+    attributes = getattr(node, '__dict__', None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes)
+    if isinstance(node, ast.Leaf):
+        size += sys.getsizeof(node.value)
+    elif isinstance(node, ast.ListOp):
+        size += sys.getsizeof(node.children)
+    return size
+
+
+def walk(node):
+    yield node
+    if isinstance(node, ast.BinaryOp):
+        for child in (node.left, node.right):
+            for descendant in walk(child):
+                yield descendant
+    elif isinstance(node, ast.UnaryOp):
+        for descendant in walk(node.op):
+            yield descendant
+    elif isinstance(node, ast.ListOp):
+        for child in node.children:
+            for descendant in walk(child):
+                yield descendant
+
+
+def retained(converter, queries):
+    """Return ``(bytes per tree, {node type: (count, bytes)})``."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    trees = [converter.parse_query(query) for query in queries]
+    gc.collect()
+    total = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    types = {}
+    for tree in trees:
+        for node in walk(tree):
+            count, size = types.get(type(node).__name__, (0, 0))
+            types[type(node).__name__] = (count + 1, size + node_size(node))
+    return total / float(len(trees)), types
+
+
+def soak(converter, count, pool, seed, report_every):
+    """Parse ``count`` generated queries, return the RSS samples."""
+    generator = QueryGenerator(seed)
+    queries = [generator.spires(terms=1 + i % 8, depth=i % 3)
+               if i % 2 else generator.invenio(terms=1 + i % 8, depth=i % 3)
+               for i in range(pool)]
+    samples = []
+    for i in range(count):
+        converter.parse_query(queries[i % pool])
+        if i % report_every == 0:
+            samples.append((i, rss()))
+    samples.append((count, rss()))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--per-parse', action='store_true')
+    parser.add_argument('--retained', action='store_true')
+    parser.add_argument('--soak', type=int, default=0, metavar='N',
+                        help='queries parsed by the soak test')
+    parser.add_argument('--pool', type=int, default=5000,
+                        help='distinct generated queries of the soak test')
+    parser.add_argument('--max-growth', type=float, default=8.0,
+                        help='tolerated RSS growth in MiB')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if not (args.per_parse or args.retained or args.soak):
+        args.per_parse = args.retained = True
+
+    warmup()
+    converter = SpiresToInvenioSyntaxConverter()
+    queries = corpus(seed=args.seed)
+    status = 0
+
+    if args.per_parse:
+        peaks, blocks = per_parse(converter, queries)
+        peaks.sort()
+        blocks.sort()
+        print('per parse (%d queries)' % len(queries))
+        print('  peak bytes    p50 %9d  p95 %9d  max %9d' % (
+            percentile(peaks, 50), percentile(peaks, 95), peaks[-1]))
+        print('  net blocks    p50 %9d  p95 %9d  max %9d' % (
+            percentile(blocks, 50), percentile(blocks, 95), blocks[-1]))
+
+    if args.retained:
+        per_tree, types = retained(converter, queries)
+        print('retained per cached tree: %.0f bytes' % per_tree)
+        print('  %-20s %8s %12s %10s' % (
+            'node type', 'nodes', 'bytes', 'per node'))
+        for name, (count, size) in sorted(
+                types.items(), key=lambda item: item[1][1], reverse=True):
+            print('  %-20s %8d %12d %10.1f' % (name, count, size,
+                                               float(size) / count))
+
+    if args.soak:
+        samples = soak(converter, args.soak, args.pool, args.seed,
+                       max(1, args.soak // 50))
+        settled = [size for i, size in samples if i >= args.soak // 10]
+        growth = (settled[-1] - settled[0]) / 1048576.0
+        print('soak: %d parses, rss %.1f -> %.1f MiB (growth %.2f MiB)' % (
+            args.soak, samples[0][1] / 1048576.0, samples[-1][1] / 1048576.0,
+            growth))
+        if growth > args.max_growth:
+            print('RSS grew by more than %.1f MiB' % args.max_growth)
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
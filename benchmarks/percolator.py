@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark percolation of records against many stored queries.
+
+Usage: ``python -m benchmarks.percolator [--queries N] [--records N]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import time
+
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.contrib.spires.percolator import SpiresPercolator
+
+from .predicate import AUTHORS, WORDS, make_records
+
+TEMPLATES = (
+    'title:{word}',
+    'title:{word} and title:{other}',
+    'find a {author} and t {word}',
+    'find t {word} or t {other}',
+    'author:"{author}" and not title:{word}',
+    '{word} {other}',
+    'title:{word} and year:{low}->{high}',
+)
+
+
+def make_queries(count, seed):
+    rnd = random.Random(seed)
+    # A larger vocabulary keeps posting lists realistic.
+    vocabulary = ['%s%d' % (word, i) for word in WORDS for i in range(50)]
+    vocabulary.extend(WORDS)
+    for _ in range(count):
+        low = rnd.randint(1990, 2016)
+        yield rnd.choice(TEMPLATES).format(
+            word=rnd.choice(vocabulary), other=rnd.choice(vocabulary),
+            author=rnd.choice(AUTHORS).split(',')[0],
+            low=low, high=low + rnd.randint(0, 5))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verify', type=int, default=50,
+                        help='records checked against brute force')
+    args = parser.parse_args()
+
+    converter = SpiresToInvenioSyntaxConverter()
+    percolator = SpiresPercolator()
+    trees = {}
+    start = time.time()
+    for query_id, query in enumerate(make_queries(args.queries, args.seed)):
+        trees[query] = trees.get(query) or converter.parse_query(query)
+        percolator.add(query_id, trees[query])
+    print('indexed %d queries in %.1fs (%d unanchored)' % (
+        len(percolator), time.time() - start,
+        percolator.stats()['unanchored']))
+
+    records = make_records(args.records, args.seed)
+    start = time.time()
+    for record in records:
+        percolator.percolate(record)
+    elapsed = time.time() - start
+    stats = percolator.stats()
+    print('records/s:             %10.1f' % (len(records) / elapsed))
+    print('candidates per record: %10.1f' % stats['candidates_per_record'])
+    print('matches per record:    %10.1f' % (
+        float(stats['matches']) / stats['records']))
+
+    queries = percolator._queries
+    start = time.time()
+    for record in records[:args.verify]:
+        expected = set(query_id for query_id, (match, _) in queries.items()
+                       if match(record))
+        assert percolator.percolate(record) == expected
+    if args.verify:
+        print('brute force records/s: %10.1f' % (
+            args.verify / (time.time() - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark compiled record predicates against a naive tree walker.
+
+Usage: ``python -m benchmarks.predicate [--records N] [--seed S]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import re
+import time
+
+from invenio_query_parser import ast
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.contrib.spires.walkers.spires_to_invenio import \
+    SpiresToInvenio
+from invenio_query_parser.walkers.predicate import compile_predicate
+
+QUERIES = (
+    'title:quark',
+    'author:"Ellis, J" and year:2000->2012',
+    'title:/^Gl?uon/ or not author:smith',
+    'find a ellis and t higgs or t plasma',
+    'title:glu* and (year:>2005 or author:\'ellis\')',
+    'quark or gluon or higgs or boson',
+)
+
+WORDS = ('quark', 'gluon', 'higgs', 'boson', 'plasma', 'matter', 'dark',
+         'lattice', 'neutrino', 'collider', 'symmetry', 'flavor')
+AUTHORS = ('Ellis, J', 'Smith, A', 'Ellis, R', 'Okada, H', 'Antipin, O')
+
+
+def make_records(count, seed):
+    rnd = random.Random(seed)
+    return [{
+        'title': ' '.join(rnd.choice(WORDS) for _ in range(5)).capitalize(),
+        'author': rnd.sample(AUTHORS, 2),
+        'year': str(rnd.randint(1990, 2016)),
+    } for _ in range(count)]
+
+
+def _values(record, field):
+    values = record.values() if field is None else [record.get(field)]
+    result = []
+    for value in values:
+        if isinstance(value, list):
+            result.extend(value)
+        elif value is not None:
+            result.append(value)
+    return result
+
+
+def _test(node, record, field):
+    values = _values(record, field)
+    if isinstance(node, ast.RegexValue):
+        return any(re.search(node.value, v) for v in values)
+    if isinstance(node, ast.DoubleQuotedValue):
+        return node.value.lower() in [v.lower() for v in values]
+    if isinstance(node, ast.SingleQuotedValue):
+        return any(node.value.lower() in v.lower() for v in values)
+    if isinstance(node, ast.RangeOp):
+        return any(node.left.value <= v <= node.right.value for v in values)
+    if isinstance(node, ast.GreaterOp):
+        return any(v > node.op.value for v in values)
+    if '*' in node.value:
+        pattern = r'\b%s\b' % r'\w*'.join(
+            re.escape(p) for p in node.value.lower().split('*'))
+        return any(re.search(pattern, v.lower()) for v in values)
+    terms = set(re.findall(r'\w+', node.value.lower()))
+    words = set()
+    for value in values:
+        words.update(re.findall(r'\w+', value.lower()))
+    return terms <= words
+
+
+def naive_match(node, record):
+    """Interpret the tree for every record."""
+    if isinstance(node, ast.AndOp):
+        return naive_match(node.left, record) and \
+            naive_match(node.right, record)
+    if isinstance(node, ast.OrOp):
+        return naive_match(node.left, record) or \
+            naive_match(node.right, record)
+    if isinstance(node, ast.NotOp):
+        return not naive_match(node.op, record)
+    if isinstance(node, ast.KeywordOp):
+        return _test(node.right, record, node.left.value)
+    if isinstance(node, ast.ValueQuery):
+        return _test(node.op, record, None)
+    return True
+
+
+def measure(function, records):
+    start = time.time()
+    matched = sum(1 for record in records if function(record))
+    return len(records) / (time.time() - start), matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.seed)
+    converter = SpiresToInvenioSyntaxConverter()
+    print('%-48s %12s %12s %8s' % ('query', 'naive rec/s', 'compiled',
+                                   'speedup'))
+    for query in QUERIES:
+        tree = converter.parse_query(query).accept(SpiresToInvenio())
+        naive, expected = measure(lambda r: naive_match(tree, r), records)
+        compiled, matched = measure(compile_predicate(tree), records)
+        assert matched == expected, (query, matched, expected)
+        print('%-48s %12.0f %12.0f %7.1fx' % (query, naive, compiled,
+                                              compiled / naive))
+
+
+if __name__ == '__main__':
+    main()
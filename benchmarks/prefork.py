@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Measure the private memory of forked workers.
+
+A master process forks ``--workers`` workers, each parsing generated
+queries as its first requests and then running a full garbage
+collection.  The private (unshared) memory of each worker is read from
+``/proc/self/smaps_rollup`` right after the fork and after the
+requests.  The master is prepared in three ways, each in a fresh
+interpreter:
+
+``cold``
+    imports only; the workers build the parser state themselves.
+``warm``
+    :func:`~invenio_query_parser.prefork.prefork_warmup` without
+    freezing; the collections of the workers un-share its pages.
+``frozen``
+    :func:`~invenio_query_parser.prefork.prefork_warmup` with
+    :func:`gc.freeze`.
+
+Linux only.  Usage: ``python -m benchmarks.prefork [--workers N]
+[--queries N] [--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+from invenio_query_parser.converter import ParseCache
+from invenio_query_parser.generator import QueryGenerator
+
+from .suite import metadata
+
+MODES = ('cold', 'warm', 'frozen')
+
+
+def private_memory():
+    """Return the private memory of this process in KiB."""
+    try:
+        smaps = open('/proc/self/smaps_rollup')
+    except (IOError, OSError):
+        smaps = open('/proc/self/smaps')
+    total = 0
+    with smaps:
+        for line in smaps:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total
+
+
+def queries(count, seed):
+    """Return ``count`` generated queries, half of each grammar."""
+    generator = QueryGenerator(seed)
+    return (list(generator.generate(count // 2, 'invenio')) +
+            list(generator.generate(count - count // 2, 'spires')))
+
+
+def worker(converters, requests, output):
+    start = private_memory()
+    for query in requests:
+        for converter in converters:
+            try:
+                converter.parse_query(query)
+            except SyntaxError:
+                pass
+    gc.collect()
+    os.write(output, json.dumps(
+        {'start': start, 'end': private_memory()}).encode('ascii'))
+
+
+def master(mode, workers, count, seed):
+    """Prepare the master as ``mode`` says and return worker results."""
+    from invenio_query_parser.prefork import prefork_warmup
+    requests = queries(count, seed)
+    if mode == 'cold':
+        from invenio_query_parser.contrib.spires.converter import \
+            SpiresToInvenioSyntaxConverter
+        from invenio_query_parser.converter import InvenioSyntaxConverter
+        cache = ParseCache()
+        converters = [InvenioSyntaxConverter(cache=cache),
+                      SpiresToInvenioSyntaxConverter(cache=cache)]
+    else:
+        # The workers hit the cache seeded with half of their requests.
+        converters = prefork_warmup(requests[::2], cache=ParseCache(),
+                                    freeze=mode == 'frozen')
+    results = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                worker(converters, requests, write)
+            finally:
+                os._exit(0)
+        os.close(write)
+        data = b''
+        while True:
+            chunk = os.read(read, 4096)
+            if not chunk:
+                break
+            data += chunk
+        os.close(read)
+        os.waitpid(pid, 0)
+        results.append(json.loads(data.decode('ascii')))
+    return results
+
+
+def mean(values):
+    return sum(values) / float(len(values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=100,
+                        help='requests of each worker')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        parser.error('os.fork() is not available')
+    if args.mode:
+        print(json.dumps(master(args.mode, args.workers, args.queries,
+                                args.seed)))
+        return
+
+    data = {'meta': metadata(), 'results': {}}
+    print('%7s %14s %14s' % ('master', 'start KiB', 'end KiB'))
+    for mode in MODES:
+        output = subprocess.check_output([
+            sys.executable, '-m', 'benchmarks.prefork', '--mode', mode,
+            '--workers', str(args.workers), '--queries', str(args.queries),
+            '--seed', str(args.seed)])
+        results = json.loads(output.decode('ascii'))
+        data['results'][mode] = results
+        print('%7s %14.0f %14.0f' % (
+            mode, mean([result['start'] for result in results]),
+            mean([result['end'] for result in results])))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
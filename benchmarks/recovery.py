@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark the recovery of malformed queries.
+
+The malformed queries are those of :mod:`benchmarks.validation`.  Each
+is parsed, failing, then recovered, and the recovered trees are checked
+to keep most of the query: the share of ``MalformedQuery`` nodes among
+the leaves of the trees is reported.
+
+Usage: ``python -m benchmarks.recovery [--queries N] [--terms N]
+[--depth N] [--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import random
+
+from invenio_query_parser.ast import BinaryOp, MalformedQuery, UnaryOp
+
+from .suite import metadata, summarize, timer
+from .validation import CONVERTERS, query_sets
+
+
+def leaves(tree):
+    """Yield the leaves of a tree."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinaryOp):
+            stack.extend((node.left, node.right))
+        elif isinstance(node, UnaryOp):
+            stack.append(node.op)
+        else:
+            yield node
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--terms', type=int, default=6)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    data = {'meta': metadata(), 'results': {}}
+    print('%-8s %-8s %10s %12s %10s %10s %10s' % (
+        'grammar', 'call', 'queries', 'mean us', 'p50 us', 'p95 us',
+        'malformed'))
+    for grammar in sorted(CONVERTERS):
+        _, malformed = query_sets(grammar, args.queries, args.terms,
+                                  args.depth, args.seed)
+        converter = CONVERTERS[grammar]()
+        converter.config.warmup()
+        invalid = []
+        for query in malformed:
+            try:
+                converter.parse_query(query)
+            except SyntaxError:
+                invalid.append(query)
+        random.Random(args.seed).shuffle(invalid)
+        results = {}
+        for call in ('parse', 'recover'):
+            latencies, total, bad = [], 0, 0
+            for query in invalid:
+                start = timer()
+                if call == 'parse':
+                    try:
+                        converter.parse_query(query)
+                    except SyntaxError:
+                        pass
+                else:
+                    tree, _ = converter.recover_query(query)
+                latencies.append(timer() - start)
+                if call == 'recover':
+                    for leaf in leaves(tree):
+                        total += 1
+                        bad += isinstance(leaf, MalformedQuery)
+            result = summarize(latencies)
+            del result['samples_us']
+            result['malformed_leaves'] = bad / float(total) if total else 0
+            results[call] = result
+            print('%-8s %-8s %10d %12.1f %10.1f %10.1f %10s' % (
+                grammar, call, len(invalid), result['mean_us'],
+                result['p50_us'], result['p95_us'],
+                '%.1f%%' % (100 * result['malformed_leaves'])
+                if call == 'recover' else '-'))
+        data['results'][grammar] = results
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark parse latency against query size and nesting depth.
+
+Queries come from :class:`~invenio_query_parser.generator.QueryGenerator`.
+For each grammar the median and p95 latency of parsing (``pypeg2.parse``
+and ``PypegConverter``) are reported for growing term counts at a fixed
+depth, and for growing depths at a fixed term count.
+
+Usage: ``python -m benchmarks.scaling [--terms 1,2,4,...] [--depths
+0,1,2,...] [--samples N] [--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+
+from invenio_query_parser.generator import QueryGenerator
+
+from .suite import GRAMMARS, metadata, parse, summarize, timer
+
+
+def curve(grammar_name, points, samples, seed):
+    """Return the latency statistics of each ``(terms, depth)`` point."""
+    grammar, converter = GRAMMARS[grammar_name][:2]
+    converter = converter()
+    results = []
+    for terms, depth in points:
+        generator = QueryGenerator(seed)
+        queries = list(generator.generate(samples, grammar_name, terms,
+                                          depth))
+        latencies = []
+        for query in queries:
+            start = timer()
+            parse(query, grammar, converter)
+            latencies.append(timer() - start)
+        result = summarize(latencies)
+        del result['samples_us']
+        result.update(terms=terms, depth=depth,
+                      length=sum(map(len, queries)) // len(queries))
+        results.append(result)
+    return results
+
+
+def integers(value):
+    return [int(item) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=integers,
+                        default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--depths', type=integers,
+                        default=[0, 1, 2, 4, 8, 16])
+    parser.add_argument('--depth-terms', type=int, default=16,
+                        help='terms of the queries of the depth curve')
+    parser.add_argument('--samples', type=int, default=20,
+                        help='queries per point')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    from invenio_query_parser.contrib.spires.parser import warmup
+    warmup()
+    data = {'meta': metadata(), 'results': {}}
+    for grammar_name in sorted(GRAMMARS):
+        for axis, points in (
+                ('terms', [(terms, 0) for terms in args.terms]),
+                ('depth', [(args.depth_terms, depth)
+                           for depth in args.depths])):
+            results = curve(grammar_name, points, args.samples, args.seed)
+            data['results']['%s.%s' % (grammar_name, axis)] = results
+            print('%s, latency by %s' % (grammar_name, axis))
+            print('%7s %7s %8s %10s %10s' % (
+                'terms', 'depth', 'length', 'p50 us', 'p95 us'))
+            for result in results:
+                print('%7d %7d %8d %10.1f %10.1f' % (
+                    result['terms'], result['depth'], result['length'],
+                    result['p50_us'], result['p95_us']))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Load generator for the parse service.
+
+Starts :mod:`invenio_query_parser.service` on a temporary Unix socket,
+unless ``--address`` names a running one, and opens ``--connections``
+connections.  Each connection keeps up to ``--window`` requests in
+flight.  Queries are drawn from ``--distinct`` generated queries, so
+that a small pool exercises the coalescing of identical requests.
+Throughput and latency percentiles are reported.
+
+Usage: ``python -m benchmarks.service [--connections N] [--requests N]
+[--window N] [--distinct N] [--workers N] [--address PATH|HOST:PORT]
+[--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from invenio_query_parser.generator import QueryGenerator
+
+from .suite import metadata, summarize, timer
+
+
+def requests(count, distinct, seed):
+    """Return ``count`` request bodies drawn from ``distinct`` queries."""
+    generator = QueryGenerator(seed)
+    pool = [{'grammar': 'invenio', 'query': query}
+            for query in generator.generate(distinct - distinct // 2)]
+    pool += [{'grammar': 'spires', 'query': query, 'convert': True}
+             for query in generator.generate(distinct // 2, 'spires')]
+    chooser = random.Random(seed)
+    return [dict(chooser.choice(pool), id=index) for index in range(count)]
+
+
+def connect(address):
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    connection = socket.socket(socket.AF_UNIX)
+    connection.connect(address)
+    return connection
+
+
+def client(address, bodies, window, latencies, errors):
+    """Send ``bodies`` with at most ``window`` of them in flight."""
+    connection = connect(address)
+    slots = threading.Semaphore(window)
+    sent = {}
+
+    def receive():
+        for line in connection.makefile('rb'):
+            response = json.loads(line.decode('utf-8'))
+            latencies.append(timer() - sent.pop(response['id']))
+            if 'error' in response:
+                errors.append(response['error']['type'])
+            slots.release()
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    for body in bodies:
+        slots.acquire()
+        sent[body['id']] = timer()
+        connection.sendall((json.dumps(body) + '\n').encode('utf-8'))
+    connection.shutdown(socket.SHUT_WR)
+    receiver.join()
+    connection.close()
+
+
+def load(address, bodies, connections, window):
+    """Return the latencies, errors and duration of a load run."""
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(
+        address, bodies[index::connections], window, latencies, errors))
+        for index in range(connections)]
+    start = timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, timer() - start
+
+
+def start_service(path, workers):
+    command = [sys.executable, '-m', 'invenio_query_parser.service',
+               '--unix', path]
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command)
+    for _ in range(600):
+        if os.path.exists(path):
+            return process
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('The service did not start')
+
+
+def address_type(value):
+    if os.sep in value:
+        return value
+    from invenio_query_parser.service import tcp_address
+    return tcp_address(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--window', type=int, default=32,
+                        help='requests in flight per connection')
+    parser.add_argument('--distinct', type=int, default=500,
+                        help='distinct queries among the requests')
+    parser.add_argument('--workers', type=int,
+                        help='worker processes of the started service')
+    parser.add_argument('--address', type=address_type,
+                        help='Unix socket path or HOST:PORT of a running '
+                        'service')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    bodies = requests(args.requests, args.distinct, args.seed)
+    process = directory = None
+    address = args.address
+    if address is None:
+        directory = tempfile.mkdtemp()
+        address = os.path.join(directory, 'service.sock')
+        process = start_service(address, args.workers)
+    try:
+        latencies, errors, duration = load(address, bodies,
+                                           args.connections, args.window)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(directory)
+
+    result = summarize(latencies)
+    del result['samples_us']
+    result.update(throughput=len(latencies) / duration,
+                  errors=len(errors), connections=args.connections,
+                  window=args.window, distinct=args.distinct)
+    print('%d requests, %d connections, window %d, %d distinct queries' % (
+        len(latencies), args.connections, args.window, args.distinct))
+    print('throughput %.0f requests/s, %d errors' % (
+        result['throughput'], result['errors']))
+    print('latency p50 %.0f us, p95 %.0f us, p99 %.0f us' % (
+        result['p50_us'], result['p95_us'], result['p99_us']))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'meta': metadata(), 'result': result}, output,
+                      indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark parsing, conversion and printing of both grammars.
+
+Each stage is timed separately over a corpus made of the queries of
+``tests/test_parser.py`` and synthetic long queries from
+:class:`~invenio_query_parser.generator.QueryGenerator`:
+
+* ``<grammar>.parse``: ``pypeg2.parse`` and ``PypegConverter``;
+* ``spires.convert``: ``SpiresToInvenio``;
+* ``<grammar>.repr`` and ``<grammar>.print``: ``TreeRepr`` and
+  ``TreePrinter``.
+
+Throughput, latency percentiles and the peak memory allocated by a
+stage (measured in a separate pass with :mod:`tracemalloc`) are printed
+and optionally written as JSON to compare commits.
+
+With ``--profile`` the grammar rules are profiled over the corpus too,
+see :mod:`invenio_query_parser.profiling`.
+
+Usage: ``python -m benchmarks.suite [--repeat N] [--profile] [--output
+FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from invenio_query_parser import parser as invenio_parser, profiling
+from invenio_query_parser.contrib.spires import parser as spires_parser
+from invenio_query_parser.contrib.spires.walkers import \
+    printer as spires_printer, pypeg_to_ast as spires_pypeg_to_ast, \
+    tree_printer as spires_repr
+from invenio_query_parser.contrib.spires.walkers.spires_to_invenio import \
+    SpiresToInvenio
+from invenio_query_parser.generator import QueryGenerator
+from invenio_query_parser.profiling import profiled
+from invenio_query_parser.walkers import printer, pypeg_to_ast, repr_printer
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+timer = getattr(time, 'perf_counter', time.time)
+
+TEST_PARSER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tests', 'test_parser.py')
+
+PERCENTILES = (50, 95, 99)
+
+GRAMMARS = {
+    'invenio': (invenio_parser.Main, pypeg_to_ast.PypegConverter,
+                repr_printer.TreeRepr, printer.TreePrinter),
+    'spires': (spires_parser.Main, spires_pypeg_to_ast.PypegConverter,
+               spires_repr.TreeRepr, spires_printer.TreePrinter),
+}
+
+
+def test_queries(path=TEST_PARSER):
+    """Return the query strings of the parser tests.
+
+    The test module is read rather than imported as it needs pytest.
+    """
+    with open(path) as source:
+        tree = ast.parse(source.read())
+    queries = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and \
+                [getattr(t, 'id', None) for t in node.targets] == ['queries']:
+            queries.extend(ast.literal_eval(element.elts[0])
+                           for element in node.value.elts)
+    return queries
+
+
+def long_queries(count=5, terms=(10, 25, 50), seed=42):
+    """Return synthetic queries of several sizes for both grammars."""
+    generator = QueryGenerator(seed)
+    queries = []
+    for size in terms:
+        for grammar in ('invenio', 'spires'):
+            queries.extend(generator.generate(count, grammar, size, depth=2))
+    return queries
+
+
+def corpus(count=5, seed=42):
+    """Return the benchmark corpus."""
+    return test_queries() + long_queries(count, seed=seed)
+
+
+def warmup():
+    invenio_parser.warmup()
+    spires_parser.warmup()
+
+
+def parse(query, grammar, converter):
+    return profiling.parse(query, grammar, whitespace="").accept(converter)
+
+
+def percentile(ordered, value):
+    """Return the nearest-rank percentile of sorted values."""
+    index = int(round(value / 100.0 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(function, inputs, repeat, memory=True):
+    """Time ``function`` on each input ``repeat`` times."""
+    latencies = []
+    for _ in range(repeat):
+        for value in inputs:
+            start = timer()
+            function(value)
+            latencies.append(timer() - start)
+    peak = None
+    if memory and tracemalloc is not None:
+        tracemalloc.start()
+        for value in inputs:
+            function(value)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result = summarize(latencies, peak)
+    result['inputs'] = len(inputs)
+    return result
+
+
+def summarize(latencies, peak=None):
+    """Return the statistics of a list of latencies in seconds."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    result = {
+        'count': len(ordered),
+        'throughput': len(ordered) / total if total else None,
+        'mean_us': total / len(ordered) * 1e6,
+        'peak_memory': peak,
+        'samples_us': [round(latency * 1e6, 2) for latency in latencies],
+    }
+    for value in PERCENTILES:
+        result['p%d_us' % value] = percentile(ordered, value) * 1e6
+    return result
+
+
+def stages(queries):
+    """Yield ``(name, function, inputs)`` for each benchmarked stage."""
+    for grammar_name in sorted(GRAMMARS):
+        grammar, converter, repr_class, printer_class = GRAMMARS[grammar_name]
+        converter = converter()
+        trees = []
+        parsed = []
+        for query in queries:
+            try:
+                trees.append(parse(query, grammar, converter))
+            except SyntaxError:
+                continue
+            parsed.append(query)
+        yield ('%s.parse' % grammar_name,
+               lambda q, g=grammar, c=converter: parse(q, g, c), parsed)
+
+        if grammar_name == 'spires':
+            walker = SpiresToInvenio()
+            yield ('spires.convert', lambda t: t.accept(walker), trees)
+            # Convert once: the printers do not know SPIRES operators.
+            trees = [tree.accept(walker) for tree in trees]
+
+        tree_repr = repr_class()
+        yield ('%s.repr' % grammar_name, lambda t, w=tree_repr: t.accept(w),
+               trees)
+        tree_printer = printer_class()
+        printable = []
+        for tree in trees:
+            try:
+                tree.accept(tree_printer)
+            except KeyError:  # TreePrinter lacks some node types.
+                continue
+            printable.append(tree)
+        yield ('%s.print' % grammar_name,
+               lambda t, w=tree_printer: t.accept(w), printable)
+
+
+def profile_rules(queries):
+    """Yield ``(grammar name, profile)`` for a pass over the corpus."""
+    for grammar_name in sorted(GRAMMARS):
+        grammar, converter = GRAMMARS[grammar_name][:2]
+        converter = converter()
+        with profiled() as profile:
+            for query in queries:
+                try:
+                    parse(query, grammar, converter)
+                except SyntaxError:
+                    pass
+        yield grammar_name, profile
+
+
+def metadata():
+    """Describe the environment of a run."""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+            cwd=os.path.dirname(TEST_PARSER)).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def run(queries, repeat=5, names=None, memory=True):
+    """Return the results of every stage matching ``names``."""
+    results = {}
+    for name, function, inputs in stages(queries):
+        if names and not any(name.startswith(n) for n in names):
+            continue
+        if inputs:
+            results[name] = measure(function, inputs, repeat, memory)
+    return {'meta': metadata(), 'results': results}
+
+
+def report(results, out=sys.stdout):
+    print('%-16s %7s %11s %9s %9s %9s %10s' % (
+        'stage', 'inputs', 'ops/s', 'p50 us', 'p95 us', 'p99 us',
+        'peak KiB'), file=out)
+    for name in sorted(results):
+        result = results[name]
+        peak = result['peak_memory']
+        print('%-16s %7d %11.1f %9.1f %9.1f %9.1f %10s' % (
+            name, result['inputs'], result['throughput'], result['p50_us'],
+            result['p95_us'], result['p99_us'],
+            '-' if peak is None else '%.1f' % (peak / 1024.0)), file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timed passes over the corpus')
+    parser.add_argument('--long', type=int, default=5,
+                        help='synthetic queries of each size')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stage', action='append',
+                        help='only run stages starting with this prefix')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip the (slow) tracemalloc pass')
+    parser.add_argument('--profile', action='store_true',
+                        help='print per grammar rule statistics')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    warmup()
+    queries = corpus(args.long, args.seed)
+    data = run(queries, args.repeat, args.stage, args.memory)
+    report(data['results'])
+    if args.profile:
+        for name, profile in profile_rules(queries):
+            print('\n%s' % name)
+            print(profile.table(limit=20))
+            data['results'][name + '.profile'] = profile.as_dict()
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
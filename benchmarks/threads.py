@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Stress the parse, convert and print pipeline from many threads.
+
+One converter per grammar is shared by all threads, as in a threaded
+server.  Generated queries are split between the threads and every
+result is checked against a serial run, so the benchmark fails loudly
+on any cross-thread interference.  Throughput is reported for each
+thread count; on a GIL build it stays flat at best, while a
+free-threaded build (``python3.13t``) should scale with the cores.
+
+Usage: ``python -m benchmarks.threads [--threads 1,2,4,8] [--queries N]
+[--rounds N] [--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+import threading
+
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter
+from invenio_query_parser.generator import QueryGenerator
+
+from .scaling import integers
+from .suite import metadata, timer
+
+CONVERTERS = {
+    'invenio': InvenioSyntaxConverter,
+    'spires': SpiresToInvenioSyntaxConverter,
+}
+
+
+def pipeline(converter, query):
+    """Parse, convert and print a query; errors are results too."""
+    try:
+        tree = converter.parse_query(query)
+        if hasattr(converter, 'to_invenio'):
+            tree = converter.to_invenio(tree)
+        return converter.print_tree(tree)
+    except Exception as error:
+        return '!%s' % type(error).__name__
+
+
+def gil_enabled():
+    """Return whether the interpreter runs with a GIL."""
+    return getattr(sys, '_is_gil_enabled', lambda: True)()
+
+
+def run(converter, queries, expected, threads, rounds):
+    """Return the throughput of ``threads`` threads sharing ``converter``.
+
+    :raises AssertionError: if a result differs from the serial one.
+    """
+    mismatches = []
+    barrier = threading.Event()
+
+    def work(index):
+        barrier.wait()
+        for _ in range(rounds):
+            for position in range(index, len(queries), threads):
+                result = pipeline(converter, queries[position])
+                if result != expected[position]:
+                    mismatches.append((queries[position], result))
+
+    workers = [threading.Thread(target=work, args=(index,))
+               for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    start = timer()
+    barrier.set()
+    for worker in workers:
+        worker.join()
+    elapsed = timer() - start
+    if mismatches:
+        raise AssertionError('%d results differ from the serial run, '
+                             'e.g. %r' % (len(mismatches), mismatches[0]))
+    return len(queries) * rounds / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=integers, default=[1, 2, 4, 8])
+    parser.add_argument('--queries', type=int, default=200,
+                        help='generated queries per grammar')
+    parser.add_argument('--rounds', type=int, default=2,
+                        help='passes of each thread over its queries')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    meta = metadata()
+    meta['gil'] = gil_enabled()
+    data = {'meta': meta, 'results': {}}
+    print('GIL %s' % ('enabled' if meta['gil'] else 'disabled'))
+    for grammar_name in sorted(CONVERTERS):
+        converter = CONVERTERS[grammar_name]()
+        converter.config.warmup()
+        queries = list(QueryGenerator(args.seed).generate(
+            args.queries, grammar_name))
+        expected = [pipeline(converter, query) for query in queries]
+        results = []
+        for threads in args.threads:
+            throughput = run(converter, queries, expected, threads,
+                             args.rounds)
+            results.append({'threads': threads, 'throughput': throughput})
+        data['results'][grammar_name] = results
+        print(grammar_name)
+        print('%7s %12s %8s' % ('threads', 'queries/s', 'speedup'))
+        for result in results:
+            print('%7d %12.1f %7.2fx' % (
+                result['threads'], result['throughput'],
+                result['throughput'] / results[0]['throughput']))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Benchmark the syntax checks run before parsing.
+
+Malformed queries are generated queries with nested groups where one
+parenthesis was dropped or added.  Both the malformed queries and the
+valid ones they come from are parsed with and without
+:mod:`~invenio_query_parser.validation`: the checks should make errors
+cheap without slowing down valid queries.
+
+Usage: ``python -m benchmarks.validation [--queries N] [--terms N]
+[--depth N] [--output FILE]``
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import random
+
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter
+from invenio_query_parser.generator import QueryGenerator
+
+from .suite import metadata, summarize, timer
+
+CONVERTERS = {
+    'invenio': InvenioSyntaxConverter,
+    'spires': SpiresToInvenioSyntaxConverter,
+}
+
+
+def corrupt(query, chooser):
+    """Drop or add a parenthesis in ``query``."""
+    parentheses = [index for index, char in enumerate(query)
+                   if char in '()']
+    if parentheses and chooser.random() < 0.5:
+        index = chooser.choice(parentheses)
+        return query[:index] + query[index + 1:]
+    index = chooser.randint(0, len(query))
+    return query[:index] + chooser.choice('()') + query[index:]
+
+
+def query_sets(grammar, count, terms, depth, seed):
+    """Return valid queries and malformed versions of them."""
+    chooser = random.Random(seed)
+    generator = QueryGenerator(seed)
+    valid = list(generator.generate(count, grammar, terms, depth))
+    return valid, [corrupt(query, chooser) for query in valid]
+
+
+def measure(converter, queries):
+    latencies, errors = [], 0
+    for query in queries:
+        start = timer()
+        try:
+            converter.parse_query(query)
+        except SyntaxError:
+            errors += 1
+        latencies.append(timer() - start)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--terms', type=int, default=6)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    data = {'meta': metadata(), 'results': {}}
+    print('%-8s %-9s %10s %12s %10s %10s %8s' % (
+        'grammar', 'queries', 'checks', 'mean us', 'p50 us', 'p95 us',
+        'errors'))
+    for grammar in sorted(CONVERTERS):
+        valid, malformed = query_sets(grammar, args.queries, args.terms,
+                                      args.depth, args.seed)
+        results = {}
+        for checks in ('off', 'on'):
+            converter = CONVERTERS[grammar]()
+            converter.config.warmup()
+            if checks == 'off':
+                converter.validator = None
+            for name, queries in (('valid', valid),
+                                  ('malformed', malformed)):
+                latencies, errors = measure(converter, queries)
+                result = summarize(latencies)
+                del result['samples_us']
+                result['errors'] = errors
+                results['%s/%s' % (name, checks)] = result
+                print('%-8s %-9s %10s %12.1f %10.1f %10.1f %8d' % (
+                    grammar, name, checks, result['mean_us'],
+                    result['p50_us'], result['p95_us'], errors))
+        data['results'][grammar] = results
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(data, output, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -29,3 +29,8 @@ if sys.version_info[0] == 3:  # pragma: no cover (Python 2/3 specific code)
     string_types = str,
 else:  # pragma: no cover (Python 2/3 specific code)
     string_types = basestring,
+
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover (Python 2.6 specific code)
+    from ordereddict import OrderedDict
@@ -35,3 +35,7 @@ DEFAULT_KEYWORDS = {
 JSON_SCHEMA_PATHS = []
 
 ELASTIC_MAPPINGS_PATHS = []
+
+# Directory caching keywords extracted from the files above.  ``None``
+# uses the default location and an empty string disables the cache.
+KEYWORDS_CACHE_DIR = None
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Resolution of SPIRES keyword aliases to Invenio keywords."""
+
+from __future__ import absolute_import
+
+import threading
+
+from invenio_query_parser import ast
+
+from .config import SPIRES_KEYWORDS
+
+QUOTED_TARGETS = frozenset(['author'])
+"""Invenio keywords whose values are converted to exact phrases."""
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def quote_value(node):
+    """Return ``node`` as a :class:`~ast.DoubleQuotedValue`.
+
+    Surrounding double quotes kept by the SPIRES grammar are stripped
+    rather than quoted again; operators and other values are returned
+    unchanged.
+    """
+    if type(node) != ast.Value:
+        return node
+    value = node.value
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    return ast.DoubleQuotedValue(value)
+
+
+class AliasTable(object):
+
+    """Case insensitive mapping of SPIRES keywords to Invenio keywords.
+
+    The conversion of each keyword is computed once, so converting a
+    :class:`~..ast.SpiresOp` is a single dictionary lookup.
+
+    :param keywords: mapping of SPIRES keywords to Invenio keywords.
+    :param quoted: Invenio keywords whose values become exact phrases.
+    """
+
+    def __init__(self, keywords, quoted=QUOTED_TARGETS):
+        self.keywords = keywords
+        self._table = dict(
+            (alias.lower(), (target, quote_value if target in quoted
+                             else None))
+            for alias, target in keywords.items())
+
+    def __contains__(self, alias):
+        return alias.lower() in self._table
+
+    def __getitem__(self, alias):
+        return self._table[alias.lower()][0]
+
+    def get(self, alias, default=None):
+        """Return the Invenio keyword of ``alias`` or ``default``."""
+        entry = self._table.get(alias.lower())
+        return default if entry is None else entry[0]
+
+    def convert(self, alias, value):
+        """Return a new :class:`~ast.KeywordOp` for ``alias`` and
+        ``value``.
+
+        :raises KeyError: if ``alias`` is not a SPIRES keyword.
+        """
+        target, convert = self._table[alias.lower()]
+        if convert is not None:
+            value = convert(value)
+        return ast.KeywordOp(ast.Keyword(target), value)
+
+
+def alias_table(keywords=None):
+    """Return the shared :class:`AliasTable` of ``keywords``.
+
+    :param keywords: mapping of SPIRES keywords to Invenio keywords,
+        :data:`~.config.SPIRES_KEYWORDS` if ``None``.
+    """
+    if keywords is None:
+        keywords = SPIRES_KEYWORDS
+    key = frozenset(keywords.items())
+    try:
+        return _tables[key]
+    except KeyError:
+        with _tables_lock:
+            return _tables.setdefault(key, AliasTable(keywords))
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Convert SPIRES queries to Invenio queries in bulk.
+
+Reads one query per line from files or from the standard input, gzip
+compressed or not, and writes one JSON object or tab separated record
+per line, in input order::
+
+    spires-to-invenio --output converted.jsonl queries-2015.log.gz
+
+A JSON Lines record holds the ``line`` number, the ``input`` query and
+either its ``output`` Invenio query or an ``error``; a TSV record holds
+the same four fields, with tabs, newlines and backslashes escaped.
+
+Lines are converted in chunks by a pool of worker processes, with a
+bounded number of chunks in flight, so memory use does not depend on
+the input size.  Throughput and failures are reported on the standard
+error.
+
+With ``--checkpoint FILE`` the progress is saved regularly, and when
+interrupted.  Running the same command again resumes after the last
+saved line.  The checkpoint is removed once all the input is converted.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import gzip
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+from invenio_query_parser.metrics import timer
+from invenio_query_parser.walkers.printer import TreePrinter
+
+from .converter import SpiresToInvenioSyntaxConverter
+
+_converter = []
+
+
+def convert_lines(queries):
+    """Return ``(output, error)`` for each query."""
+    if not _converter:
+        converter = SpiresToInvenioSyntaxConverter()
+        converter.printer = TreePrinter()
+        _converter.append(converter)
+    converter = _converter[0]
+    results = []
+    for query in queries:
+        try:
+            results.append((converter.convert_query(query), None))
+        except SyntaxError as error:
+            results.append((None, 'SyntaxError: %s' % error))
+        except Exception as error:
+            results.append((None, '%s: %s' % (type(error).__name__, error)))
+    return results
+
+
+def open_input(path):
+    """Open a file, or the standard input for ``-``, as binary lines.
+
+    Gzip compressed input is recognized by its magic number.
+    """
+    if path == '-':
+        stream = io.open(sys.stdin.fileno(), 'rb', closefd=False)
+    else:
+        stream = io.open(path, 'rb')
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
+
+def read_lines(paths):
+    """Yield the decoded lines of all inputs, without line endings."""
+    for path in paths:
+        stream = open_input(path)
+        try:
+            for line in stream:
+                yield line.decode('utf-8', 'replace').rstrip('\r\n')
+        finally:
+            stream.close()
+
+
+def chunked(lines, size):
+    """Yield lists of at most ``size`` lines."""
+    while True:
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def convert_chunks(chunks, workers):
+    """Yield each chunk and its results, in order.
+
+    At most twice ``workers`` chunks are converted at once; ``workers``
+    0 converts in this process.
+    """
+    if not workers:
+        for chunk in chunks:
+            yield chunk, convert_lines(chunk)
+        return
+    pool = multiprocessing.Pool(workers)
+    pending = collections.deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, pool.apply_async(convert_lines,
+                                                    (chunk, ))))
+            if len(pending) >= 2 * workers:
+                chunk, result = pending.popleft()
+                yield chunk, result.get()
+        while pending:
+            chunk, result = pending.popleft()
+            yield chunk, result.get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def escape(value):
+    """Escape a TSV field."""
+    if value is None:
+        return ''
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n').replace('\r', '\\r')
+
+
+def format_jsonl(number, query, output, error):
+    record = {'line': number, 'input': query}
+    if error is None:
+        record['output'] = output
+    else:
+        record['error'] = error
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def format_tsv(number, query, output, error):
+    return '%d\t%s\t%s\t%s\n' % (number, escape(query), escape(output),
+                                 escape(error))
+
+
+FORMATS = {'jsonl': format_jsonl, 'tsv': format_tsv}
+
+
+class Checkpoint(object):
+
+    """Progress of a conversion saved in a JSON file.
+
+    :param path: file of the checkpoint.
+    :param inputs: input paths of the conversion.
+    """
+
+    def __init__(self, path, inputs):
+        self.path = path
+        self.inputs = list(inputs)
+        self.lines = 0
+        self.failures = 0
+        self.output_bytes = 0
+
+    def load(self):
+        """Read the saved progress, if any, and return whether it exists.
+
+        :raises ValueError: if it belongs to other inputs.
+        """
+        try:
+            with open(self.path) as stream:
+                data = json.load(stream)
+        except (IOError, OSError):
+            return False
+        if data['inputs'] != self.inputs:
+            raise ValueError('Checkpoint %s is for the inputs %s' % (
+                self.path, ' '.join(data['inputs'])))
+        self.lines = data['lines']
+        self.failures = data['failures']
+        self.output_bytes = data['output_bytes']
+        return True
+
+    def save(self):
+        """Write the progress atomically."""
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump({'inputs': self.inputs, 'lines': self.lines,
+                       'failures': self.failures,
+                       'output_bytes': self.output_bytes}, stream)
+        os.rename(temporary, self.path)
+
+    def remove(self):
+        os.remove(self.path)
+
+
+def open_output(path, checkpoint):
+    """Open the output, truncated to the checkpoint if resuming.
+
+    :raises ValueError: if the output lost bytes the checkpoint covers.
+    """
+    if path is None:
+        return io.open(sys.stdout.fileno(), 'wb', closefd=False)
+    if checkpoint is not None and checkpoint.output_bytes:
+        try:
+            size = os.path.getsize(path)
+        except (IOError, OSError):
+            size = 0
+        if size < checkpoint.output_bytes:
+            raise ValueError(
+                'Output %s is shorter than checkpoint %s; remove the '
+                'checkpoint to start over' % (path, checkpoint.path))
+        output = io.open(path, 'r+b')
+        output.truncate(checkpoint.output_bytes)
+        output.seek(checkpoint.output_bytes)
+        return output
+    return io.open(path, 'wb')
+
+
+def report(lines, failures, elapsed, stream=sys.stderr):
+    print('%d lines, %d failures, %.0f lines/s' % (
+        lines, failures, lines / elapsed if elapsed else 0),
+        file=stream)
+
+
+def convert(inputs, output_path=None, output_format='jsonl', workers=None,
+            chunk_size=1000, checkpoint_path=None, progress=5.0,
+            checkpoint_interval=5.0):
+    """Convert all lines of the inputs and return the failure count."""
+    formatter = FORMATS[output_format]
+    checkpoint = None
+    if checkpoint_path is not None:
+        checkpoint = Checkpoint(checkpoint_path, inputs)
+        if checkpoint.load():
+            print('Resuming after line %d' % checkpoint.lines,
+                  file=sys.stderr)
+    lines = read_lines(inputs)
+    number = failures = 0
+    if checkpoint is not None:
+        number, failures = checkpoint.lines, checkpoint.failures
+        for _ in itertools.islice(lines, number):
+            pass
+    output = open_output(output_path, checkpoint)
+    written = checkpoint.output_bytes if checkpoint is not None else 0
+    start = last_report = last_checkpoint = timer()
+    converted = 0
+
+    def save():
+        output.flush()
+        if output_path is not None:
+            os.fsync(output.fileno())
+        checkpoint.lines, checkpoint.failures = number, failures
+        checkpoint.output_bytes = written
+        checkpoint.save()
+
+    try:
+        for chunk, results in convert_chunks(chunked(lines, chunk_size),
+                                             workers):
+            records = []
+            chunk_failures = 0
+            for line, (query, (result, error)) in enumerate(
+                    zip(chunk, results), number + 1):
+                chunk_failures += error is not None
+                records.append(formatter(line, query, result, error))
+            data = ''.join(records).encode('utf-8')
+            output.write(data)
+            # Only lines that reached the output count as converted.
+            number += len(chunk)
+            failures += chunk_failures
+            written += len(data)
+            converted += len(chunk)
+            now = timer()
+            if progress and now - last_report >= progress:
+                report(converted, failures, now - start)
+                last_report = now
+            if checkpoint is not None and \
+                    now - last_checkpoint >= checkpoint_interval:
+                save()
+                last_checkpoint = now
+    except BaseException:
+        if checkpoint is not None:
+            try:
+                save()
+            except (IOError, OSError):
+                # The previous checkpoint still matches a prefix of the
+                # output, which resuming truncates to.
+                pass
+        raise
+    finally:
+        output.flush()
+        if output_path is not None:
+            output.close()
+    if checkpoint is not None and os.path.exists(checkpoint.path):
+        checkpoint.remove()
+    if progress:
+        report(converted, failures, timer() - start)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog='Resuming needs --output: the standard output cannot be '
+        'truncated to the last checkpoint.')
+    parser.add_argument('inputs', nargs='*', default=['-'], metavar='INPUT',
+                        help='query files, gzip compressed or not; - or '
+                        'none for the standard input')
+    parser.add_argument('-o', '--output', help='output file')
+    parser.add_argument('-f', '--format', choices=sorted(FORMATS),
+                        default='jsonl')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='worker processes, the number of CPUs by '
+                        'default; 0 converts in this process')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='lines sent to a worker at once')
+    parser.add_argument('--checkpoint', help='progress file for resuming')
+    parser.add_argument('--progress', type=float, default=5.0,
+                        help='seconds between progress reports, 0 for '
+                        'none')
+    args = parser.parse_args(argv)
+    if args.checkpoint and not args.output:
+        parser.error('--checkpoint needs --output')
+    workers = args.workers
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    try:
+        convert(args.inputs, args.output, args.format, workers,
+                args.chunk_size, args.checkpoint, args.progress)
+    except KeyboardInterrupt:
+        print('Interrupted', file=sys.stderr)
+        return 130
+    except ValueError as error:
+        parser.error(str(error))
+    except (IOError, OSError) as error:
+        print('Error: %s' % error, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -23,23 +23,83 @@
 
 """SPIRES to Invenio query converter."""
 
-from invenio_query_parser.walkers import repr_printer
-
-import pypeg2
+from invenio_query_parser import fastpath, validation
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParserConfig
+from invenio_query_parser.keywords import KeywordSet
 
+from .config import SPIRES_KEYWORDS
+from .incremental import SpiresIncremental
 from .parser import Main
+from .recovery import SpiresRecovery
 from .walkers import pypeg_to_ast
+from .walkers.spires_to_invenio import SpiresToInvenio
+
+
+class SpiresParserConfig(ParserConfig):
+
+    """Keywords recognized by a SPIRES parser instance.
+
+    :param spires_keywords: mapping of SPIRES keywords to Invenio
+        keywords, :data:`~.config.SPIRES_KEYWORDS` if ``None``.
+
+    The other arguments are those of :class:`ParserConfig`.
+    """
+
+    def __init__(self, spires_keywords=None, **kwargs):
+        super(SpiresParserConfig, self).__init__(**kwargs)
+        if spires_keywords is None:
+            spires_keywords = SPIRES_KEYWORDS
+        self.spires_keywords = spires_keywords
+        self.spires_keyword_set = KeywordSet.shared(spires_keywords)
+
+    def keyword_sets(self):
+        keyword_sets = super(SpiresParserConfig, self).keyword_sets()
+        keyword_sets['spires'] = self.spires_keyword_set
+        return keyword_sets
+
+    def warmup(self):
+        from .parser import warmup
+        with self.pinned():
+            warmup()
+
 
+class SpiresToInvenioSyntaxConverter(InvenioSyntaxConverter):
 
-class SpiresToInvenioSyntaxConverter(object):
-    def __init__(self):
+    """Parse SPIRES and Invenio queries.
+
+    :param config: a :class:`SpiresParserConfig`, the default one if
+        ``None``.
+    :param metrics: see :class:`InvenioSyntaxConverter`.
+    :param cache: see :class:`InvenioSyntaxConverter`.
+    """
+
+    grammar = Main
+
+    validator = staticmethod(validation.spires)
+
+    fast_path = staticmethod(fastpath.spires)
+
+    config_class = SpiresParserConfig
+
+    recovery_class = SpiresRecovery
+
+    incremental_class = SpiresIncremental
+
+    def __init__(self, config=None, metrics=None, cache=None):
+        super(SpiresToInvenioSyntaxConverter, self).__init__(
+            config, metrics, cache)
         self.converter = pypeg_to_ast.PypegConverter()
-        self.printer = repr_printer.TreeRepr()
+        self.walker = SpiresToInvenio(self.config.spires_keywords)
+
+    def to_invenio(self, tree):
+        """Replace the SPIRES operators of a tree with Invenio ones."""
+        if self.metrics is not None:
+            return self.metrics.measure('convert', self._to_invenio, tree)
+        return self._to_invenio(tree)
 
-    def parse_query(self, query):
-        """Parse query string using given grammar"""
-        tree = pypeg2.parse(query, Main, whitespace="")
-        return tree.accept(self.converter)
+    def _to_invenio(self, tree):
+        return tree.accept(self.walker)
 
     def convert_query(self, query):
-        return self.parse_query(query).accept(self.printer)
+        return self.print_tree(self.to_invenio(self.parse_query(query)))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Reparse SPIRES queries incrementally."""
+
+from invenio_query_parser import ast
+from invenio_query_parser.incremental import Incremental
+
+from . import parser
+from .ast import SpiresOp
+from .recovery import _FIND
+from .walkers.pypeg_to_ast import assign_implicit_keywords
+
+
+class SpiresIncremental(Incremental):
+
+    """Reparse SPIRES and Invenio queries.
+
+    The implicit keyword of ``find`` queries is carried over from the
+    text before a boundary to the operands after it.
+    """
+
+    def start(self, query):
+        found = _FIND.match(query)
+        if found is None:
+            return False, 0
+        return True, found.end()
+
+    def prefix(self, find):
+        return 'find ' if find else ''
+
+    def children(self, main, find):
+        if isinstance(main.op, parser.FindQuery):
+            return main.op.op.children if find else None
+        if find:
+            return None
+        return super(SpiresIncremental, self).children(main, find)
+
+    def unstable(self, node, tree, find):
+        if not find:
+            return super(SpiresIncremental, self).unstable(node, tree, find)
+        # ``and`` or ``or`` followed by what the grammar cannot read takes
+        # the rest of the query, a lone keyword takes the next word as its
+        # value and so may the operand of ``refersto`` or ``citedby``.
+        while type(tree) in (ast.AndOp, ast.OrOp):
+            if type(tree.right) == ast.EmptyQuery:
+                return True
+            tree = tree.right
+        if type(tree) == ast.NotOp:
+            tree = tree.op
+        if type(tree) == SpiresOp:
+            return self.matches(tree.keyword.value, parser.NestableKeyword)
+        if type(tree) != ast.ValueQuery or type(tree.op) != ast.Value:
+            return False
+        return any(self.matches(tree.op.value, rule) for rule in (
+            parser.SpiresKeywordRule, parser.NestableKeyword))
+
+    def matches(self, text, rule):
+        """Return whether the whole ``text`` matches ``rule``."""
+        things = rule.grammar.thing
+        if not isinstance(things, list):
+            things = [things]
+        for thing in things:
+            found = thing.match(text)
+            if found is not None and found.group(0) == text:
+                return True
+        return False
+
+    def combine(self, tree, keyword, nodes, find):
+        if find:
+            nodes, keyword = assign_implicit_keywords(nodes, keyword)
+        return super(SpiresIncremental, self).combine(
+            tree, keyword, nodes, find)
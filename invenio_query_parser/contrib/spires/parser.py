@@ -26,12 +26,22 @@
 from invenio_query_parser.parser import *
 from invenio_query_parser.parser import _
 
+from invenio_query_parser.keywords import KeywordSet, pinned_keywords
+
 from .config import SPIRES_KEYWORDS
 
+_spires_keywords = KeywordSet.shared(SPIRES_KEYWORDS)
+
+
+def _spires_keyword_set():
+    keyword_set = pinned_keywords('spires')
+    if keyword_set is None:
+        keyword_set = _spires_keywords
+    return keyword_set
+
 
 class SpiresKeywordRule(LeafRule):
-    grammar = attr('value', re.compile(r"(%s)\b" % "|".join(
-        SPIRES_KEYWORDS.keys()), re.I))
+    grammar = attr('value', KeywordRegEx(_spires_keyword_set))
 
 
 class SpiresSimpleValue(LeafRule):
@@ -58,6 +68,10 @@ class SpiresSimpleValueUnit(LeafRule):
 SpiresSimpleValue.grammar = some(SpiresSimpleValueUnit)
 
 
+class SpiresSmartValueRule(object):
+    grammar = attr('value', SpiresSimpleValue), omit(re.compile(".*"))
+
+
 class SpiresSmartValue(UnaryRule):
 
     @classmethod
@@ -66,11 +80,8 @@ class SpiresSmartValue(UnaryRule):
         if not text.strip():
             return text, SyntaxError("Invalid value")
 
-        class Rule(object):
-            grammar = attr('value', SpiresSimpleValue), omit(re.compile(".*"))
-
         try:
-            tree = pypeg2.parse(text, Rule, whitespace="")
+            tree = pypeg2.parse(text, SpiresSmartValueRule, whitespace="")
         except SyntaxError:
             return text, SyntaxError("Expected %r" % cls)
         else:
@@ -123,8 +134,10 @@ class LowerEqualQuery(UnaryRule):
     ]
 
 
-class Find(Keyword):
-    regex = re.compile(r"(find|fin|f)", re.I)
+class Find(LeafRule):
+    # Not a pypeg2 ``Keyword``: every match of a ``Keyword`` registers the
+    # matched spelling in the global ``Keyword.table``.
+    grammar = attr('value', re.compile(r"(find|fin|f)", re.I))
 
 
 class SpiresKeywordQuery(BinaryRule):
@@ -257,3 +270,10 @@ class Main(UnaryRule):
         (omit(_), attr('op', [FindQuery, Query]), omit(_)),
         attr('op', EmptyQueryRule),
     ]
+
+
+def warmup():
+    """Build the keyword matchers now instead of on the first parse."""
+    from invenio_query_parser.parser import warmup
+    warmup()
+    SpiresKeywordRule.grammar.thing.build()
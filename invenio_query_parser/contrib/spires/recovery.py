@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Recover partial trees from malformed SPIRES queries."""
+
+import re
+
+from invenio_query_parser import ast
+from invenio_query_parser.recovery import Recovery
+
+from .ast import SpiresOp
+
+_FIND = re.compile(r'\s*(find|fin|f)\s', re.I | re.U)
+
+
+class SpiresRecovery(Recovery):
+
+    """Recover SPIRES and Invenio queries.
+
+    The operands of ``find`` queries span words and are parsed as
+    ``find`` queries.  As with the grammar, operands without a keyword
+    take the keyword of the previous one: ``find a ellis or smith``.
+    """
+
+    def recover(self, query):
+        found = _FIND.match(query)
+        if found is None:
+            return super(SpiresRecovery, self).recover(query)
+        return self.read(query, found.end(), False, found.group(1) + ' ')
+
+    def assign(self, group, node):
+        if isinstance(node, SpiresOp):
+            group.implicit = node.keyword
+        elif type(node) == ast.ValueQuery and group.implicit is not None:
+            node = SpiresOp(ast.Keyword(group.implicit.value), node.op)
+        return node
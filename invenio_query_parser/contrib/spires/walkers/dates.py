@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Resolve relative date expressions like ``today-2`` to concrete dates."""
+
+import datetime
+import re
+
+from invenio_query_parser import ast
+from invenio_query_parser.contrib.spires.aliases import alias_table
+from invenio_query_parser.visitor import make_visitor
+
+from ..ast import SpiresOp
+
+DATE_KEYWORDS = frozenset([
+    'datecreated',
+    'datemodified',
+    'earliest_date',
+    'year',
+])
+"""Invenio keywords whose values are dates."""
+
+DATE_FORMAT = '%Y-%m-%d'
+
+CACHE_SIZE = 1024
+"""Maximum number of expressions memoized."""
+
+_DATE_EXPRESSION = re.compile(
+    r'^\s*(today|yesterday)\s*(?:([+-])\s*(\d+))?\s*$', re.I)
+
+_OFFSETS = {
+    'today': 0,
+    'yesterday': -1,
+}
+
+_current = (None, None, {})
+"""Clock and day of the memoized expressions, and the expressions."""
+
+
+def resolve_date(expression, clock=datetime.date.today):
+    """Return the date ``expression`` refers to, or ``None``.
+
+    Results are memoized for the last calendar day and clock source
+    used, so the same expression always resolves to the same date within
+    a day.
+    """
+    global _current
+    today = clock()
+    current_clock, day, dates = _current
+    if current_clock != clock or day != today:
+        # A new day (or a new clock) invalidates everything cached so far.
+        dates = {}
+        _current = (clock, today, dates)
+    try:
+        return dates[expression]
+    except KeyError:
+        pass
+
+    match = _DATE_EXPRESSION.match(expression)
+    if match is None:
+        return None
+    name, sign, days = match.groups()
+    offset = _OFFSETS[name.lower()]
+    try:
+        if days:
+            # Huge numbers of digits exceed the int conversion limit.
+            offset += int(days) if sign == '+' else -int(days)
+        date = today + datetime.timedelta(days=offset)
+    except (OverflowError, ValueError):
+        return None
+    if len(dates) >= CACHE_SIZE:
+        dates.clear()
+    date = dates[expression] = date.strftime(DATE_FORMAT)
+    return date
+
+
+class DateResolver(object):
+
+    """Replace relative dates in date keyword values with concrete dates.
+
+    A bare expression becomes a one day :class:`~ast.RangeOp`, while
+    comparison operators keep their type and get the resolved date.
+    """
+
+    visitor = make_visitor()
+
+    def __init__(self, clock=datetime.date.today):
+        self.clock = clock
+        self.aliases = alias_table()
+
+    def _is_date_keyword(self, keyword):
+        value = keyword.value
+        return self.aliases.get(value, value) in DATE_KEYWORDS
+
+    def _resolve_value(self, node):
+        if type(node) == ast.Value:
+            return resolve_date(node.value, self.clock)
+
+    def _resolve(self, node):
+        date = self._resolve_value(node)
+        if date is not None:
+            return ast.RangeOp(ast.Value(date), ast.Value(date))
+        if isinstance(node, (ast.GreaterOp, ast.GreaterEqualOp,
+                             ast.LowerOp, ast.LowerEqualOp)):
+            date = self._resolve_value(node.op)
+            if date is not None:
+                return type(node)(ast.Value(date))
+        elif isinstance(node, ast.RangeOp):
+            left = self._resolve_value(node.left)
+            right = self._resolve_value(node.right)
+            if left is not None or right is not None:
+                return type(node)(
+                    ast.Value(left) if left is not None else node.left,
+                    ast.Value(right) if right is not None else node.right,
+                )
+        return node
+
+    # pylint: disable=W0613,E0102
+
+    @visitor(ast.AndOp)
+    def visit(self, node, left, right):
+        return type(node)(left, right)
+
+    @visitor(ast.OrOp)
+    def visit(self, node, left, right):
+        return type(node)(left, right)
+
+    @visitor(ast.KeywordOp)
+    def visit(self, node, left, right):
+        if self._is_date_keyword(left):
+            right = self._resolve(right)
+        return type(node)(left, right)
+
+    @visitor(ast.RangeOp)
+    def visit(self, node, left, right):
+        return type(node)(left, right)
+
+    @visitor(ast.NotOp)
+    def visit(self, node, op):
+        return type(node)(op)
+
+    @visitor(ast.GreaterOp)
+    def visit(self, node, op):
+        return type(node)(op)
+
+    @visitor(ast.LowerOp)
+    def visit(self, node, op):
+        return type(node)(op)
+
+    @visitor(ast.GreaterEqualOp)
+    def visit(self, node, op):
+        return type(node)(op)
+
+    @visitor(ast.LowerEqualOp)
+    def visit(self, node, op):
+        return type(node)(op)
+
+    @visitor(ast.Keyword)
+    def visit(self, node):
+        return type(node)(node.value)
+
+    @visitor(ast.Value)
+    def visit(self, node):
+        return type(node)(node.value)
+
+    @visitor(ast.ValueQuery)
+    def visit(self, node, op):
+        return type(node)(op)
+
+    @visitor(ast.SingleQuotedValue)
+    def visit(self, node):
+        return type(node)(node.value)
+
+    @visitor(ast.DoubleQuotedValue)
+    def visit(self, node):
+        return type(node)(node.value)
+
+    @visitor(ast.RegexValue)
+    def visit(self, node):
+        return type(node)(node.value)
+
+    @visitor(ast.EmptyQuery)
+    def visit(self, node):
+        return type(node)(node.value)
+
+    @visitor(SpiresOp)
+    def visit(self, node, left, right):
+        if self._is_date_keyword(left):
+            right = self._resolve(right)
+        return type(node)(left, right)
+
+    # pylint: enable=W0612,E0102
@@ -31,7 +31,7 @@ from ..ast import SpiresOp
 
 
 class TreePrinter(printer.TreePrinter):
-    visitor = make_visitor(repr_printer.TreePrinter.visitor)
+    visitor = make_visitor(printer.TreePrinter.visitor)
 
     @visitor(SpiresOp)
     def visit(self, node, left, right):
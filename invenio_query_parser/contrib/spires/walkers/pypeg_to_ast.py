@@ -31,6 +31,41 @@ from .. import parser
 from ..ast import SpiresOp
 
 
+def assign_implicit_keyword(implicit_keyword, node):
+    """Return ``node`` with the implicit keyword assigned."""
+    node_type = type(node)
+    if node_type in (ast.AndOp, ast.OrOp):
+        if type(node.right) == ast.ValueQuery:
+            return node_type(node.left, SpiresOp(
+                ast.Keyword(implicit_keyword.value),
+                node.right.op))
+        if type(node.right) == ast.NotOp:
+            return node_type(node.left, assign_implicit_keyword(
+                implicit_keyword, node.right))
+    elif node_type == ast.NotOp and type(node.op) == ast.ValueQuery:
+        return ast.NotOp(SpiresOp(ast.Keyword(implicit_keyword.value),
+                                  node.op.op))
+    return node
+
+
+def assign_implicit_keywords(children, implicit_keyword=None):
+    """Assign the implicit keyword to the ``children`` of a query.
+
+    find author x and y --> find author x and author y
+
+    Return the new children and the keyword in effect after them.
+    """
+    assigned = []
+    for child in children:
+        new_keyword = getattr(child, 'keyword', None)
+        if new_keyword is not None:
+            implicit_keyword = new_keyword
+        if implicit_keyword is not None:
+            child = assign_implicit_keyword(implicit_keyword, child)
+        assigned.append(child)
+    return assigned, implicit_keyword
+
+
 class PypegConverter(pypeg_to_ast.PypegConverter):
     visitor = make_visitor(pypeg_to_ast.PypegConverter.visitor)
 
@@ -94,38 +129,8 @@ class PypegConverter(pypeg_to_ast.PypegConverter):
 
     @visitor(parser.SpiresQuery)
     def visit(self, node, children):
-        # Assign implicit keyword
-        # find author x and y --> find author x and author y
-
-        def assign_implicit_keyword(implicit_keyword, node):
-            """
-            Note: this function has side effects on node content
-            """
-            if type(node) in [ast.AndOp, ast.OrOp] and \
-               type(node.right) == ast.ValueQuery:
-                node.right = SpiresOp(implicit_keyword, node.right.op)
-            if type(node) in [ast.AndOp, ast.OrOp] and \
-               type(node.right) == ast.NotOp:
-                assign_implicit_keyword(implicit_keyword, node.right)
-            if type(node) in [ast.NotOp] and \
-               type(node.op) == ast.ValueQuery:
-                node.op = SpiresOp(implicit_keyword, node.op.op)
-
-        implicit_keyword = None
-        for child in children:
-            new_keyword = getattr(child, 'keyword', None)
-            if new_keyword is not None:
-                implicit_keyword = new_keyword
-            if implicit_keyword is not None:
-                assign_implicit_keyword(implicit_keyword, child)
-
-        # Build the boolean expression, left to right
-        # x and y or z and ... --> ((x and y) or z) and ...
-        tree = children[0]
-        for booleanNode in children[1:]:
-            booleanNode.left = tree
-            tree = booleanNode
-        return tree
+        children = assign_implicit_keywords(children)[0]
+        return pypeg_to_ast.fold(children[0], children[1:])
 
     @visitor(parser.FindQuery)
     def visit(self, node, child):
@@ -24,7 +24,7 @@
 """Implement query printer."""
 
 from invenio_query_parser import ast
-from invenio_query_parser.contrib.spires.config import SPIRES_KEYWORDS
+from invenio_query_parser.contrib.spires.aliases import alias_table
 from invenio_query_parser.visitor import make_visitor
 
 from ..ast import SpiresOp
@@ -33,6 +33,9 @@ from ..ast import SpiresOp
 class SpiresToInvenio(object):
     visitor = make_visitor()
 
+    def __init__(self, keywords=None):
+        self.aliases = alias_table(keywords)
+
     # pylint: disable=W0613,E0102
 
     @visitor(ast.AndOp)
@@ -99,11 +102,12 @@ class SpiresToInvenio(object):
     def visit(self, node):
         return type(node)(node.value)
 
+    @visitor(ast.MalformedQuery)
+    def visit(self, node):
+        return type(node)(node.value)
+
     @visitor(SpiresOp)
     def visit(self, node, left, right):
-        left.value = SPIRES_KEYWORDS[left.value]
-        if left.value is 'author':
-            return ast.KeywordOp(left, ast.DoubleQuotedValue(right.value))
-        return ast.KeywordOp(left, right)
+        return self.aliases.convert(left.value, right)
 
     # pylint: enable=W0612,E0102
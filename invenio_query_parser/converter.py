@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Invenio query converter."""
+
+from __future__ import absolute_import
+
+import threading
+
+from . import fastpath, incremental, keywords, parser, recovery, validation
+from ._compat import OrderedDict
+from .profiling import parse
+from .walkers import pypeg_to_ast, repr_printer
+
+
+class ParserConfig(object):
+
+    """Keywords recognized by a parser instance.
+
+    :param keyword_mapping: keyword mapping as in
+        :data:`~invenio_query_parser.config.DEFAULT_KEYWORDS`.
+    :param json_schema_paths: JSON schemas defining more keywords.
+    :param elastic_mappings_paths: Elasticsearch mappings defining more
+        keywords.
+    :param registry: a :class:`~invenio_query_parser.keywords.KeywordRegistry`
+        to use instead of the arguments above.
+    :param max_depth: maximum nesting of parentheses, see
+        :mod:`~invenio_query_parser.validation`.
+    :param strict_quotes: reject values with an unterminated quote
+        instead of parsing them as plain values.
+    :param malformed: return the partial tree of malformed queries, see
+        :meth:`InvenioSyntaxConverter.recover_query`, instead of raising
+        :exc:`SyntaxError`.
+
+    Without arguments the keywords of the default registry are used.
+    Keyword sets are shared by content
+    (:meth:`~invenio_query_parser.keywords.KeywordSet.shared`), so
+    configurations with the same keywords also share their compiled
+    matchers.
+    """
+
+    def __init__(self, keyword_mapping=None, json_schema_paths=(),
+                 elastic_mappings_paths=(), registry=None,
+                 max_depth=validation.MAX_DEPTH, strict_quotes=False,
+                 malformed=False):
+        if registry is None and (keyword_mapping is not None or
+                                 json_schema_paths or
+                                 elastic_mappings_paths):
+            registry = keywords.KeywordRegistry(
+                keyword_mapping, json_schema_paths, elastic_mappings_paths)
+        self._registry = registry
+        self.max_depth = max_depth
+        self.strict_quotes = strict_quotes
+        self.malformed = malformed
+
+    @property
+    def registry(self):
+        """Registry of the keywords."""
+        if self._registry is None:
+            return keywords.default_registry()
+        return self._registry
+
+    def keyword_sets(self):
+        """Return the keyword sets to pin, by name."""
+        return {'invenio': self.registry.current}
+
+    def pinned(self):
+        """Parse with this configuration until the block exits."""
+        return keywords.pinned_sets(self.keyword_sets())
+
+    def signature(self):
+        """Return a hashable identity of the keyword sets and options."""
+        return (tuple(sorted(self.keyword_sets().items())), self.max_depth,
+                self.strict_quotes, self.malformed)
+
+    def warmup(self):
+        """Build the keyword matchers of this configuration now."""
+        with self.pinned():
+            parser.warmup()
+
+
+class ParseCache(object):
+
+    """Bounded LRU cache of parsed query trees.
+
+    :param maxsize: number of trees kept.
+
+    The walkers never mutate the trees they visit, so a cached tree is
+    shared by all callers.  Trees are cached per grammar and keyword
+    sets: changing the keywords of a configuration makes its entries
+    unreachable, and they are evicted in time.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the tree cached under ``key`` or ``None``."""
+        with self._lock:
+            try:
+                tree = self._trees.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._trees[key] = tree
+            self.hits += 1
+            return tree
+
+    def put(self, key, tree):
+        """Cache ``tree`` under ``key`` and return it."""
+        with self._lock:
+            self._trees.pop(key, None)
+            while len(self._trees) >= self.maxsize:
+                self._trees.popitem(last=False)
+            self._trees[key] = tree
+        return tree
+
+    def clear(self):
+        """Drop all cached trees."""
+        with self._lock:
+            self._trees.clear()
+
+    def __len__(self):
+        return len(self._trees)
+
+    def stats(self):
+        """Return cache metrics."""
+        with self._lock:
+            return {'size': len(self._trees), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class InvenioSyntaxConverter(object):
+
+    """Parse Invenio queries with the keywords of a configuration.
+
+    :param config: a :class:`ParserConfig`, the default one if ``None``.
+    :param metrics: a :class:`~invenio_query_parser.metrics.Metrics`
+        hook recording parse and print latencies and errors.
+    :param cache: a :class:`ParseCache` of the parsed trees, which may be
+        shared by several converters.
+
+    Queries are first checked by :attr:`validator`, see
+    :mod:`~invenio_query_parser.validation`, then simple queries are
+    parsed by :attr:`fast_path`, see :mod:`~invenio_query_parser.fastpath`.
+    Set either to ``None`` to skip it.  Malformed queries are recovered
+    by :attr:`recovery_class`, see :mod:`~invenio_query_parser.recovery`,
+    and queries typed one character at a time are reparsed by
+    :attr:`incremental_class`, see
+    :mod:`~invenio_query_parser.incremental`.
+    """
+
+    grammar = parser.Main
+
+    validator = staticmethod(validation.invenio)
+
+    fast_path = staticmethod(fastpath.invenio)
+
+    config_class = ParserConfig
+
+    recovery_class = recovery.Recovery
+
+    incremental_class = incremental.Incremental
+
+    def __init__(self, config=None, metrics=None, cache=None):
+        self.config = config if config is not None else self.config_class()
+        self.metrics = metrics
+        self.cache = cache
+        self.converter = pypeg_to_ast.PypegConverter()
+        self.printer = repr_printer.TreeRepr()
+
+    def parse_query(self, query):
+        """Parse query string using given grammar"""
+        if self.cache is None:
+            return self._measured_parse(query)
+        key = (self.grammar, query, self.config.signature())
+        tree = self.cache.get(key)
+        if self.metrics is not None:
+            self.metrics.cache_access('parse', tree is not None)
+        if tree is None:
+            tree = self.cache.put(key, self._measured_parse(query))
+        return tree
+
+    def _measured_parse(self, query):
+        if self.metrics is not None:
+            return self.metrics.measure('parse', self._parse, query,
+                                        len(query))
+        return self._parse(query)
+
+    def _parse(self, query):
+        if not self.config.malformed:
+            return self._parse_valid(query)
+        return self.recover_query(query)[0]
+
+    def _parse_valid(self, query):
+        self._validate(query)
+        with self.config.pinned():
+            return self._parse_operand(query)
+
+    def _validate(self, query):
+        if self.validator is not None:
+            error = self.validator(query, self.config.max_depth,
+                                   self.config.strict_quotes)
+            if error is not None:
+                raise error
+
+    def _parse_operand(self, query):
+        if self.fast_path is not None:
+            tree = self.fast_path(query)
+            if tree is not None:
+                return tree
+        return self._parse_text(query).accept(self.converter)
+
+    def _parse_text(self, query):
+        return parse(query, self.grammar, whitespace="")
+
+    def recover_query(self, query):
+        """Parse query string, recovering from syntax errors.
+
+        Return the tree and a list of
+        :class:`~invenio_query_parser.recovery.Diagnostic`, empty if the
+        query is valid.  The parts of a malformed query that the grammar
+        rejects are :class:`~invenio_query_parser.ast.MalformedQuery`
+        nodes of the tree.
+        """
+        try:
+            return self._parse_valid(query), []
+        except SyntaxError:
+            pass
+        recovering = self.recovery_class(self._parse_operand,
+                                         self.config.strict_quotes)
+        with self.config.pinned():
+            return recovering.recover(query)
+
+    def parse_incremental(self, query, state=None):
+        """Parse query string, reusing the parse of a previous one.
+
+        Return an :class:`~invenio_query_parser.incremental.IncrementalState`
+        whose ``tree`` is the tree of ``query``, as returned by
+        :meth:`parse_query`.  Passing it back with the next query, such
+        as the query with one more character typed, reparses only what
+        follows the last operand both queries share.  ``state`` is
+        ignored if it comes from a converter with another grammar or
+        configuration.
+        """
+        key = (self.grammar, self.config.signature())
+        if state is None or state.key != key:
+            state = incremental.IncrementalState(key)
+        try:
+            self._validate(query)
+            reparsing = self.incremental_class(self._parse_text,
+                                               self.converter)
+            with self.config.pinned():
+                tree, checkpoints = reparsing.reparse(
+                    query, state.query, state.checkpoints)
+        except SyntaxError:
+            if not self.config.malformed:
+                raise
+            tree, checkpoints = self.recover_query(query)[0], []
+        return incremental.IncrementalState(key, query, tree, checkpoints)
+
+    def print_tree(self, tree):
+        """Return the representation of a query tree."""
+        if self.metrics is not None:
+            return self.metrics.measure('print', self._print, tree)
+        return self._print(tree)
+
+    def _print(self, tree):
+        return tree.accept(self.printer)
+
+    def convert_query(self, query):
+        return self.print_tree(self.parse_query(query))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Build the trees of the most common simple queries without pypeg2.
+
+Most queries are a single word or quoted phrase, a single
+``keyword:value`` or a SPIRES ``find keyword value``.  Recognizing them
+with one anchored regular expression and building the tree directly is
+much cheaper than letting pypeg2 try every alternative of the grammar.
+
+:func:`invenio` and :func:`spires` return the tree the full parser would
+return, or ``None`` when the query has another shape or is one of the
+corner cases where the grammar behaves differently, e.g. a value looking
+like a range or a SPIRES value starting with ``after``.  Keywords are
+checked with the matchers of the grammar, so the keyword sets pinned for
+the parse apply.
+"""
+
+import re
+
+from . import ast, parser
+
+_WHITESPACE = re.compile(r'\s*')
+
+_INVENIO = re.compile(r'''
+    (?:
+        (?P<keyword>[^\s:]+) \s* : \s*
+    )?
+    (?:
+        "(?P<double>[^"]*)"
+      | '(?P<single>[^']*)'
+      | /(?P<regex>[^/]*)/
+      | (?P<value>[^\s():"'/][^\s():]*)
+    )
+    \s*\Z
+''', re.U | re.X)
+
+_SPIRES_FIND = re.compile(r'''
+    (?:find|fin|f) \s+
+    (?P<keyword>[^\s:()]+) \s+
+    (?P<value>[^\s():<>][^\s()]* (?: \s+ [^\s()]+ )*)
+    \s*\Z
+''', re.I | re.U | re.X)
+
+_SPIRES_NOT_VALUE = re.compile(r'(after|before|\d+[-+]\Z)', re.I | re.U)
+
+_SPIRES_PREFIX = re.compile(r'(find|fin|f)\s', re.I | re.U)
+
+_NESTABLE = re.compile(r'refersto|citedby', re.I)
+
+_OPERATORS = frozenset(['and', 'or', 'not'])
+
+_UNSAFE_FIRST = frozenset('-+|')
+
+
+def _strip(query):
+    """Return the query without the whitespace skipped by ``Main``."""
+    start = _WHITESPACE.match(query).end()
+    return query[start:]
+
+
+def _keyword(rule, text, keyword):
+    """Return whether ``rule`` matches exactly ``keyword`` in ``text``."""
+    found = rule.grammar.thing.match(text)
+    return found is not None and found.group(0) == keyword
+
+
+def _invenio(text):
+    match = _INVENIO.match(text)
+    if match is None:
+        return None
+    keyword, value = match.group('keyword', 'value')
+    # Ranges are tried first: their bounds may start with ' or /.
+    if '->' in (value or match.group('single') or
+                match.group('regex') or ''):
+        return None
+    if value is not None:
+        node = ast.Value(value)
+    elif match.group('double') is not None:
+        node = ast.DoubleQuotedValue(match.group('double'))
+    elif match.group('single') is not None:
+        node = ast.SingleQuotedValue(match.group('single'))
+    else:
+        node = ast.RegexValue(match.group('regex'))
+    if keyword is None:
+        if text[0] in _UNSAFE_FIRST:
+            return None
+        return ast.ValueQuery(node)
+    if parser.NotKeywordValue.grammar.thing.match(text) is not None or \
+            not _keyword(parser.KeywordRule, text, keyword):
+        return None
+    return ast.KeywordOp(ast.Keyword(keyword), node)
+
+
+def invenio(query):
+    """Return the tree of a simple Invenio query, or ``None``."""
+    text = _strip(query)
+    if not text:
+        return ast.EmptyQuery(query)
+    return _invenio(text)
+
+
+def spires(query):
+    """Return the tree of a simple SPIRES or Invenio query, or ``None``."""
+    from .contrib.spires import parser as spires_parser
+    from .contrib.spires.ast import SpiresOp
+
+    text = _strip(query)
+    if not text:
+        return ast.EmptyQuery(query)
+    if _SPIRES_PREFIX.match(text) is None:
+        return _invenio(text)
+    match = _SPIRES_FIND.match(text)
+    if match is None:
+        return None
+    keyword, value = match.group('keyword', 'value')
+    words = value.split()
+    rest = text[match.start('keyword'):]
+    if _SPIRES_NOT_VALUE.match(words[0]) or \
+            _OPERATORS.intersection(word.lower() for word in words) or \
+            _NESTABLE.match(rest) or \
+            not _keyword(spires_parser.SpiresKeywordRule, rest, keyword):
+        return None
+    return SpiresOp(ast.Keyword(keyword), ast.Value(value))
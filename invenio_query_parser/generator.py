@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Seeded generator of synthetic queries.
+
+The queries are sampled from the Invenio and SPIRES grammars using the
+configured keywords, so they exercise the same rules as real queries:
+keyword and bare values, quoted phrases, regular expressions, ranges,
+comparisons, ``find`` prefixes, implicit keywords and nested
+parentheses.  They are meant for load tests and scaling benchmarks::
+
+    generator = QueryGenerator(seed=42)
+    generator.invenio(terms=20, depth=3)
+    generator.spires(terms=5)
+"""
+
+from __future__ import absolute_import
+
+import random
+
+from .config import DEFAULT_KEYWORDS
+from .utils import mapping_keywords
+
+WORDS = ('quark', 'gluon', 'higgs', 'boson', 'plasma', 'lattice', 'dark',
+         'matter', 'neutrino', 'collider', 'symmetry', 'flavor', 'muon',
+         'hadron', 'string', 'brane', 'axion', 'lepton', 'qcd', 'lhc')
+"""Words used in values; none of them is a keyword or an operator."""
+
+NAMES = ('ellis', 'smith', 'okada', 'antipin', 'witten', 'maldacena',
+         'weinberg', 'higgsson', 'gross', 'wilczek')
+
+OPERATORS = {'and': 4, 'or': 3, 'not': 1, 'implicit': 1}
+"""Default weights of the boolean operators; ``not`` stands for
+``and not`` between terms.  SPIRES queries have no implicit operator and
+use ``and`` instead."""
+
+VALUES = {'word': 6, 'phrase': 2, 'quoted': 2, 'wildcard': 1, 'regex': 1,
+          'range': 1, 'compare': 1}
+"""Default weights of the value types.  Invenio queries have no
+comparisons and SPIRES ones no regular expressions."""
+
+_SPIRES_EXCLUDED = frozenset(['refersto', 'citedby'])
+
+
+def _weighted(rnd, weights):
+    total = sum(weights.values())
+    point = rnd.uniform(0, total)
+    for name in sorted(weights):
+        point -= weights[name]
+        if point <= 0:
+            return name
+    return name
+
+
+class QueryGenerator(object):
+
+    """Sample valid queries from the Invenio and SPIRES grammars.
+
+    :param seed: seed of the random generator, queries are reproducible.
+    :param keywords: Invenio keywords, those of
+        :data:`~invenio_query_parser.config.DEFAULT_KEYWORDS` by default.
+    :param spires_keywords: SPIRES keywords, those of
+        :data:`~invenio_query_parser.contrib.spires.config.SPIRES_KEYWORDS`
+        by default.
+    :param operators: weights of the operators, see :data:`OPERATORS`.
+    :param values: weights of the value types, see :data:`VALUES`.
+    :param keyword_ratio: probability for a term to have a keyword;
+        other terms are bare values (implicit keywords).
+    :param nesting: probability for terms to be grouped in parentheses
+        in addition to the groups required by ``depth``.
+    """
+
+    def __init__(self, seed=None, keywords=None, spires_keywords=None,
+                 operators=None, values=None, keyword_ratio=0.7,
+                 nesting=0.2):
+        if keywords is None:
+            keywords = mapping_keywords(DEFAULT_KEYWORDS)
+        if spires_keywords is None:
+            from .contrib.spires.config import SPIRES_KEYWORDS
+            spires_keywords = SPIRES_KEYWORDS
+        self.random = random.Random(seed)
+        self.keywords = sorted(keywords)
+        self.spires_keywords = sorted(
+            k for k in spires_keywords if k.lower() not in _SPIRES_EXCLUDED)
+        self.operators = dict(operators or OPERATORS)
+        self.values = dict(values or VALUES)
+        self.keyword_ratio = keyword_ratio
+        self.nesting = nesting
+
+    def invenio(self, terms=5, depth=0):
+        """Return an Invenio query of ``terms`` terms nested ``depth``
+        parentheses deep."""
+        return self._query(terms, depth, self._invenio_term, {
+            'and': 'and', 'or': 'or', 'not': 'and not', 'implicit': ''})
+
+    def spires(self, terms=5, depth=0):
+        """Return a SPIRES ``find`` query, see :meth:`invenio`."""
+        return 'find ' + self._query(terms, depth, self._spires_term, {
+            'and': 'and', 'or': 'or', 'not': 'and not', 'implicit': 'and'})
+
+    def generate(self, count, grammar='invenio', terms=5, depth=0):
+        """Yield ``count`` queries of the ``'invenio'`` or ``'spires'``
+        grammar."""
+        method = getattr(self, grammar)
+        for _ in range(count):
+            yield method(terms, depth)
+
+    def _query(self, terms, depth, term, operators):
+        rnd = self.random
+        units = []
+        remaining = terms
+        if depth > 0:
+            # One group reaches the requested depth.
+            size = max(1, terms // 2)
+            units.append(
+                '(%s)' % self._query(size, depth - 1, term, operators))
+            remaining -= size
+        while remaining > 0:
+            if depth > 0 and remaining > 1 and rnd.random() < self.nesting:
+                size = rnd.randint(2, remaining)
+                units.append('(%s)' % self._query(size, 0, term, operators))
+                remaining -= size
+            else:
+                units.append(term())
+                remaining -= 1
+        rnd.shuffle(units)
+        parts = [units[0]]
+        for unit in units[1:]:
+            operator = operators[_weighted(rnd, self.operators)]
+            if operator:
+                parts.append(operator)
+            parts.append(unit)
+        return ' '.join(parts)
+
+    def _word(self):
+        return self.random.choice(WORDS)
+
+    def _value(self, kind):
+        rnd = self.random
+        if kind == 'phrase':
+            return '%s %s' % (self._word(), self._word())
+        if kind == 'quoted':
+            return '"%s, %s"' % (rnd.choice(NAMES), rnd.choice('abcjr'))
+        if kind == 'wildcard':
+            return self._word()[:3] + '*'
+        if kind == 'regex':
+            return '/%s.*/' % self._word()[:3]
+        if kind == 'range':
+            year = rnd.randint(1970, 2016)
+            return '%d->%d' % (year, year + rnd.randint(1, 10))
+        if kind == 'compare':
+            return '%s %d' % (rnd.choice(('>', '<', '>=', '<=', 'after',
+                                          'before')),
+                              rnd.randint(1970, 2016))
+        return self._word()
+
+    def _kind(self, excluded):
+        weights = dict((kind, weight) for kind, weight in self.values.items()
+                       if kind not in excluded)
+        return _weighted(self.random, weights or {'word': 1})
+
+    def _invenio_term(self):
+        kind = self._kind(('compare', ))
+        if kind == 'phrase':
+            value = "'%s'" % self._value(kind)
+        else:
+            value = self._value(kind)
+        if self.keywords and self.random.random() < self.keyword_ratio:
+            return '%s:%s' % (self.random.choice(self.keywords), value)
+        return value
+
+    def _spires_term(self):
+        kind = self._kind(('regex', ))
+        value = self._value(kind)
+        if self.random.random() < self.keyword_ratio:
+            return '%s %s' % (self.random.choice(self.spires_keywords), value)
+        # A bare value gets the keyword of the previous term.
+        return value.split()[-1] if kind == 'compare' else value
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Reparse queries incrementally as they are typed.
+
+Search-as-you-type clients send the whole query on every keystroke,
+though only its end changed.
+:meth:`~invenio_query_parser.converter.InvenioSyntaxConverter.parse_incremental`
+returns an :class:`IncrementalState`, which the next call takes back:
+the operands before the last boundary that both queries share are not
+parsed again, only the rest of the query is.
+
+Boundaries are the whitespace between the top-level operands of a
+query, outside of parentheses and quoted values: before ``and b`` and
+``(c or d)`` in ``a and b (c or d)``.  In SPIRES ``find`` queries, where
+values span words, only boolean operators start an operand.  The scan
+stops giving boundaries where an edit could change how the text before
+it is read: after an unterminated quote, a ``keyword:(`` group that
+takes the rest of the query, or a character whose meaning depends on the
+keywords, as for :mod:`~invenio_query_parser.validation`.
+
+The text after a boundary is parsed behind a placeholder operand, and
+its operands are folded onto the tree of the text before it, as
+:func:`~invenio_query_parser.walkers.pypeg_to_ast.fold` does for a
+whole query.
+"""
+
+import re
+
+from . import ast, parser
+from .scanning import AMBIGUOUS, EITHER, NEXT, NOT_KEYWORD, QUOTES, RUN, \
+    VALUE, WORD, WORD_CHAR, is_range
+from .walkers.pypeg_to_ast import fold
+
+_SPACE = re.compile(r'\s*', re.U)
+
+# Operators end words they follow without whitespace, as in ``x:or``.
+_OPERATOR = re.compile(r'(?:\A|\W)(?:and|or|not)\Z|[-+|]\Z', re.I | re.U)
+
+
+class IncrementalState(object):
+
+    """Parse of a query, to pass on to the parse of the next one.
+
+    :ivar query: the query.
+    :ivar tree: its tree.
+    :ivar checkpoints: ``(offset, stable, tree, keyword)`` tuples for the
+        boundaries of the query: the tree of the text before ``offset``,
+        valid while the text before ``stable`` is unchanged, and the
+        implicit SPIRES keyword in effect there.
+    """
+
+    def __init__(self, key=None, query='', tree=None, checkpoints=()):
+        self.key = key
+        self.query = query
+        self.tree = tree
+        self.checkpoints = checkpoints
+
+
+class Incremental(object):
+
+    """Parse queries reusing the checkpoints of a previous query.
+
+    :param parse: function returning the pypeg tree of a query.
+    :param converter: the pypeg to AST converter.
+    """
+
+    placeholder = '0'
+    """Operand standing for the text before a boundary."""
+
+    def __init__(self, parse, converter):
+        self.parse = parse
+        self.converter = converter
+
+    def reparse(self, query, previous='', checkpoints=()):
+        """Return the tree of ``query`` and its checkpoints.
+
+        The ``checkpoints`` of the ``previous`` query are reused up to the
+        last one whose text both queries share.
+        """
+        find, start = self.start(query)
+        kept = list(checkpoints)
+        while kept and query[:kept[-1][1]] != previous[:kept[-1][1]]:
+            kept.pop()
+        if kept:
+            begin, _, tree, keyword = kept[-1]
+        else:
+            begin, tree, keyword = 0, None, None
+        ends = list(self.boundaries(query, max(begin, start), find))
+        ends.append((len(query), None))
+        failed = None
+        try:
+            index = 0
+            while index < len(ends):
+                end, stable = ends[index]
+                index += 1
+                if begin:
+                    text = self.prefix(find) + self.placeholder + \
+                        query[begin:end]
+                else:
+                    text = query[:end]
+                try:
+                    main = self.parse(text)
+                except SyntaxError as error:
+                    if not begin or end < len(query):
+                        raise
+                    # The text before ``begin`` parses on its own and the
+                    # rest does not: the whole query fails the same way.
+                    failed = self.relocate(error, query, text)
+                    break
+                children = self.children(main, find)
+                if children is None:
+                    return self.full(query)
+                nodes = [child.accept(self.converter) for child in children]
+                if stable is not None and \
+                        self.unstable(children[-1], nodes[-1], find):
+                    continue
+                if begin:
+                    if nodes[0] != ast.ValueQuery(ast.Value(self.placeholder)):
+                        return self.full(query)
+                    nodes = nodes[1:]
+                tree, keyword = self.combine(tree, keyword, nodes, find)
+                if stable is not None:
+                    kept.append((end, stable, tree, keyword))
+                begin = end
+        except SyntaxError:
+            return self.full(query)
+        if failed is not None:
+            raise failed
+        return tree, kept
+
+    @staticmethod
+    def relocate(error, query, text):
+        """Return the syntax ``error`` of ``text``, whose end is the end
+        of ``query``, as an error of ``query``."""
+        if error.offset is not None:
+            error.offset += len(query) - len(text)
+        error.text = query
+        return error
+
+    def full(self, query):
+        """Return the tree of ``query`` parsed at once, no checkpoints."""
+        return self.parse(query).accept(self.converter), []
+
+    def start(self, query):
+        """Return whether ``query`` is a SPIRES ``find`` query, and where
+        its operands start."""
+        return False, 0
+
+    def prefix(self, find):
+        """Return the text put before the placeholder."""
+        return ''
+
+    def children(self, main, find):
+        """Return the pypeg operands of a parsed query, or ``None``."""
+        if isinstance(main.op, parser.Query):
+            return main.op.children
+        return None
+
+    def unstable(self, node, tree, find):
+        """Return whether an operand could extend past the end of its text.
+
+        :param node: the pypeg operand.
+        :param tree: its tree.
+        """
+        while not isinstance(node, parser.KeywordQuery):
+            node = getattr(node, 'op', None)
+            if node is None:
+                return False
+        return isinstance(node.right, parser.Query)
+
+    def combine(self, tree, keyword, nodes, find):
+        """Return ``tree`` with the operands ``nodes`` folded onto it, and
+        the implicit keyword after them."""
+        if tree is None:
+            tree, nodes = nodes[0], nodes[1:]
+        return fold(tree, nodes), keyword
+
+    def boundaries(self, query, position, find=False):
+        """Yield the ``(offset, stable)`` boundaries after ``position``."""
+        length = len(query)
+        depth = 0
+        expect = VALUE
+        checked = 0
+        word = position
+        while position < length:
+            char = query[position]
+            if char.isspace():
+                end = _SPACE.match(query, position).end()
+                following = RUN.match(query, end)
+                if depth == 0 and end < length and word < position and \
+                        not _OPERATOR.search(query[word:position]) and \
+                        query[position - 1] != ':' and \
+                        query[end] != ':' and (not find or following.group(
+                            ).lower() in ('and', 'or', 'not')):
+                    yield position, following.end() + 1
+                position = word = end
+                expect = VALUE
+                continue
+            if expect != WORD and position >= checked and \
+                    WORD_CHAR.match(char):
+                found = NOT_KEYWORD.match(query, position)
+                if found is None:
+                    checked = RUN.match(query, position).end()
+                elif AMBIGUOUS.search(query, position, found.end()):
+                    return
+                else:
+                    checked = found.end()
+            if char in QUOTES and expect != WORD:
+                end = query.find(char, position + 1)
+                if find or end == -1 or expect == EITHER or (
+                        char != '"' and is_range(query, position)):
+                    return
+                position = end + 1
+                expect = EITHER
+                continue
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth < 0:
+                    return
+            elif char == ':' and not find and query.startswith(
+                    '(', _SPACE.match(query, position + 1).end()):
+                return
+            expect = NEXT.get(char, WORD)
+            position += 1
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Registry of the keywords recognized by the parser.
+
+The keywords come from a keyword mapping, JSON schemas and Elasticsearch
+mappings.  A :class:`KeywordRegistry` keeps them in an immutable
+:class:`KeywordSet` snapshot which is replaced, never modified, when a
+source is added, removed or changed on disk.  Matchers built by the
+grammar are attached to the snapshot, so a parse running during a reload
+keeps using the keywords it started with and new parses use the new
+ones without restarting the process::
+
+    registry = default_registry()
+    registry.add_schema('/path/to/record.json')
+    registry.watch(interval=5)
+"""
+
+from __future__ import absolute_import
+
+import contextlib
+import threading
+import weakref
+
+from . import utils
+
+_local = threading.local()
+
+_default = []
+_default_lock = threading.Lock()
+
+_shared = weakref.WeakValueDictionary()
+_shared_lock = threading.Lock()
+
+
+class KeywordSet(object):
+
+    """Immutable set of keywords.
+
+    Matchers built from the keywords are cached on the set by
+    :meth:`matcher`.  A set derived from a ``parent`` by adding keywords
+    computes its lowercased keywords from the parent's instead of from
+    scratch.  Use :meth:`shared` to get the same instance, and thus the
+    same matchers, for equal keywords.
+    """
+
+    def __init__(self, keywords, parent=None):
+        self.keywords = frozenset(keywords)
+        self._parent = parent
+        self._lowered = None
+        self._matchers = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, keyword):
+        return keyword in self.keywords
+
+    def __iter__(self):
+        return iter(self.keywords)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __repr__(self):
+        return '<KeywordSet keywords=%d>' % len(self.keywords)
+
+    @classmethod
+    def shared(cls, keywords, parent=None):
+        """Return the live keyword set equal to ``keywords`` or a new one.
+
+        The sets are addressed by their content, so configurations with
+        the same keywords share the keyword set and its matchers.
+        """
+        keywords = frozenset(keywords)
+        with _shared_lock:
+            keyword_set = _shared.get(keywords)
+            if keyword_set is None:
+                keyword_set = cls(keywords, parent)
+                # Key on the set's own copy to avoid keeping two.
+                _shared[keyword_set.keywords] = keyword_set
+            return keyword_set
+
+    @property
+    def lowered(self):
+        """Lowercased keywords, without the empty one."""
+        if self._lowered is None:
+            parent, self._parent = self._parent, None
+            if parent is not None and parent.keywords <= self.keywords:
+                added = self.keywords - parent.keywords
+                lowered = parent.lowered | frozenset(
+                    k.lower() for k in added if k)
+            else:
+                lowered = frozenset(k.lower() for k in self.keywords if k)
+            self._lowered = lowered
+        return self._lowered
+
+    def matcher(self, owner, build):
+        """Return the matcher of ``owner``, calling ``build(self)`` once."""
+        try:
+            return self._matchers[owner]
+        except KeyError:
+            with self._lock:
+                if owner not in self._matchers:
+                    self._matchers[owner] = build(self)
+                return self._matchers[owner]
+
+
+class KeywordRegistry(object):
+
+    """Keywords of a keyword mapping, JSON schemas and ES mappings.
+
+    :param keyword_mapping: dictionary whose keys, and the keys of its
+        dictionary values, are keywords.
+    :param json_schema_paths: JSON schema files.
+    :param elastic_mappings_paths: Elasticsearch mapping files.
+
+    Only the sources whose modification time or size changed are read
+    again by :meth:`refresh`.  Callbacks registered with
+    :meth:`subscribe` are called with the new :class:`KeywordSet` each
+    time the keywords change, so caches of parse results can be dropped.
+    """
+
+    def __init__(self, keyword_mapping=None, json_schema_paths=(),
+                 elastic_mappings_paths=()):
+        self._lock = threading.RLock()
+        self._mapping = frozenset(
+            utils.mapping_keywords(keyword_mapping or {}))
+        self._sources = {}
+        self._listeners = []
+        self._watcher = None
+        self.version = 0
+        self.current = KeywordSet.shared(self._mapping)
+        with self._lock:
+            for path in json_schema_paths:
+                self._sources[('schema', path)] = None
+            for path in elastic_mappings_paths:
+                self._sources[('mapping', path)] = None
+            self.refresh()
+
+    @property
+    def keywords(self):
+        """Keywords of the current snapshot."""
+        return self.current.keywords
+
+    def add_schema(self, path):
+        """Add the keywords of a JSON schema."""
+        return self._add('schema', path)
+
+    def add_mapping(self, path):
+        """Add the keywords of an Elasticsearch mapping."""
+        return self._add('mapping', path)
+
+    def _add(self, kind, path):
+        with self._lock:
+            self._sources.setdefault((kind, path), None)
+            return self.refresh()
+
+    def remove(self, path):
+        """Remove the keywords of a schema or mapping file."""
+        with self._lock:
+            for key in [key for key in self._sources if key[1] == path]:
+                del self._sources[key]
+            return self._publish()
+
+    def set_keyword_mapping(self, keyword_mapping):
+        """Replace the keywords of the keyword mapping."""
+        with self._lock:
+            self._mapping = frozenset(utils.mapping_keywords(keyword_mapping))
+            return self._publish()
+
+    def refresh(self):
+        """Read the sources changed on disk and return the current set.
+
+        A source which cannot be read or parsed, e.g. while it is being
+        written, keeps its previous keywords and is read again by the
+        next refresh.
+        """
+        with self._lock:
+            for key, entry in list(self._sources.items()):
+                try:
+                    signature = utils.file_signature(key[1])
+                    if entry is None or entry[0] != signature:
+                        self._sources[key] = (signature, KeywordSet.shared(
+                            utils.source_keywords(*key)))
+                except (IOError, OSError, ValueError):
+                    continue
+            return self._publish()
+
+    def _publish(self):
+        keywords = set(self._mapping)
+        for entry in self._sources.values():
+            if entry is not None:
+                keywords.update(entry[1].keywords)
+        current = self.current
+        if keywords == current.keywords:
+            return current
+        snapshot = KeywordSet.shared(keywords, current)
+        # Readers see either the old or the new snapshot.
+        self.current = snapshot
+        self.version += 1
+        for callback in list(self._listeners):
+            callback(snapshot)
+        return snapshot
+
+    def subscribe(self, callback):
+        """Call ``callback(keyword_set)`` when the keywords change."""
+        with self._lock:
+            self._listeners.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """Stop calling ``callback``."""
+        with self._lock:
+            self._listeners.remove(callback)
+
+    def watch(self, interval=10.0):
+        """Call :meth:`refresh` every ``interval`` seconds in a thread.
+
+        :return: a :class:`threading.Event` stopping the thread when set.
+        """
+        with self._lock:
+            if self._watcher is not None and \
+                    not self._watcher.is_set():
+                return self._watcher
+            stop = self._watcher = threading.Event()
+
+        def run():
+            try:
+                while not stop.wait(interval):
+                    try:
+                        self.refresh()
+                    except Exception:
+                        # A failing listener must not stop the watcher.
+                        pass
+            finally:
+                with self._lock:
+                    if self._watcher is stop:
+                        self._watcher = None
+        thread = threading.Thread(target=run, name='keyword-watcher')
+        thread.daemon = True
+        thread.start()
+        return stop
+
+    def pinned(self):
+        """Parse with the current keywords until the block exits."""
+        return pinned(self.current)
+
+
+@contextlib.contextmanager
+def pinned(keyword_set, name='invenio'):
+    """Make :func:`pinned_keywords` return ``keyword_set`` for ``name``
+    in this thread until the block exits."""
+    with pinned_sets({name: keyword_set}):
+        yield keyword_set
+
+
+@contextlib.contextmanager
+def pinned_sets(keyword_sets):
+    """Pin several keyword sets given by name, see :func:`pinned`."""
+    previous = dict((name, getattr(_local, name, None))
+                    for name in keyword_sets)
+    for name, keyword_set in keyword_sets.items():
+        setattr(_local, name, keyword_set)
+    try:
+        yield keyword_sets
+    finally:
+        for name, keyword_set in previous.items():
+            setattr(_local, name, keyword_set)
+
+
+def pinned_keywords(name):
+    """Return the keyword set pinned for ``name`` in this thread."""
+    return getattr(_local, name, None)
+
+
+def default_registry():
+    """Return the registry of the configured keywords."""
+    if not _default:
+        with _default_lock:
+            if not _default:
+                _default.append(KeywordRegistry(*utils.keyword_sources()))
+    return _default[0]
+
+
+def current_keywords():
+    """Return the pinned keyword set or the default registry's one."""
+    keyword_set = getattr(_local, 'invenio', None)
+    if keyword_set is None:
+        keyword_set = default_registry().current
+    return keyword_set
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Metrics of parsing, conversion and printing.
+
+Converters accept a ``metrics`` object implementing :class:`Metrics`.
+:class:`MetricsCollector` keeps latency and query length histograms,
+error counts by exception type and cache hit counts in process and
+renders them in the Prometheus text exposition format::
+
+    metrics = MetricsCollector()
+    converter = SpiresToInvenioSyntaxConverter(metrics=metrics)
+    ...
+    body = metrics.render()  # serve as text/plain; version=0.0.4
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+from .regex_cache import regex_cache
+
+timer = getattr(time, 'perf_counter', time.time)
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+"""Upper bounds, in seconds, of the latency histogram buckets."""
+
+LENGTH_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+"""Upper bounds, in characters, of the query length histogram buckets."""
+
+PREFIX = 'invenio_query_parser'
+
+
+class Metrics(object):
+
+    """Metrics hook doing nothing; subclasses record the events.
+
+    ``operation`` is ``'parse'``, ``'convert'`` or ``'print'``.
+    """
+
+    def observe(self, operation, seconds, size=None):
+        """Record a successful operation and the size of its input."""
+
+    def error(self, operation, exception):
+        """Record an operation which raised ``exception``."""
+
+    def cache_access(self, cache, hit):
+        """Record a hit or a miss of the named cache."""
+
+    def measure(self, operation, function, value, size=None):
+        """Return ``function(value)``, recording its latency or error."""
+        start = timer()
+        try:
+            result = function(value)
+        except Exception as exception:
+            self.error(operation, exception)
+            raise
+        self.observe(operation, timer() - start, size)
+        return result
+
+
+class Histogram(object):
+
+    """Histogram with fixed buckets."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Yield ``(upper bound, cumulative count)`` pairs."""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf', ), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(labels[name]))
+                             for name in sorted(labels))
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsCollector(Metrics):
+
+    """In-process collector rendering the Prometheus text format.
+
+    :param caches: mapping of cache names to functions returning a
+        dictionary with ``hits`` and ``misses`` counts, read at rendering
+        time.  The shared :data:`~.regex_cache.regex_cache` is watched by
+        default.
+    """
+
+    def __init__(self, caches=None, latency_buckets=LATENCY_BUCKETS,
+                 length_buckets=LENGTH_BUCKETS):
+        self._lock = threading.Lock()
+        self.latency_buckets = latency_buckets
+        self.length_buckets = length_buckets
+        self.latency = {}
+        self.length = {}
+        self.errors = {}
+        self.cache_hits = {}
+        self.caches = {'regex': regex_cache.stats} if caches is None \
+            else dict(caches)
+
+    def observe(self, operation, seconds, size=None):
+        with self._lock:
+            histogram = self.latency.get(operation)
+            if histogram is None:
+                histogram = self.latency[operation] = Histogram(
+                    self.latency_buckets)
+            histogram.observe(seconds)
+            if size is not None:
+                histogram = self.length.get(operation)
+                if histogram is None:
+                    histogram = self.length[operation] = Histogram(
+                        self.length_buckets)
+                histogram.observe(size)
+
+    def error(self, operation, exception):
+        # Errors found before parsing are counted with the others.
+        name = 'SyntaxError' if isinstance(exception, SyntaxError) \
+            else type(exception).__name__
+        key = (operation, name)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def cache_access(self, cache, hit):
+        with self._lock:
+            counts = self.cache_hits.setdefault(cache, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def watch_cache(self, name, stats):
+        """Report the ``hits`` and ``misses`` returned by ``stats()``."""
+        self.caches[name] = stats
+
+    def cache_stats(self):
+        """Return ``{cache: (hits, misses)}``."""
+        with self._lock:
+            result = dict((name, tuple(counts))
+                          for name, counts in self.cache_hits.items())
+        for name, stats in self.caches.items():
+            data = stats()
+            result[name] = (data['hits'], data['misses'])
+        return result
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            self._render_histograms(
+                lines, 'duration_seconds', self.latency,
+                'Time spent parsing, converting and printing queries.')
+            self._render_histograms(
+                lines, 'query_length_chars', self.length,
+                'Length of the queries.')
+            name = '%s_errors_total' % PREFIX
+            lines.append('# HELP %s Failed operations by exception type.'
+                         % name)
+            lines.append('# TYPE %s counter' % name)
+            for (operation, kind), count in sorted(self.errors.items()):
+                lines.append('%s%s %d' % (name, _labels(
+                    operation=operation, type=kind), count))
+        caches = sorted(self.cache_stats().items())
+        for suffix, index, help_text in (
+                ('hits_total', 0, 'Cache hits.'),
+                ('misses_total', 1, 'Cache misses.')):
+            name = '%s_cache_%s' % (PREFIX, suffix)
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s counter' % name)
+            for cache, counts in caches:
+                lines.append('%s%s %d' % (name, _labels(cache=cache),
+                                          counts[index]))
+        name = '%s_cache_hit_ratio' % PREFIX
+        lines.append('# HELP %s Ratio of cache lookups which hit.' % name)
+        lines.append('# TYPE %s gauge' % name)
+        for cache, (hits, misses) in caches:
+            if hits + misses:
+                lines.append('%s%s %s' % (name, _labels(cache=cache), _number(
+                    float(hits) / (hits + misses))))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, suffix, histograms, help_text):
+        name = '%s_%s' % (PREFIX, suffix)
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s histogram' % name)
+        for operation in sorted(histograms):
+            histogram = histograms[operation]
+            for bound, count in histogram.cumulative():
+                lines.append('%s_bucket%s %d' % (name, _labels(
+                    operation=operation, le=_number(bound)), count))
+            lines.append('%s_sum%s %s' % (name, _labels(
+                operation=operation), _number(histogram.sum)))
+            lines.append('%s_count%s %d' % (name, _labels(
+                operation=operation), histogram.count))
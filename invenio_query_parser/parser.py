@@ -26,9 +26,11 @@
 from __future__ import absolute_import
 
 import re
+import threading
 
 import pypeg2
-from pypeg2 import Keyword, Literal, attr, maybe_some, omit, optional, some
+from pypeg2 import Keyword, Literal, RegEx, attr, maybe_some, omit, \
+    optional, some
 
 from . import ast
 from ._compat import string_types
@@ -36,6 +38,155 @@ from ._compat import string_types
 # pylint: disable=C0321,R0903
 
 
+class _Match(object):
+
+    """Minimal match object returned by the keyword matchers."""
+
+    __slots__ = ('_value', )
+
+    def __init__(self, value):
+        self._value = value
+
+    def group(self, index=0):
+        return self._value
+
+
+def _is_word(char):
+    return char.isalnum() or char == '_'
+
+
+class LazyRegEx(RegEx):
+
+    """Terminal symbol whose matcher is built on first use.
+
+    Subclasses implement :meth:`_build`, which returns a ``match(text)``
+    function, and :attr:`pattern`, used in syntax error messages.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # RegEx.__init__ compiles a pattern: build lazily instead.
+        self._match = None
+        self._lock = threading.Lock()
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+    def matcher(self):
+        """Return the matcher, building it on first use."""
+        if self._match is None:
+            with self._lock:
+                if self._match is None:
+                    self._match = self._build()
+        return self._match
+
+    def build(self):
+        """Build the matcher now unless it has been built already."""
+        self.matcher()
+
+    def match(self, text):
+        return self.matcher()(text)
+
+
+class KeywordSetRegEx(LazyRegEx):
+
+    """Terminal symbol matching keywords of a :class:`KeywordSet`.
+
+    The matcher is built once per keyword set and cached on it, so
+    replacing the set returned by ``keywords`` rebuilds the matcher.
+
+    :param keywords: function returning a
+        :class:`~invenio_query_parser.keywords.KeywordSet`.
+    """
+
+    def __init__(self, keywords, **kwargs):
+        super(KeywordSetRegEx, self).__init__(**kwargs)
+        self.keywords = keywords
+
+    def matcher(self):
+        return self.keywords().matcher(self, self._build)
+
+
+class KeywordRegEx(KeywordSetRegEx):
+
+    """Match the longest of a set of keywords followed by a word boundary.
+
+    It is equivalent to a case insensitive ``(k1|k2|...)\\b`` pattern but
+    looks keywords up in a set, as compiling the alternation of thousands
+    of keywords extracted from JSON schemas takes seconds.
+
+    :param keywords: function returning the keyword set.
+    :param marc: also match MARC tags (``\\d\\d\\d\\w{0,3}``).
+    """
+
+    pattern = '<keyword>'
+
+    _marc = re.compile(r'\d\d\d\w{0,3}\b', re.U)
+
+    def __init__(self, keywords, marc=False, **kwargs):
+        super(KeywordRegEx, self).__init__(keywords, **kwargs)
+        self.marc = marc
+
+    def _build(self, keyword_set):
+        keywords = keyword_set.lowered
+        chars = set(''.join(keywords))
+        chars.update(c.upper() for c in list(chars))
+        head = re.compile('[%s]+' % ''.join(re.escape(c) for c in chars)) \
+            if chars else None
+        marc = self._marc if self.marc else None
+
+        def match(text):
+            if marc is not None:
+                found = marc.match(text)
+                if found:
+                    return found
+            found = head.match(text) if head is not None else None
+            if found is None:
+                return None
+            candidate = found.group(0)
+            lowered = candidate.lower()
+            length = len(text)
+            for end in range(len(candidate), 0, -1):
+                if (end == length or
+                        _is_word(text[end - 1]) != _is_word(text[end])) \
+                        and lowered[:end] in keywords:
+                    return _Match(candidate[:end])
+            return None
+        return match
+
+
+class NotKeywordRegEx(KeywordSetRegEx):
+
+    """Match ``word:`` where ``word`` is neither a keyword nor a MARC tag.
+
+    Equivalent to ``\\b(?!\\d\\d\\d\\w{0,3}|k1:|k2:|...)\\S+\\b:``.
+    """
+
+    pattern = '<not a keyword>:'
+
+    _value = re.compile(r'\b\S+\b:', re.U)
+
+    def _build(self, keyword_set):
+        keywords = keyword_set.keywords
+        longest = max([len(k) for k in keywords] or [0])
+        value = self._value
+
+        def match(text):
+            found = value.match(text)
+            if found is None or text[:3].isdigit():
+                return None
+            colon = text.find(':', 0, longest + 1)
+            while colon != -1:
+                if text[:colon] in keywords:
+                    return None
+                colon = text.find(':', colon + 1, longest + 1)
+            return found
+        return match
+
+
+def _valid_keywords():
+    from .keywords import current_keywords
+    return current_keywords()
+
+
 class LeafRule(ast.Leaf):
 
     def __init__(self):
@@ -90,10 +241,7 @@ class Or(object):
 
 
 class KeywordRule(LeafRule):
-    from .utils import generate_valid_keywords
-    keywords_list = generate_valid_keywords()
-    grammar = attr('value', re.compile(r"(\d\d\d\w{0,3}|%s)\b" % "|".join(
-        keywords_list), re.I))
+    grammar = attr('value', KeywordRegEx(_valid_keywords, marc=True))
 
 
 class NestedKeywordsRule(LeafRule):
@@ -186,13 +334,7 @@ class Query(ListRule):
 
 
 class NotKeywordValue(LeafRule):
-    from .utils import generate_valid_keywords
-    keywords_list = generate_valid_keywords()
-    # Note: \d\d\d.?.?.? is regexp for MARC queries
-    grammar = attr('value',
-                   re.compile(r'\b(?!\d\d\d\w{0,3}|%s)\S+\b:' %
-                              "|".join([x + ":"
-                                        for x in keywords_list])))
+    grammar = attr('value', NotKeywordRegEx(_valid_keywords))
 
 
 class KeywordQuery(BinaryRule):
@@ -319,4 +461,10 @@ class Main(UnaryRule):
         attr('op', EmptyQueryRule),
     ]
 
+
+def warmup():
+    """Build the keyword matchers now instead of on the first parse."""
+    KeywordRule.grammar.thing.build()
+    NotKeywordValue.grammar.thing.build()
+
 # pylint: enable=C0321,R0903
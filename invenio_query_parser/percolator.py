@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Match records against many stored queries.
+
+Every stored query is indexed by a set of *anchor* terms, chosen so that
+any record matching the query contains at least one of them.  For an
+incoming record only the queries whose anchors occur in the record are
+fully evaluated.  Queries without usable anchors (negations, regular
+expressions, ranges, ...) are evaluated for every record.
+
+.. code-block:: python
+
+    percolator = Percolator()
+    percolator.add('alert-1', tree)
+    percolator.percolate({'title': 'Quark matter'})  # -> {'alert-1'}
+"""
+
+from .ast import (
+    AndOp, KeywordOp, OrOp, NotOp, Keyword, Value, SingleQuotedValue,
+    DoubleQuotedValue, ValueQuery, RegexValue, RangeOp, EmptyQuery,
+    GreaterOp, GreaterEqualOp, LowerOp, LowerEqualOp
+)
+from .visitor import make_visitor
+from .walkers.predicate import PredicateCompiler, RecordView, tokenize
+
+
+class _Terms(object):
+
+    """Terms of a value waiting for the keyword they belong to."""
+
+    def __init__(self, terms):
+        self.terms = terms
+
+
+def _better(left, right):
+    """Return the more selective of two anchor sets."""
+    def rank(anchors):
+        return (len(anchors), -sum(len(term) for _, term in anchors))
+    return left if rank(left) <= rank(right) else right
+
+
+class RequiredTerms(object):
+
+    """Extract anchor terms of a query.
+
+    Visiting a tree returns a frozenset of ``(keyword, term)`` pairs at
+    least one of which occurs in every matching record, or ``None`` if no
+    such set can be derived.  A ``None`` keyword stands for any field.
+    """
+
+    visitor = make_visitor()
+
+    @staticmethod
+    def _anchors(keyword, value):
+        if not isinstance(value, _Terms) or not value.terms:
+            return None
+        # All terms are required: anchoring on the longest one is enough.
+        term = max(sorted(value.terms), key=len)
+        return frozenset([(keyword, term)])
+
+    # pylint: disable=W0613,E0102
+
+    @visitor(AndOp)
+    def visit(self, node, left, right):
+        if left is None or right is None:
+            return left if right is None else right
+        return _better(left, right)
+
+    @visitor(OrOp)
+    def visit(self, node, left, right):
+        if left is None or right is None:
+            return None
+        return left | right
+
+    @visitor(NotOp)
+    def visit(self, node, op):
+        return None
+
+    @visitor(KeywordOp)
+    def visit(self, node, left, right):
+        return self._anchors(left, right)
+
+    @visitor(ValueQuery)
+    def visit(self, node, op):
+        return self._anchors(None, op)
+
+    @visitor(Keyword)
+    def visit(self, node):
+        return node.value
+
+    @visitor(Value)
+    def visit(self, node):
+        if '*' in node.value:
+            return None
+        return _Terms(tokenize(node.value))
+
+    @visitor(DoubleQuotedValue)
+    def visit(self, node):
+        return _Terms(tokenize(node.value))
+
+    @visitor(SingleQuotedValue)
+    def visit(self, node):
+        # Partial phrases may start or end in the middle of a word.
+        return None
+
+    @visitor(RegexValue)
+    def visit(self, node):
+        return None
+
+    @visitor(RangeOp)
+    def visit(self, node, left, right):
+        return None
+
+    @visitor(GreaterOp)
+    def visit(self, node, op):
+        return None
+
+    @visitor(GreaterEqualOp)
+    def visit(self, node, op):
+        return None
+
+    @visitor(LowerOp)
+    def visit(self, node, op):
+        return None
+
+    @visitor(LowerEqualOp)
+    def visit(self, node, op):
+        return None
+
+    @visitor(EmptyQuery)
+    def visit(self, node):
+        return None
+
+    # pylint: enable=W0612,E0102
+
+
+class Percolator(object):
+
+    """Index of stored queries matched against incoming records."""
+
+    def __init__(self, compiler=None, extractor=None):
+        self.compiler = compiler or PredicateCompiler()
+        self.extractor = extractor or RequiredTerms()
+        self._queries = {}
+        self._postings = {}
+        self._fields = {}
+        self._unanchored = set()
+        self.records = 0
+        self.candidates = 0
+        self.matches = 0
+
+    def __len__(self):
+        return len(self._queries)
+
+    def normalize(self, tree):
+        """Hook to rewrite a tree before it gets indexed."""
+        return tree
+
+    def add(self, query_id, tree):
+        """Store the query ``tree`` under ``query_id``."""
+        if query_id in self._queries:
+            self.remove(query_id)
+        tree = self.normalize(tree)
+        anchors = tree.accept(self.extractor)
+        if isinstance(anchors, _Terms):
+            anchors = None
+        self._queries[query_id] = (self.compiler.compile(tree), anchors)
+        if anchors is None:
+            self._unanchored.add(query_id)
+            return
+        for anchor in anchors:
+            self._postings.setdefault(anchor, set()).add(query_id)
+            field = anchor[0]
+            self._fields[field] = self._fields.get(field, 0) + 1
+
+    def remove(self, query_id):
+        """Remove a stored query."""
+        _, anchors = self._queries.pop(query_id)
+        if anchors is None:
+            self._unanchored.discard(query_id)
+            return
+        for anchor in anchors:
+            postings = self._postings[anchor]
+            postings.discard(query_id)
+            if not postings:
+                del self._postings[anchor]
+            field = anchor[0]
+            self._fields[field] -= 1
+            if not self._fields[field]:
+                del self._fields[field]
+
+    def candidates_for(self, record):
+        """Return the ids of queries possibly matching ``record``."""
+        if type(record) is not RecordView:
+            record = RecordView(record)
+        candidates = set(self._unanchored)
+        postings = self._postings
+        for field in self._fields:
+            for term in record.tokens(field):
+                query_ids = postings.get((field, term))
+                if query_ids:
+                    candidates.update(query_ids)
+        return candidates
+
+    def percolate(self, record):
+        """Return the ids of stored queries matching ``record``."""
+        view = RecordView(record)
+        candidates = self.candidates_for(view)
+        queries = self._queries
+        matched = set(query_id for query_id in candidates
+                      if queries[query_id][0](view))
+        self.records += 1
+        self.candidates += len(candidates)
+        self.matches += len(matched)
+        return matched
+
+    def stats(self):
+        """Return counters describing the work done so far."""
+        return {
+            'queries': len(self._queries),
+            'unanchored': len(self._unanchored),
+            'records': self.records,
+            'candidates': self.candidates,
+            'matches': self.matches,
+            'candidates_per_record': (
+                float(self.candidates) / self.records if self.records else 0.0
+            ),
+        }
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Warm up the parsers in a pre-forking master process.
+
+Servers like gunicorn with ``preload_app`` import the application in a
+master process and fork the workers from it.  Whatever the master builds
+is shared copy-on-write by the workers, but only as long as nobody
+writes to the memory pages holding it: the cyclic garbage collector
+writes to the header of every object it tracks, so each collection in a
+worker un-shares the pages of the master's objects.
+
+:func:`prefork_warmup` builds the keyword matchers, alias tables and
+optionally a parse cache in the master, then moves all objects alive to
+the permanent generation of the collector (:func:`gc.freeze`, Python
+3.7+), where collections in the workers do not touch them.  The cache
+is bound at module level, so that the converters of the workers, built
+after the fork, share the trees parsed in the master::
+
+    # myapp/search.py
+    from invenio_query_parser.converter import InvenioSyntaxConverter, \
+        ParseCache
+
+    CACHE = ParseCache()
+
+    def make_converter():
+        # Called in each worker, after the fork.
+        return InvenioSyntaxConverter(cache=CACHE)
+
+    # gunicorn.conf.py
+    from invenio_query_parser.prefork import prefork_warmup
+    from myapp.search import CACHE
+
+    preload_app = True
+
+    def on_starting(server):
+        prefork_warmup(COMMON_QUERIES, cache=CACHE)
+"""
+
+import gc
+import importlib
+
+from .contrib.spires import parser as spires_parser
+from .contrib.spires.aliases import alias_table
+from .contrib.spires.converter import SpiresToInvenioSyntaxConverter
+from .converter import InvenioSyntaxConverter
+
+MODULES = (
+    'invenio_query_parser.contrib.spires.walkers.dates',
+    'invenio_query_parser.contrib.spires.walkers.printer',
+    'invenio_query_parser.contrib.spires.walkers.spires_to_invenio',
+    'invenio_query_parser.walkers.predicate',
+    'invenio_query_parser.walkers.printer',
+    'invenio_query_parser.walkers.repr_printer',
+    'invenio_query_parser.walkers.sql_compiler',
+)
+"""Modules imported by :func:`prefork_warmup` rather than by the workers."""
+
+
+def prefork_warmup(queries=(), cache=None, converters=None, freeze=True):
+    """Build the shared parser state and freeze it.
+
+    :param queries: queries parsed in advance; their trees are kept in
+        ``cache`` if it is given.
+    :param cache: a :class:`~invenio_query_parser.converter.ParseCache`
+        used by the default converters.
+    :param converters: converters to warm up, an Invenio and a SPIRES
+        converter using ``cache`` by default.  Every query is parsed by
+        each of them, and queries they reject are ignored.
+    :param freeze: whether to call :func:`gc.freeze` at the end.
+    :return: the converters.
+    """
+    if converters is None:
+        converters = [InvenioSyntaxConverter(cache=cache),
+                      SpiresToInvenioSyntaxConverter(cache=cache)]
+    for name in MODULES:
+        importlib.import_module(name)
+    spires_parser.warmup()
+    alias_table()
+    for converter in converters:
+        converter.config.warmup()
+        for query in queries:
+            try:
+                converter.parse_query(query)
+            except SyntaxError:
+                pass
+    gc.collect()
+    if freeze and hasattr(gc, 'freeze'):
+        gc.freeze()
+    return converters
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Opt-in profiling of grammar rules and walkers.
+
+Within a :func:`profiled` block, queries parsed by the converters of this
+package are parsed by a :class:`ProfilingParser` recording, for each
+grammar rule, how many times it was tried, succeeded, failed (the parser
+backtracked) or was answered from the parser's memo, together with its
+inclusive and exclusive time::
+
+    with profiled() as profile:
+        for query in queries:
+            converter.parse_query(query)
+    print(profile.table())
+
+Outside such a block :func:`parse` is :func:`pypeg2.parse` plus a
+thread-local lookup.  :class:`WalkerProfile` times the visitor methods of
+walkers per node type.
+"""
+
+from __future__ import absolute_import
+
+import contextlib
+import threading
+import time
+
+import pypeg2
+
+from . import ast
+
+timer = getattr(time, 'perf_counter', time.time)
+
+_local = threading.local()
+
+ATTEMPTS, SUCCESSES, FAILURES, MEMOIZED, TIME, OWN_TIME = range(6)
+
+FIELDS = ('attempts', 'successes', 'failures', 'memoized', 'time',
+          'own_time')
+
+
+def rule_name(thing):
+    """Return the name of a grammar rule, ``None`` for other things."""
+    if not isinstance(thing, type):
+        return None
+    module = thing.__module__
+    if module.startswith('invenio_query_parser.'):
+        module = module[len('invenio_query_parser.'):]
+    return '%s.%s' % (module, thing.__name__)
+
+
+class ParseProfile(object):
+
+    """Statistics of the grammar rules over one or more parses."""
+
+    def __init__(self):
+        self.parses = 0
+        self.time = 0.0
+        self.rules = {}
+        self._lock = threading.Lock()
+
+    def parse(self, text, thing, whitespace=pypeg2.whitespace):
+        """Parse like :func:`pypeg2.parse` and record the rules."""
+        parser = ProfilingParser(self)
+        parser.whitespace = whitespace
+        parser.text = text
+        start = timer()
+        try:
+            rest, result = parser.parse(text, thing)
+        finally:
+            self.add(parser.rules, timer() - start)
+        if rest:
+            raise parser.last_error
+        return result
+
+    def add(self, rules, elapsed):
+        """Merge the statistics of a parse."""
+        with self._lock:
+            self.parses += 1
+            self.time += elapsed
+            for name, stats in rules.items():
+                total = self.rules.setdefault(name, [0, 0, 0, 0, 0.0, 0.0])
+                for index, value in enumerate(stats):
+                    total[index] += value
+
+    def as_dict(self):
+        """Return the profile as a dictionary."""
+        return {
+            'parses': self.parses,
+            'time': self.time,
+            'rules': dict((name, dict(zip(FIELDS, stats)))
+                          for name, stats in self.rules.items()),
+        }
+
+    def table(self, limit=None):
+        """Return the rules sorted by exclusive time as a text table."""
+        rows = sorted(self.rules.items(),
+                      key=lambda item: item[1][OWN_TIME], reverse=True)
+        width = max([len(name) for name in self.rules] + [4])
+        lines = ['%-*s %9s %9s %9s %9s %10s %10s' % (
+            width, 'rule', 'attempts', 'success', 'fail', 'memo',
+            'incl ms', 'excl ms')]
+        for name, stats in rows[:limit]:
+            lines.append('%-*s %9d %9d %9d %9d %10.2f %10.2f' % (
+                width, name, stats[ATTEMPTS], stats[SUCCESSES],
+                stats[FAILURES], stats[MEMOIZED], stats[TIME] * 1e3,
+                stats[OWN_TIME] * 1e3))
+        lines.append('%d parses in %.2f ms' % (self.parses, self.time * 1e3))
+        return '\n'.join(lines)
+
+
+class ProfilingParser(pypeg2.Parser):
+
+    """Parser recording statistics for each grammar rule it tries."""
+
+    def __init__(self, profile):
+        super(ProfilingParser, self).__init__()
+        self.profile = profile
+        self.rules = {}
+        self._children = []
+        self._active = {}
+
+    def _parse(self, text, thing, pos=[1, 0]):
+        name = rule_name(thing)
+        if name is None:
+            return super(ProfilingParser, self)._parse(text, thing, pos)
+        stats = self.rules.get(name)
+        if stats is None:
+            stats = self.rules[name] = [0, 0, 0, 0, 0.0, 0.0]
+        stats[ATTEMPTS] += 1
+        if text in self._memory.get(id(thing), ()):
+            stats[MEMOIZED] += 1
+
+        active = self._active.get(name, 0)
+        self._active[name] = active + 1
+        self._children.append(0.0)
+        start = timer()
+        try:
+            result = super(ProfilingParser, self)._parse(text, thing, pos)
+        finally:
+            elapsed = timer() - start
+            self._active[name] = active
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            stats[OWN_TIME] += elapsed - children
+            # Only the outermost call of a recursive rule counts.
+            if not active:
+                stats[TIME] += elapsed
+        if isinstance(result[1], SyntaxError):
+            stats[FAILURES] += 1
+        else:
+            stats[SUCCESSES] += 1
+        return result
+
+
+@contextlib.contextmanager
+def profiled(profile=None):
+    """Profile the parses of this thread until the block exits."""
+    if profile is None:
+        profile = ParseProfile()
+    previous = getattr(_local, 'profile', None)
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
+
+
+def parse(text, thing, whitespace=pypeg2.whitespace):
+    """Parse like :func:`pypeg2.parse`, profiling within :func:`profiled`."""
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return pypeg2.parse(text, thing, whitespace=whitespace)
+    return profile.parse(text, thing, whitespace)
+
+
+CALLS, INCLUSIVE, EXCLUSIVE = range(3)
+
+
+def _arity(node):
+    if isinstance(node, ast.BinaryOp):
+        return 2
+    if isinstance(node, ast.UnaryOp):
+        return 1
+    if isinstance(node, ast.ListOp):
+        return len(node.children)
+    return 0
+
+
+class WalkerProfile(object):
+
+    """Time the visitor methods of walker classes per node type.
+
+    While enabled, the ``visit`` method of each walker class is replaced
+    by a timing wrapper; disabling the profile restores the original
+    methods, so a disabled profile costs nothing::
+
+        with WalkerProfile(SpiresToInvenio, TreeRepr) as profile:
+            tree.accept(SpiresToInvenio()).accept(TreeRepr())
+        print(profile.table())
+
+    Visits happen in post-order: a node is visited after its children.
+    The exclusive time of a node is its visit alone, the inclusive time
+    runs from the first visit in its subtree to the end of its own visit.
+    Inclusive time of nested nodes of the same type is counted once.
+    """
+
+    def __init__(self, *walkers):
+        self.walkers = walkers
+        self.node_types = {}
+        self.methods = {}
+        self._originals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self._originals)
+
+    def enable(self):
+        """Install the timing wrappers."""
+        for walker in self.walkers:
+            if walker in self._originals or \
+                    getattr(walker.visit, 'timed', False):
+                continue
+            self._originals[walker] = walker.__dict__.get('visit')
+            walker.visit = self._wrap(walker, walker.visit)
+
+    def disable(self):
+        """Restore the original visitor methods."""
+        for walker, original in self._originals.items():
+            if original is None:
+                del walker.visit
+            else:
+                walker.visit = original
+        self._originals.clear()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def clear(self):
+        """Forget the statistics recorded so far."""
+        with self._lock:
+            self.node_types.clear()
+            self.methods.clear()
+
+    def _wrap(self, walker, visit):
+        record = self._record
+
+        def timed_visit(instance, node, *args, **kwargs):
+            start = timer()
+            result = visit(instance, node, *args, **kwargs)
+            record(walker, instance, node, start, timer())
+            return result
+        timed_visit.timed = True
+        return timed_visit
+
+    def _method(self, instance, node):
+        try:
+            function = type(instance).visitor[type(node)]
+        except (AttributeError, KeyError):
+            return '%s.visit' % type(instance).__name__
+        code = getattr(function, '__code__', None)
+        name = getattr(function, '__qualname__', function.__name__)
+        if code is None:
+            return name
+        return '%s:%d' % (name, code.co_firstlineno)
+
+    def _record(self, walker, instance, node, start, end):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        arity = _arity(node)
+        node_type = (walker.__name__, type(node).__name__)
+        method = self._method(instance, node)
+        # Each stack entry is the start time of a visited subtree and the
+        # inclusive time already counted in it, by key.
+        if arity and len(stack) >= arity:
+            children = stack[-arity:]
+            del stack[-arity:]
+            subtree_start, counted = children[0]
+            for child in children[1:]:
+                for key, value in child[1].items():
+                    counted[key] = counted.get(key, 0.0) + value
+        else:
+            subtree_start, counted = start, {}
+        inclusive = end - subtree_start
+        with self._lock:
+            for key, table in ((node_type, self.node_types),
+                               (method, self.methods)):
+                stats = table.get(key)
+                if stats is None:
+                    stats = table[key] = [0, 0.0, 0.0]
+                stats[CALLS] += 1
+                stats[INCLUSIVE] += inclusive - counted.get(key, 0.0)
+                stats[EXCLUSIVE] += end - start
+                counted[key] = inclusive
+        stack.append((subtree_start, counted))
+        if len(stack) > 10000:
+            # Roots of finished traversals are never popped.
+            del stack[:-5000]
+
+    def as_dict(self):
+        """Return the statistics by node type and by visitor method."""
+        fields = ('calls', 'time', 'own_time')
+        with self._lock:
+            return {
+                'node_types': dict(
+                    ('%s.%s' % key, dict(zip(fields, stats)))
+                    for key, stats in self.node_types.items()),
+                'methods': dict(
+                    (key, dict(zip(fields, stats)))
+                    for key, stats in self.methods.items()),
+            }
+
+    def table(self, limit=None):
+        """Return the node types and methods sorted by exclusive time."""
+        data = self.as_dict()
+        lines = []
+        for title in ('node_types', 'methods'):
+            rows = sorted(data[title].items(),
+                          key=lambda item: item[1]['own_time'], reverse=True)
+            width = max([len(name) for name in data[title]] + [10])
+            lines.append('%-*s %9s %10s %10s' % (
+                width, title.replace('_', ' '), 'calls', 'incl ms',
+                'excl ms'))
+            for name, stats in rows[:limit]:
+                lines.append('%-*s %9d %10.3f %10.3f' % (
+                    width, name, stats['calls'], stats['time'] * 1e3,
+                    stats['own_time'] * 1e3))
+        return '\n'.join(lines)
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Recover partial trees from malformed queries.
+
+The grammar rejects a query as a whole, however small the mistake.
+:class:`Recovery` instead reads the query in one pass, splitting it at
+boolean operators and parentheses, and parses each operand with the
+grammar.  Operands the grammar rejects become
+:class:`~invenio_query_parser.ast.MalformedQuery` nodes, and stray
+operators and parentheses are dropped or closed, each problem being
+reported as a :class:`Diagnostic` with its span in the query.
+
+Operands are combined left to right as the grammar does, so the valid
+parts of a malformed query keep their meaning.  Converters recover
+queries with :meth:`~.converter.InvenioSyntaxConverter.recover_query`::
+
+    >>> converter.recover_query('title:higgs and (author:ellis or')
+    (AndOp(KeywordOp(Keyword('title'), Value('higgs')),
+           KeywordOp(Keyword('author'), Value('ellis'))),
+     [Diagnostic('Unclosed (', 16, 17),
+      Diagnostic('Missing operand after or', 30, 32)])
+"""
+
+import re
+
+from . import ast
+
+_OPERATORS = {'and': ast.AndOp, 'or': ast.OrOp, '+': ast.AndOp,
+              '|': ast.OrOp}
+
+_NEGATIONS = frozenset(['not', '-'])
+
+_PLAIN = re.compile(r'[^\s()]*', re.U)
+
+_KEYWORD = re.compile(r'[\w.]+\s*:$', re.U)
+
+_WORD = re.compile(r'[\w.]+$', re.U)
+
+_QUOTE = re.compile(r'(?<![^\s(:])["\'/]', re.U)
+
+
+class Diagnostic(object):
+
+    """Problem found in a query while recovering it.
+
+    :param message: description of the problem.
+    :param start: index of the first character concerned.
+    :param end: index after the last character concerned.
+    """
+
+    def __init__(self, message, start, end):
+        self.message = message
+        self.start = start
+        self.end = end
+
+    def __eq__(self, other):
+        return type(self) == type(other) and \
+            (self.message, self.start, self.end) == \
+            (other.message, other.start, other.end)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Diagnostic(%r, %d, %d)' % (self.message, self.start,
+                                           self.end)
+
+
+class _Group(object):
+
+    """State of a parenthesized group being read."""
+
+    def __init__(self, start, keyword=None, implicit=None):
+        self.start = start
+        self.keyword = keyword
+        self.implicit = implicit
+        self.tree = None
+        self.operator = None
+        self.negations = []
+
+
+class Recovery(object):
+
+    """Parse queries, wrapping what the grammar rejects in
+    :class:`~invenio_query_parser.ast.MalformedQuery` nodes.
+
+    :param parse: function returning the tree of an operand, raising
+        :exc:`SyntaxError` if the grammar rejects it.
+    :param strict_quotes: consider operands with an unterminated quote
+        malformed, see :mod:`~invenio_query_parser.validation`.
+    """
+
+    def __init__(self, parse, strict_quotes=False):
+        self.parse = parse
+        self.strict_quotes = strict_quotes
+
+    def recover(self, query):
+        """Return the partial tree of ``query`` and its diagnostics."""
+        return self.read(query, 0, True, '')
+
+    def read(self, query, position, split_words, prefix):
+        """Read ``query`` from ``position``.
+
+        :param split_words: whether words separated by whitespace are
+            distinct operands, and-ed together.
+        :param prefix: text prepended to each operand before parsing it.
+        """
+        diagnostics = []
+        groups = [_Group(position)]
+        pending = None
+        for kind, start, end in self.tokens(query, position, split_words):
+            group = groups[-1]
+            if kind == 'word':
+                if pending is not None and (
+                        not split_words or query[pending[1] - 1] == ':' or
+                        query[start] == ':'):
+                    pending = (pending[0], end)
+                    continue
+                if pending is not None:
+                    self.operand(group, self.fragment(
+                        query, pending, prefix, diagnostics))
+                pending = (start, end)
+                continue
+            keyword = None
+            if pending is not None:
+                text = query[pending[0]:pending[1]]
+                if kind == 'open' and _KEYWORD.match(text):
+                    keyword = text[:-1].rstrip()
+                elif kind == 'open' and not split_words and \
+                        _WORD.match(text):
+                    # In ``find t (a or b)`` the word before the group is
+                    # the keyword of its operands, and of the next ones.
+                    group.implicit = ast.Keyword(text)
+                else:
+                    self.operand(group, self.fragment(
+                        query, pending, prefix, diagnostics))
+                pending = None
+            if kind == 'open':
+                groups.append(_Group(start, keyword, group.implicit))
+            elif kind == 'close':
+                if len(groups) == 1:
+                    diagnostics.append(Diagnostic('Unbalanced )', start, end))
+                    continue
+                groups.pop()
+                self.close(groups[-1], group, query, end, diagnostics)
+            elif kind == 'negation':
+                group.negations.append((start, end))
+            else:
+                self.operator(group, query, start, end, diagnostics)
+        if pending is not None:
+            self.operand(groups[-1], self.fragment(
+                query, pending, prefix, diagnostics))
+        while len(groups) > 1:
+            group = groups.pop()
+            diagnostics.append(
+                Diagnostic('Unclosed (', group.start, group.start + 1))
+            self.close(groups[-1], group, query, len(query), diagnostics)
+        tree = self.finish(groups[0], query, diagnostics)
+        if tree is None:
+            tree = ast.MalformedQuery(query)
+        diagnostics.sort(key=lambda diagnostic: diagnostic.start)
+        return tree, diagnostics
+
+    def tokens(self, query, position, split_words):
+        """Yield the ``(kind, start, end)`` tokens of ``query``.
+
+        The kinds are ``'open'``, ``'close'``, ``'operator'``,
+        ``'negation'`` and ``'word'``.
+        """
+        length = len(query)
+        value = False
+        while position < length:
+            char = query[position]
+            if char.isspace():
+                position += 1
+                continue
+            if char in '()':
+                yield 'open' if char == '(' else 'close', position, \
+                    position + 1
+                position += 1
+                value = False
+                continue
+            end = self.word_end(query, position)
+            word = query[position:end].lower()
+            if value:
+                yield 'word', position, end
+            elif split_words and char in '-+|' and (
+                    end - position > 1 or query[end:end + 1] == '('):
+                yield 'negation' if char == '-' else 'operator', \
+                    position, position + 1
+                end = position + 1
+            elif word in _NEGATIONS:
+                yield 'negation', position, end
+            elif word in _OPERATORS:
+                yield 'operator', position, end
+            else:
+                yield 'word', position, end
+            # A keyword is followed by its value, whatever it looks like.
+            value = query[end - 1] == ':'
+            position = end
+
+    def word_end(self, query, position):
+        """Return the end of the word starting at ``position``.
+
+        Quoted values are words, and so are parentheses following a
+        character of the word and closed before its end, as in
+        ``f(x)``.
+        """
+        char = query[position]
+        if char in '"\'/':
+            end = query.find(char, position + 1)
+            if end != -1:
+                return end + 1
+        end = _PLAIN.match(query, position).end()
+        while end < len(query) and query[end] == '(' and end > position \
+                and query[end - 1] != ':' and \
+                query[position:end].lower() not in _OPERATORS and \
+                query[position:end].lower() not in _NEGATIONS:
+            depth = 0
+            for index in range(end, len(query)):
+                char = query[index]
+                if char.isspace():
+                    return end
+                if char == '(':
+                    depth += 1
+                elif char == ')':
+                    depth -= 1
+                    if depth == 0:
+                        break
+            else:
+                return end
+            end = _PLAIN.match(query, index + 1).end()
+        return end
+
+    def fragment(self, query, span, prefix, diagnostics):
+        """Return the tree of the operand at ``span``."""
+        text = query[span[0]:span[1]]
+        if self.strict_quotes:
+            for quote in _QUOTE.finditer(query, span[0], span[1]):
+                if query.find(quote.group(), quote.end()) == -1:
+                    diagnostics.append(Diagnostic(
+                        'Unterminated %s' % quote.group(), span[0], span[1]))
+                    return ast.MalformedQuery(text)
+        try:
+            return self.parse(prefix + text)
+        except (SyntaxError, RuntimeError):
+            diagnostics.append(Diagnostic('Invalid query', span[0], span[1]))
+            return ast.MalformedQuery(text)
+
+    def assign(self, group, node):
+        """Return an operand of ``group`` before it is combined."""
+        return node
+
+    def operand(self, group, node):
+        """Combine ``node`` with the operands already read in ``group``."""
+        node = self.assign(group, node)
+        for _ in group.negations:
+            node = ast.NotOp(node)
+        if group.tree is None:
+            group.tree = node
+        else:
+            operator = group.operator[0] if group.operator else ast.AndOp
+            group.tree = operator(group.tree, node)
+        group.operator = None
+        group.negations = []
+
+    def operator(self, group, query, start, end, diagnostics):
+        """Read a binary operator of ``group``."""
+        word = query[start:end]
+        self.dangling(group, query, diagnostics)
+        if group.tree is None:
+            diagnostics.append(Diagnostic(
+                'Missing operand before %s' % word, start, end))
+            return
+        group.operator = (_OPERATORS[word.lower()], start, end)
+
+    def dangling(self, group, query, diagnostics):
+        """Drop the operators of ``group`` waiting for an operand."""
+        if group.negations:
+            start, end = group.negations[0][0], group.negations[-1][1]
+        elif group.operator is not None:
+            start, end = group.operator[1:]
+        else:
+            return
+        diagnostics.append(Diagnostic(
+            'Missing operand after %s' % query[start:end], start, end))
+        group.negations = []
+        group.operator = None
+
+    def finish(self, group, query, diagnostics):
+        """Return the tree of ``group``, all of it being read."""
+        self.dangling(group, query, diagnostics)
+        return group.tree
+
+    def close(self, parent, group, query, end, diagnostics):
+        """Add the tree of the closed ``group`` to ``parent``."""
+        tree = self.finish(group, query, diagnostics)
+        if tree is None:
+            if query[end - 1:end] == ')':
+                diagnostics.append(
+                    Diagnostic('Empty group', group.start, end))
+            return
+        if group.keyword is not None:
+            tree = ast.KeywordOp(ast.Keyword(group.keyword), tree)
+        self.operand(parent, tree)
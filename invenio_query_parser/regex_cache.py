@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Shared cache of compiled :class:`~invenio_query_parser.ast.RegexValue`
+patterns.
+
+Patterns come from users, so before being compiled they are screened for
+nested quantifiers like ``(a+)+``, which backtrack exponentially.  Unsafe
+patterns are rejected or, where the ``re`` module supports atomic groups
+and doing so keeps their matches, rewritten so that the repeated group
+cannot be backtracked into.
+
+The ``re`` module cannot interrupt a running match, so match time
+budgets are enforced after the fact: a pattern exceeding its budget is
+blacklisted and rejected from then on.
+"""
+
+import itertools
+import re
+import sys
+import threading
+import time
+
+from ._compat import OrderedDict
+
+ATOMIC_GROUPS = sys.version_info >= (3, 11)
+"""Whether the ``re`` module supports ``(?>...)`` atomic groups."""
+
+_REPEAT = re.compile(r'\{(\d*)(,?)(\d*)\}')
+_CONTEXT = re.compile(r'\(\?[aiLmsux(]|\(\?P=|\\[1-9]')
+"""Inline flags, conditionals and backreferences."""
+_SPECIAL = '.^$*+?{}[]\\|()'
+
+
+class UnsafeRegexError(ValueError):
+
+    """Raised for patterns rejected by the safety screen."""
+
+    def __init__(self, pattern, reason):
+        super(UnsafeRegexError, self).__init__(
+            'Unsafe regular expression %r: %s' % (pattern, reason))
+        self.pattern = pattern
+        self.reason = reason
+
+
+def _quantifier(pattern, pos):
+    """Return ``(end, unbounded)`` of the quantifier at ``pos``, if any."""
+    if pos >= len(pattern):
+        return None
+    char = pattern[pos]
+    if char in '*+?':
+        end = pos + 1
+        if end < len(pattern) and pattern[end] in '?+':
+            end += 1  # lazy or possessive modifier
+        return end, char != '?'
+    if char == '{':
+        match = _REPEAT.match(pattern, pos)
+        if match:
+            low, comma, high = match.groups()
+            unbounded = bool(comma) and (not high or int(high) > 1) or \
+                (not comma and low and int(low) > 1)
+            return match.end(), bool(unbounded)
+    return None
+
+
+def find_nested_quantifiers(pattern):
+    """Return ``(start, end)`` spans of quantified groups which contain
+    a quantifier themselves.
+
+    The scan is linear in the pattern length and conservative: groups
+    like ``(ab+)+``, which cannot backtrack exponentially, are reported
+    as well.
+    """
+    spans = []
+    stack = [[None, False]]  # group start, contains a quantifier
+    pos, length = 0, len(pattern)
+    while pos < length:
+        char = pattern[pos]
+        if char == '(':
+            stack.append([pos, False])
+            pos += 1
+            if pattern.startswith('?', pos) and \
+                    not pattern.startswith('?P<', pos) and \
+                    not pattern.startswith('?:', pos):
+                pos += 1  # skip the flag/lookaround marker
+            continue
+        if char == ')' and len(stack) > 1:
+            start, quantified = stack.pop()
+            pos += 1
+            quantifier = _quantifier(pattern, pos)
+            if quantifier:
+                pos, unbounded = quantifier
+                if unbounded and quantified:
+                    spans.append((start, pos))
+                quantified = quantified or unbounded
+            stack[-1][1] = stack[-1][1] or quantified
+            continue
+        # Single atom: escape sequence, character class or character.
+        if char == '\\':
+            pos += 2
+        elif char == '[':
+            pos += 1
+            if pos < length and pattern[pos] == '^':
+                pos += 1
+            if pos < length and pattern[pos] == ']':
+                pos += 1
+            while pos < length and pattern[pos] != ']':
+                pos += 2 if pattern[pos] == '\\' else 1
+            pos += 1
+        else:
+            pos += 1
+        quantifier = _quantifier(pattern, pos)
+        if quantifier:
+            pos, unbounded = quantifier
+            stack[-1][1] = stack[-1][1] or unbounded
+    return spans
+
+
+def _atoms(pattern, pos, end):
+    """Yield ``(start, end, kind)`` of the syntax elements of a pattern.
+
+    ``kind`` is ``'atom'`` for single characters, escapes and character
+    classes, ``'quantifier'``, or the text of any other element.
+    """
+    while pos < end:
+        char = pattern[pos]
+        start = pos
+        if char == '\\':
+            pos += 2
+        elif char == '[':
+            pos += 1
+            if pos < end and pattern[pos] == '^':
+                pos += 1
+            if pos < end and pattern[pos] == ']':
+                pos += 1
+            while pos < end and pattern[pos] != ']':
+                pos += 2 if pattern[pos] == '\\' else 1
+            pos += 1
+        elif char == '(' and pattern.startswith('?', pos + 1):
+            yield start, pos + 3, pattern[pos:pos + 3]
+            pos += 3
+            continue
+        else:
+            quantifier = _quantifier(pattern, pos)
+            if quantifier:
+                yield start, quantifier[0], 'quantifier'
+                pos = quantifier[0]
+                continue
+            pos += 1
+            if char in '()|^$':
+                yield start, pos, char
+                continue
+        yield start, pos, 'atom'
+
+
+def is_atomic_safe(pattern, span, flags=0):
+    """Return whether making ``span`` atomic keeps the matches of
+    ``pattern``.
+
+    It does when nothing follows the span in its top level alternative.
+    It also does for a top level repeated run of one character class,
+    like ``(a+)+``, followed by an end anchor or by a character the
+    class cannot match: the run ends at the first character it cannot
+    match, whichever way it was split.
+    """
+    start, end = span
+    depth = 0
+    for _, _, kind in _atoms(pattern, 0, start):
+        if kind == ')':
+            depth -= 1
+        elif kind.startswith('('):
+            depth += 1
+    if depth:
+        return False
+    following = list(itertools.islice(_atoms(pattern, end, len(pattern)), 2))
+    if not following or following[0][2] == '|':
+        return True
+    if flags & re.X or _CONTEXT.search(pattern):
+        return False
+    elements = [(kind, pattern[first:last])
+                for first, last, kind in _atoms(pattern, start, end)]
+    if [kind for kind, _ in elements] != \
+            [elements[0][0], 'atom', 'quantifier', ')', 'quantifier'] or \
+            elements[0][0] not in ('(', '(?:') or \
+            elements[2][1] not in ('*', '+') or \
+            elements[4][1] not in ('*', '+'):
+        return False
+    atom = elements[1][1]
+    if atom[0] == '\\' and atom[1:].isalnum() and atom[1] not in 'dDsSwW':
+        return False  # backreference or anchor
+    atom = re.compile(atom, flags)
+    first, last, kind = following[0]
+    text = pattern[first:last]
+    if text == '\\Z' or kind == '$' and not flags & re.M:
+        # The anchor must end the alternative: ``$`` is also found
+        # before a final newline.
+        return len(following) == 1 or following[1][2] == '|'
+    if kind != 'atom' or text[0] == '[' or \
+            text[0] == '\\' and text[1:].isalnum() or \
+            text[0] != '\\' and text in _SPECIAL:
+        return False
+    quantifier = _quantifier(pattern, last)
+    if quantifier and pattern[last] != '+':
+        return False  # the character may be skipped
+    chars = set(text[-1])
+    if flags & re.I:
+        chars.update((text[-1].lower(), text[-1].upper()))
+    return not any(atom.match(char) for char in chars)
+
+
+def make_atomic(pattern, spans):
+    """Wrap every span of ``pattern`` in an atomic group."""
+    inserts = []
+    for start, end in spans:
+        inserts.append((start, 0, '(?>'))
+        inserts.append((end, 1, ')'))
+    for pos, _, text in sorted(inserts, reverse=True):
+        pattern = pattern[:pos] + text + pattern[pos:]
+    return pattern
+
+
+class BudgetedPattern(object):
+
+    """Compiled pattern whose matches are timed against a budget."""
+
+    def __init__(self, cache, source, regex, budget):
+        self.cache = cache
+        self.source = source
+        self.regex = regex
+        self.budget = budget
+        self.pattern = regex.pattern
+
+    def _timed(self, method, *args):
+        start = time.time()
+        try:
+            return method(*args)
+        finally:
+            if time.time() - start > self.budget:
+                self.cache.over_budget(self.source)
+
+    def search(self, *args):
+        return self._timed(self.regex.search, *args)
+
+    def match(self, *args):
+        return self._timed(self.regex.match, *args)
+
+    def fullmatch(self, *args):
+        return self._timed(self.regex.fullmatch, *args)
+
+
+class RegexCache(object):
+
+    """Bounded LRU cache of screened, compiled patterns.
+
+    :param maxsize: number of compiled patterns kept.
+    :param on_unsafe: ``'reject'``, ``'rewrite'`` or ``'allow'`` patterns
+        with nested quantifiers.  Rewriting falls back to rejecting on
+        Python versions without atomic groups and for patterns whose
+        matches would change, see :func:`is_atomic_safe`.
+    :param budget: default match time budget in seconds, or ``None``.
+    :param budgets: per pattern match time budgets.
+    """
+
+    def __init__(self, maxsize=512, on_unsafe='reject', budget=None,
+                 budgets=None, flags=0):
+        if on_unsafe not in ('reject', 'rewrite', 'allow'):
+            raise ValueError('Invalid on_unsafe value %r' % on_unsafe)
+        self.maxsize = maxsize
+        self.on_unsafe = on_unsafe
+        self.budget = budget
+        self.budgets = dict(budgets or {})
+        self.flags = flags
+        self._patterns = OrderedDict()
+        self._blacklist = set()
+        self._lock = threading.Lock()
+        self.clear_stats()
+
+    def clear_stats(self):
+        self.hits = self.misses = self.evictions = 0
+        self.rejected = self.rewritten = self.over_budget_count = 0
+
+    def clear(self):
+        """Drop all compiled patterns and the blacklist."""
+        with self._lock:
+            self._patterns.clear()
+            self._blacklist.clear()
+
+    def compile(self, pattern):
+        """Return the compiled, screened ``pattern``.
+
+        :raises UnsafeRegexError: if the pattern is rejected.
+        :raises re.error: if the pattern is invalid.
+        """
+        with self._lock:
+            try:
+                compiled = self._patterns.pop(pattern)
+            except KeyError:
+                pass
+            else:
+                self._patterns[pattern] = compiled
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            if pattern in self._blacklist:
+                self.rejected += 1
+                raise UnsafeRegexError(pattern, 'exceeded its time budget')
+
+        compiled = self._compile(pattern)
+
+        with self._lock:
+            self._patterns[pattern] = compiled
+            while len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def _compile(self, pattern):
+        source = pattern
+        spans = find_nested_quantifiers(pattern)
+        if spans and self.on_unsafe != 'allow':
+            if self.on_unsafe == 'rewrite' and ATOMIC_GROUPS and all(
+                    is_atomic_safe(pattern, span, self.flags)
+                    for span in spans):
+                pattern = make_atomic(pattern, spans)
+                self.rewritten += 1
+            else:
+                self.rejected += 1
+                raise UnsafeRegexError(source, 'nested quantifiers at %s' %
+                                       ', '.join('%d-%d' % s for s in spans))
+        regex = re.compile(pattern, self.flags)
+        budget = self.budgets.get(source, self.budget)
+        if budget is not None:
+            return BudgetedPattern(self, source, regex, budget)
+        return regex
+
+    def over_budget(self, pattern):
+        """Blacklist a pattern which exceeded its match time budget."""
+        with self._lock:
+            self.over_budget_count += 1
+            self._blacklist.add(pattern)
+            self._patterns.pop(pattern, None)
+
+    def stats(self):
+        """Return cache and rejection metrics."""
+        return {
+            'size': len(self._patterns),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'rejected': self.rejected,
+            'rewritten': self.rewritten,
+            'over_budget': self.over_budget_count,
+            'blacklisted': len(self._blacklist),
+        }
+
+
+regex_cache = RegexCache()
+"""Cache shared by the walkers compiling :class:`RegexValue` patterns."""
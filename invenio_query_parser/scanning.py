@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Character classes of the linear scans of queries.
+
+:mod:`~invenio_query_parser.validation` and
+:mod:`~invenio_query_parser.incremental` read queries one character at a
+time, following how the grammar reads them without running it.  They
+share the classes below.
+"""
+
+import re
+
+QUOTES = '"\'/'
+"""Characters starting a quoted value."""
+
+# What may come next: a value, the rest of a word, or either of them
+# depending on how the grammar read the preceding characters.
+VALUE, WORD, EITHER = range(3)
+
+NEXT = dict.fromkeys(':', VALUE)
+"""What may come after a character, :data:`WORD` if it is not a key."""
+NEXT.update(dict.fromkeys('()-+|>', EITHER))
+
+NOT_KEYWORD = re.compile(r'\S+\b:', re.U)
+"""``word:`` read as a value when ``word`` is not a keyword."""
+
+RUN = re.compile(r'\S*', re.U)
+"""The rest of a word."""
+
+AMBIGUOUS = re.compile('[()%s]' % re.escape(QUOTES))
+"""Characters whose meaning inside ``word:`` depends on the keywords."""
+
+WORD_CHAR = re.compile(r'\w', re.U)
+
+# Ranges are tried first, and only their bounds may be double quoted.
+# Bounds are matched as by ``SimpleRangeValue``, with each run of dashes
+# taken at once: backtracking into the runs is exponential.
+_RANGE_VALUE = re.compile(
+    r'(?:[^\s)(-]|(?=(-+))(?:\1[^\s)(>-]|(?=--)\1))+', re.U)
+
+
+def is_range(query, position):
+    """Return whether the grammar reads a range at ``position``."""
+    found = _RANGE_VALUE.match(query, position)
+    return found is not None and query.startswith('->', found.end())
@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Parse service answering newline-delimited JSON requests.
+
+Start it on a Unix socket or on a localhost TCP port::
+
+    python -m invenio_query_parser.service --unix /run/query-parser.sock
+    python -m invenio_query_parser.service --tcp 7070
+
+TCP hosts other than loopback ones need ``--allow-remote``.
+
+Each request is a line holding a JSON object with the keys:
+
+``query``
+    the query string, required.
+``id``
+    any JSON value, returned with the response.
+``grammar``
+    ``'invenio'``, the default, or ``'spires'``.
+``convert``
+    whether SPIRES operators are converted to Invenio ones; only valid
+    with the ``'spires'`` grammar.
+
+Each response is a line holding the ``id`` and either the ``tree``, as
+built by :class:`~.contrib.spires.walkers.json_tree.JsonTree`, or an
+``error`` with a ``type``, a ``message`` and for syntax errors found
+before parsing the ``position`` of the offending character, see
+:mod:`~.validation`.  Clients may send many
+requests without waiting; responses are written as they complete, so
+they may be out of order.
+
+Requests of all connections are collected in batches of at most
+``batch_size`` requests, waiting at most ``batch_delay`` seconds for a
+batch to fill.  Identical requests queued or being parsed are parsed
+once.  Each batch is parsed by one of ``workers`` worker processes, or
+in the server process if ``workers`` is 0.  When ``max_pending``
+requests are queued the connections are no longer read, so clients are
+slowed down by their full socket buffers.  A connection is not read
+either while ``max_inflight`` of its responses are waiting to be
+written, so clients not reading their responses only hold that many.
+Lines longer than ``max_line`` bytes are answered with an error.
+"""
+
+from __future__ import print_function
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import socket
+import stat
+import sys
+import threading
+
+from .contrib.spires.converter import SpiresToInvenioSyntaxConverter
+from .contrib.spires.walkers.json_tree import JsonTree
+from .converter import InvenioSyntaxConverter
+from .metrics import timer
+from .prefork import prefork_warmup
+from .validation import QuerySyntaxError
+from ._compat import string_types
+
+try:
+    import queue
+except ImportError:  # pragma: no cover (Python 2 specific code)
+    import Queue as queue
+
+try:
+    import socketserver
+except ImportError:  # pragma: no cover (Python 2 specific code)
+    import SocketServer as socketserver
+
+GRAMMARS = ('invenio', 'spires')
+
+_converters = {}
+
+
+def parse_request(grammar, query, convert):
+    """Return the response to a request, without its ``id``."""
+    converter = _converters.get(grammar)
+    if converter is None:
+        converter = _converters[grammar] = (
+            SpiresToInvenioSyntaxConverter() if grammar == 'spires'
+            else InvenioSyntaxConverter())
+    try:
+        tree = converter.parse_query(query)
+        if convert:
+            tree = converter.to_invenio(tree)
+        return {'tree': tree.accept(JsonTree())}
+    except SyntaxError as error:
+        response = {'type': 'SyntaxError', 'message': str(error)}
+        if isinstance(error, QuerySyntaxError):
+            response['position'] = error.position
+        return {'error': response}
+    except Exception as error:
+        return {'error': {'type': type(error).__name__,
+                          'message': str(error)}}
+
+
+def parse_batch(keys):
+    """Return the responses to the ``(grammar, query, convert)`` keys."""
+    return [parse_request(*key) for key in keys]
+
+
+def read_request(line):
+    """Return the ``id`` and the key of a request line.
+
+    :raises ValueError: if the request is invalid; the ``id`` is the
+        ``request_id`` attribute of the exception, if any.
+    """
+    request = json.loads(line.decode('utf-8'))
+    if not isinstance(request, dict):
+        raise ValueError('Request is not a JSON object')
+    request_id = request.get('id')
+    try:
+        query = request['query']
+        grammar = request.get('grammar', 'invenio')
+        convert = bool(request.get('convert', False))
+        if not isinstance(query, string_types):
+            raise ValueError('query is not a string')
+        if grammar not in GRAMMARS:
+            raise ValueError('Unknown grammar %r' % (grammar, ))
+        if convert and grammar != 'spires':
+            raise ValueError('convert needs the spires grammar')
+    except (KeyError, ValueError) as error:
+        if isinstance(error, KeyError):
+            error = ValueError('Missing %s' % error)
+        error.request_id = request_id
+        raise error
+    return request_id, (grammar, query, convert)
+
+
+def encode(request_id, response):
+    """Return the line of a response."""
+    response = dict(response, id=request_id)
+    return (json.dumps(response) + '\n').encode('utf-8')
+
+
+class ParseService(object):
+
+    """Batch, coalesce and parse the requests of all connections.
+
+    :param workers: number of worker processes, the number of CPUs if
+        ``None``; 0 parses in the server process.
+    :param batch_size: maximum number of requests of a batch.
+    :param batch_delay: seconds waited for a batch to fill.
+    :param max_pending: number of requests queued before
+        :meth:`submit` blocks.
+    :param max_batches: number of batches being parsed at once, twice
+        the number of workers by default.
+    """
+
+    def __init__(self, workers=None, batch_size=64, batch_delay=0.001,
+                 max_pending=1024, max_batches=None):
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._queue = queue.Queue(max_pending)
+        self.max_batches = max_batches or 2 * max(workers, 1)
+        self._batches = threading.BoundedSemaphore(self.max_batches)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+        self.requests = 0
+        self.batches = 0
+        self.coalesced = 0
+
+    def start(self):
+        """Warm up the parsers, fork the workers and start batching."""
+        prefork_warmup(freeze=False)
+        if self.workers:
+            self._pool = multiprocessing.Pool(self.workers)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Parse the queued requests and stop the workers."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+    def submit(self, key, callback):
+        """Queue a request; ``callback`` is called with its response.
+
+        Blocks while ``max_pending`` requests are queued.
+        """
+        self._queue.put((key, callback))
+
+    def stats(self):
+        """Return request, batch and coalescing counts."""
+        with self._lock:
+            return {'requests': self.requests, 'batches': self.batches,
+                    'coalesced': self.coalesced,
+                    'pending': self._queue.qsize()}
+
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = timer() + self.batch_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - timer()
+                try:
+                    item = self._queue.get(remaining > 0,
+                                           max(remaining, 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+        # Wait for the batches being parsed.
+        for _ in range(self.max_batches):
+            self._batches.acquire()
+        for _ in range(self.max_batches):
+            self._batches.release()
+
+    def _dispatch(self, batch):
+        keys = []
+        with self._lock:
+            self.requests += len(batch)
+            for key, callback in batch:
+                callbacks = self._inflight.get(key)
+                if callbacks is None:
+                    self._inflight[key] = [callback]
+                    keys.append(key)
+                else:
+                    callbacks.append(callback)
+                    self.coalesced += 1
+            if keys:
+                self.batches += 1
+        if not keys:
+            return
+        self._batches.acquire()
+        if self._pool is None:
+            try:
+                responses = parse_batch(keys)
+            except Exception as error:
+                self._fail(keys, error)
+            else:
+                self._complete(keys, responses)
+            return
+        options = {}
+        if sys.version_info[0] >= 3:
+            # Python 2 pools cannot report failed tasks.
+            options['error_callback'] = functools.partial(self._fail, keys)
+        self._pool.apply_async(
+            parse_batch, (keys, ),
+            callback=functools.partial(self._complete, keys), **options)
+
+    def _fail(self, keys, error):
+        """Answer the requests of a batch that could not be parsed."""
+        self._complete(keys, [{'error': {'type': type(error).__name__,
+                                         'message': str(error)}}] * len(keys))
+
+    def _complete(self, keys, responses):
+        with self._lock:
+            callbacks = [self._inflight.pop(key) for key in keys]
+        self._batches.release()
+        for response, key_callbacks in zip(responses, callbacks):
+            for callback in key_callbacks:
+                callback(response)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    """Read the requests of a connection and write their responses."""
+
+    def handle(self):
+        responses = queue.Queue()
+        inflight = threading.Semaphore(self.server.max_inflight)
+        writer = threading.Thread(target=self.write,
+                                  args=(responses, inflight))
+        writer.start()
+        count = 0
+        limit = self.server.max_line
+        try:
+            while True:
+                line = self.rfile.readline(limit + 1)
+                if not line:
+                    break
+                too_long = len(line) > limit and not line.endswith(b'\n')
+                if too_long:
+                    rest = line
+                    while rest and not rest.endswith(b'\n'):
+                        rest = self.rfile.readline(limit + 1)
+                elif not line.strip():
+                    continue
+                count += 1
+                # Released once the response is written.
+                inflight.acquire()
+                try:
+                    if too_long:
+                        raise ValueError('Request longer than %d bytes'
+                                         % limit)
+                    request_id, key = read_request(line)
+                except ValueError as error:
+                    responses.put(encode(
+                        getattr(error, 'request_id', None),
+                        {'error': {'type': 'ValueError',
+                                   'message': str(error)}}))
+                    continue
+                self.server.service.submit(key, functools.partial(
+                    self.respond, responses, request_id))
+        finally:
+            responses.put(count)
+            writer.join()
+
+    @staticmethod
+    def respond(responses, request_id, response):
+        responses.put(encode(request_id, response))
+
+    def write(self, responses, inflight):
+        """Write responses until as many as requests were written."""
+        written, total, broken = 0, None, False
+        while total is None or written < total:
+            line = responses.get()
+            if isinstance(line, int):
+                total = line
+                continue
+            written += 1
+            if not broken:
+                try:
+                    self.wfile.write(line)
+                    if responses.empty():
+                        self.wfile.flush()
+                except (IOError, OSError):
+                    broken = True
+            inflight.release()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(address, service, max_inflight=256, max_line=65536):
+    """Return a server of ``service`` on a Unix socket path or a TCP
+    ``(host, port)`` address.
+
+    :param max_inflight: responses of a connection waiting to be written
+        before the connection is no longer read.
+    :param max_line: maximum length of a request line in bytes.
+    """
+    if isinstance(address, string_types):
+        if os.path.exists(address) and \
+                stat.S_ISSOCK(os.stat(address).st_mode):
+            os.unlink(address)
+        server = UnixServer(address, RequestHandler)
+    else:
+        server = TCPServer(address, RequestHandler)
+    server.service = service
+    server.max_inflight = max_inflight
+    server.max_line = max_line
+    return server
+
+
+def tcp_address(value):
+    """Parse ``PORT`` or ``HOST:PORT``, the host being localhost."""
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def is_loopback(host):
+    """Return whether ``host`` resolves to a loopback address."""
+    try:
+        return socket.gethostbyname(host).startswith('127.')
+    except (socket.error, UnicodeError):
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--unix', help='Unix socket path')
+    address.add_argument('--tcp', type=tcp_address, help='[HOST:]PORT')
+    parser.add_argument('--workers', type=int,
+                        help='worker processes, 0 to parse in the server')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-delay', type=float, default=1.0,
+                        help='milliseconds waited for a batch to fill')
+    parser.add_argument('--max-pending', type=int, default=1024)
+    parser.add_argument('--max-inflight', type=int, default=256,
+                        help='unwritten responses per connection')
+    parser.add_argument('--max-line', type=int, default=65536,
+                        help='maximum request length in bytes')
+    parser.add_argument('--allow-remote', action='store_true',
+                        help='accept --tcp hosts other than loopback ones')
+    args = parser.parse_args(argv)
+    if args.tcp and not args.allow_remote and not is_loopback(args.tcp[0]):
+        parser.error('%s is not a loopback address, the service has no '
+                     'authentication; pass --allow-remote to listen on it'
+                     % args.tcp[0])
+
+    service = ParseService(args.workers, args.batch_size,
+                           args.batch_delay / 1000.0, args.max_pending)
+    service.start()
+    server = make_server(args.unix or args.tcp, service,
+                         args.max_inflight, args.max_line)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if args.unix:
+            os.unlink(args.unix)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,9 +23,13 @@
 
 """invenio_query_parser tasks"""
 
+import hashlib
 import json
+import os
+import tempfile
 
-valid_keywords = []
+CACHE_FORMAT = 2
+"""Version of the on-disk keyword cache format."""
 
 
 def dotter(d, key, dots):
@@ -58,44 +62,151 @@ def get_dotted_keys(d, key, dots):
     return set(dotted_key[1:].rsplit('.', 1)[0] for dotted_key in dotted_keys)
 
 
-def generate_valid_keywords():
-    """ Parses all files that contain valid elasticsearch keywords
-    and combines them to a list."""
-    global valid_keywords
-    in_context = True
+def keywords_cache_dir():
+    """Return the directory of the on-disk keyword cache, or ``None``.
+
+    ``KEYWORDS_CACHE_DIR`` from the configuration takes precedence over
+    the ``INVENIO_QUERY_PARSER_CACHE_DIR`` environment variable and
+    ``$XDG_CACHE_HOME/invenio-query-parser``.  An empty string disables
+    the cache.
+    """
+    from .config import KEYWORDS_CACHE_DIR
+    if KEYWORDS_CACHE_DIR is not None:
+        return KEYWORDS_CACHE_DIR or None
+    directory = os.environ.get('INVENIO_QUERY_PARSER_CACHE_DIR')
+    if directory is not None:
+        return directory or None
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or
+        os.path.join(os.path.expanduser('~'), '.cache'),
+        'invenio-query-parser')
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as data_file:
+        for chunk in iter(lambda: data_file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _schema_keywords(path):
+    """Return the dotted keywords of a JSON schema."""
+    with open(path) as data_file:
+        data = json.load(data_file)
+    data = data.get('properties')
+    return get_dotted_keys(data, '', [])
+
+
+def _mapping_keywords(path):
+    """Return the dotted keywords of an Elasticsearch mapping."""
+    with open(path) as data_file:
+        data = json.load(data_file)
+    data = data.get('mappings').get('record').get('properties')
+    return get_dotted_keys(data, '', [])
+
+
+def _load_cache(cache_file):
     try:
-        from invenio_base.globals import cfg
-        keyword_mapping = cfg['SEARCH_ELASTIC_KEYWORD_MAPPING']
-        json_schema_paths = cfg['JSON_SCHEMA_PATHS']
-        elastic_config_paths = cfg['ELASTIC_MAPPINGS_PATHS']
-        if valid_keywords:
-            return valid_keywords
-    except (ImportError, RuntimeError):
-        in_context = False
-        from .config import DEFAULT_KEYWORDS as keyword_mapping
-        from .config import JSON_SCHEMA_PATHS as json_schema_paths
-        from .config import ELASTIC_MAPPINGS_PATHS as elastic_config_paths
+        with open(cache_file) as data_file:
+            data = json.load(data_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('format') != CACHE_FORMAT:
+        return None
+    return data
+
+
+def _store_cache(cache_file, entry):
+    directory = os.path.dirname(cache_file)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as data_file:
+            json.dump(dict(entry, format=CACHE_FORMAT), data_file)
+        os.rename(temp, cache_file)
+    except (IOError, OSError):
+        # The cache is an optimization only.
+        pass
+
+
+def file_signature(path):
+    """Return the ``(mtime, size)`` signature of a file."""
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def source_keywords(kind, path):
+    """Return the keywords of a ``'schema'`` or ``'mapping'`` file.
+
+    Keywords are stored in an on-disk cache along with the file's
+    modification time, size and content hash.  Unchanged files are
+    neither read nor parsed; touched files with unchanged content are
+    only hashed.
+    """
+    path = os.path.abspath(path)
+    mtime, size = file_signature(path)
+    cache_file = None
+    directory = keywords_cache_dir()
+    if directory:
+        name = hashlib.sha1(
+            json.dumps([kind, path]).encode('utf-8')).hexdigest()
+        cache_file = os.path.join(directory, 'keywords-%s.json' % name)
+    entry = _load_cache(cache_file) if cache_file else None
+    if entry is not None and entry['mtime'] == mtime and \
+            entry['size'] == size:
+        return frozenset(entry['keywords'])
+
+    digest = _file_digest(path)
+    if entry is None or entry['sha1'] != digest:
+        extract = _schema_keywords if kind == 'schema' else _mapping_keywords
+        entry = {'keywords': sorted(extract(path))}
+    entry.update(mtime=mtime, size=size, sha1=digest)
+    if cache_file:
+        _store_cache(cache_file, entry)
+    return frozenset(entry['keywords'])
+
+
+def mapping_keywords(keyword_mapping):
+    """Return the keywords defined by a keyword mapping."""
     # Get keywords from configuration file
-    keywords = keyword_mapping.keys()
+    keywords = set(keyword_mapping.keys())
     for k in keyword_mapping.values():
         if isinstance(k, dict):
-            keywords += k.keys()
+            keywords.update(k.keys())
+    return keywords
+
+
+def load_keywords(keyword_mapping, json_schema_paths, elastic_config_paths):
+    """Return the set of keywords defined by the given configuration."""
+    keywords = mapping_keywords(keyword_mapping)
     # Get keywords from the json schema
     for path in json_schema_paths:
-        with open(path) as data_file:
-            data = json.load(data_file)
-        data = data.get('properties')
-        dotted_keywords = get_dotted_keys(data, '', [])
-        keywords += dotted_keywords
+        keywords.update(source_keywords('schema', path))
     # Get keywords from elasticsearch mapping
     for path in elastic_config_paths:
-        with open(path) as data_file:
-            data = json.load(data_file)
-        data = data.get('mappings').get('record').get('properties')
-        dotted_keywords = get_dotted_keys(data, '', [])
-        keywords += dotted_keywords
-    if in_context:
-        valid_keywords = set(keywords)
-        return valid_keywords
-    else:
-        return set(keywords)
+        keywords.update(source_keywords('mapping', path))
+    return frozenset(keywords)
+
+
+def keyword_sources():
+    """Return the configured keyword mapping, JSON schema and
+    Elasticsearch mapping paths."""
+    try:
+        from invenio_base.globals import cfg
+        return (cfg['SEARCH_ELASTIC_KEYWORD_MAPPING'],
+                cfg['JSON_SCHEMA_PATHS'],
+                cfg['ELASTIC_MAPPINGS_PATHS'])
+    except (ImportError, RuntimeError):
+        from .config import DEFAULT_KEYWORDS as keyword_mapping
+        from .config import JSON_SCHEMA_PATHS as json_schema_paths
+        from .config import ELASTIC_MAPPINGS_PATHS as elastic_config_paths
+        return keyword_mapping, json_schema_paths, elastic_config_paths
+
+
+def generate_valid_keywords():
+    """ Parses all files that contain valid elasticsearch keywords
+    and combines them to a list."""
+    from .keywords import default_registry
+    return set(default_registry().keywords)
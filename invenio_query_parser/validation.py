@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Linear time syntax checks run before the grammar.
+
+pypeg2 only gives up on a malformed query after trying every
+alternative of the grammar, which makes syntax errors the slowest
+queries to parse.  :func:`invenio` and :func:`spires` scan a query once
+and return a :class:`QuerySyntaxError` for:
+
+* unbalanced parentheses, outside of quoted values;
+* parentheses nested deeper than ``max_depth``: the grammar recurses
+  once per level and fails with a :exc:`RuntimeError` once the
+  interpreter recursion limit is exceeded;
+* with ``quotes``, values starting with ``"``, ``'`` or ``/`` and not
+  closed.  The grammar reads these as plain values, so they are only
+  errors when asked for.
+
+Without ``quotes`` a query is rejected only when the grammar would
+reject it too, or exceed the nesting limit.  Where the meaning of a
+character depends on the keywords, such as a quote or parenthesis
+before the colon of ``word:``, the scan gives up and leaves the query
+to the grammar.  In SPIRES ``find`` queries anything after a trailing
+``and`` or ``or`` is ignored, so their parentheses are not checked
+unless ``quotes`` is set.
+"""
+
+import re
+
+from .scanning import AMBIGUOUS, EITHER, NEXT, NOT_KEYWORD, QUOTES, RUN, \
+    VALUE, WORD, WORD_CHAR, is_range
+
+MAX_DEPTH = 64
+"""Default maximum nesting of parentheses."""
+
+_SPIRES_FIND = re.compile(r'\s*(find|fin|f)\s', re.I | re.U)
+
+
+class QuerySyntaxError(SyntaxError):
+
+    """Syntax error found by the linear scan of a query.
+
+    :param message: description of the error.
+    :param query: the query.
+    :param position: index of the offending character.
+    :param reason: ``'unbalanced'``, ``'unclosed'``, ``'nesting'`` or
+        ``'unterminated'``.
+
+    As for other :exc:`SyntaxError` instances, ``offset`` is one-based.
+    """
+
+    def __init__(self, message, query, position, reason):
+        super(QuerySyntaxError, self).__init__(
+            message, ('<query>', 1, position + 1, query))
+        self.query = query
+        self.position = position
+        self.reason = reason
+
+
+def scan(query, max_depth=MAX_DEPTH, quotes=False, parentheses=True):
+    """Return the first error of ``query``, or ``None``.
+
+    :param max_depth: maximum nesting of parentheses.
+    :param quotes: report unterminated quoted values.
+    :param parentheses: report unbalanced parentheses.
+    """
+    opened = []
+    position = 0
+    length = len(query)
+    expect = VALUE
+    checked = 0
+    while position < length:
+        char = query[position]
+        if char.isspace():
+            expect = VALUE
+            position += 1
+            continue
+        if expect != WORD and position >= checked and \
+                WORD_CHAR.match(char):
+            found = NOT_KEYWORD.match(query, position)
+            if found is None:
+                checked = RUN.match(query, position).end()
+            elif (parentheses or quotes) and \
+                    AMBIGUOUS.search(query, position, found.end()):
+                return None
+            else:
+                checked = found.end()
+        if char in QUOTES and expect != WORD:
+            end = query.find(char, position + 1)
+            if end == -1:
+                if quotes:
+                    return QuerySyntaxError(
+                        'Unterminated %s at position %d' % (char, position),
+                        query, position, 'unterminated')
+            elif expect == VALUE and (
+                    char == '"' or not is_range(query, position)):
+                position = end + 1
+                expect = EITHER
+                continue
+            elif parentheses:
+                return None
+        if char == '(':
+            opened.append(position)
+            if len(opened) > max_depth:
+                return QuerySyntaxError(
+                    'Parentheses nested deeper than %d at position %d' % (
+                        max_depth, position), query, position, 'nesting')
+        elif char == ')':
+            if opened:
+                opened.pop()
+            elif parentheses:
+                return QuerySyntaxError(
+                    'Unbalanced ) at position %d' % position,
+                    query, position, 'unbalanced')
+        expect = NEXT.get(char, WORD)
+        position += 1
+    if opened and parentheses:
+        return QuerySyntaxError(
+            'Unclosed ( at position %d' % opened[-1], query, opened[-1],
+            'unclosed')
+    return None
+
+
+def invenio(query, max_depth=MAX_DEPTH, quotes=False):
+    """Return the first error of an Invenio query, or ``None``."""
+    return scan(query, max_depth, quotes)
+
+
+def spires(query, max_depth=MAX_DEPTH, quotes=False):
+    """Return the first error of a SPIRES query, or ``None``."""
+    return scan(query, max_depth, quotes,
+                quotes or _SPIRES_FIND.match(query) is None)
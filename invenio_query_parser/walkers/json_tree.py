@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Implement JSON tree printer.
+
+Trees become dictionaries of JSON types: every node has a ``type``, the
+name of its class, binary operators have ``left`` and ``right``, unary
+operators ``op`` and leaves ``value``.  ``author:ellis`` becomes::
+
+    {'type': 'KeywordOp',
+     'left': {'type': 'Keyword', 'value': 'author'},
+     'right': {'type': 'Value', 'value': 'ellis'}}
+"""
+
+from ..ast import (
+    AndOp, KeywordOp, OrOp, NotOp, Keyword, Value, SingleQuotedValue,
+    DoubleQuotedValue, ValueQuery, RegexValue, RangeOp, EmptyQuery,
+    GreaterOp, GreaterEqualOp, LowerOp, LowerEqualOp, NestedKeywordsRule,
+    NotKeywordValue, MalformedQuery
+)
+from ..visitor import make_visitor
+
+
+def binary(node, left, right):
+    return {'type': type(node).__name__, 'left': left, 'right': right}
+
+
+def unary(node, op):
+    return {'type': type(node).__name__, 'op': op}
+
+
+def leaf(node):
+    return {'type': type(node).__name__, 'value': node.value}
+
+
+class JsonTree(object):
+    visitor = make_visitor()
+
+    # pylint: disable=W0613,E0102
+
+    @visitor(AndOp)
+    def visit(self, node, left, right):
+        return binary(node, left, right)
+
+    @visitor(OrOp)
+    def visit(self, node, left, right):
+        return binary(node, left, right)
+
+    @visitor(KeywordOp)
+    def visit(self, node, left, right):
+        return binary(node, left, right)
+
+    @visitor(NestedKeywordsRule)
+    def visit(self, node, left, right):
+        return binary(node, left, right)
+
+    @visitor(RangeOp)
+    def visit(self, node, left, right):
+        return binary(node, left, right)
+
+    @visitor(NotOp)
+    def visit(self, node, op):
+        return unary(node, op)
+
+    @visitor(ValueQuery)
+    def visit(self, node, op):
+        return unary(node, op)
+
+    @visitor(GreaterOp)
+    def visit(self, node, op):
+        return unary(node, op)
+
+    @visitor(GreaterEqualOp)
+    def visit(self, node, op):
+        return unary(node, op)
+
+    @visitor(LowerOp)
+    def visit(self, node, op):
+        return unary(node, op)
+
+    @visitor(LowerEqualOp)
+    def visit(self, node, op):
+        return unary(node, op)
+
+    @visitor(Keyword)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(Value)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(SingleQuotedValue)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(DoubleQuotedValue)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(RegexValue)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(NotKeywordValue)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(MalformedQuery)
+    def visit(self, node):
+        return leaf(node)
+
+    @visitor(EmptyQuery)
+    def visit(self, node):
+        return leaf(node)
+
+    # pylint: enable=W0612,E0102
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Compile query trees into record matching predicates.
+
+Records are mappings from field names to a value or a list of values.
+Dotted keywords (``authors.full_name``) descend into nested mappings.
+
+.. code-block:: python
+
+    match = compile_predicate(tree)
+    matching = [record for record in records if match(record)]
+
+Compiled predicates are cached on the tree they were built from.
+
+A keyword applies to every value of a boolean query, as in Invenio:
+``title:(quark or not gluon)`` is ``title:quark or not title:gluon``.
+
+SPIRES trees must be converted with
+:meth:`~invenio_query_parser.contrib.spires.converter.SpiresToInvenioSyntaxConverter.to_invenio`
+first.  Trees with SPIRES operators, malformed parts or invalid regular
+expressions raise
+:exc:`~invenio_query_parser.walkers.sql_compiler.UnsupportedQueryError`.
+"""
+
+import re
+from functools import partial
+
+from ..ast import (
+    AndOp, KeywordOp, OrOp, NotOp, Keyword, Value, SingleQuotedValue,
+    DoubleQuotedValue, ValueQuery, RegexValue, RangeOp, EmptyQuery,
+    GreaterOp, GreaterEqualOp, LowerOp, LowerEqualOp, MalformedQuery,
+    NestedKeywordsRule, NotKeywordValue
+)
+from .._compat import string_types
+from ..contrib.spires.ast import SpiresOp
+from ..regex_cache import regex_cache
+from ..visitor import make_visitor
+from .sql_compiler import UnsupportedQueryError
+
+_TOKENS = re.compile(r'\w+', re.U)
+
+
+def tokenize(text):
+    """Return the set of lowercased words of ``text``."""
+    return frozenset(_TOKENS.findall(text.lower()))
+
+
+def _lookup(record, path):
+    """Yield the values stored under a dotted ``path``."""
+    if isinstance(record, (list, tuple)):
+        for item in record:
+            for value in _lookup(item, path):
+                yield value
+    elif not path:
+        if record is not None:
+            yield record
+    elif isinstance(record, dict):
+        head, _, tail = path.partition('.')
+        if path in record:
+            # Literal dotted field names take precedence.
+            head, tail = path, ''
+        if head in record:
+            for value in _lookup(record[head], tail):
+                yield value
+
+
+def _flatten(record):
+    """Yield every value stored in ``record``."""
+    if isinstance(record, dict):
+        for value in record.values():
+            for item in _flatten(value):
+                yield item
+    elif isinstance(record, (list, tuple)):
+        for value in record:
+            for item in _flatten(value):
+                yield item
+    elif record is not None:
+        yield record
+
+
+class RecordView(object):
+
+    """Lazily computed and memoized views of a record's values.
+
+    ``None`` as a field name stands for all the fields of the record.
+    """
+
+    __slots__ = ('record', '_cache')
+
+    def __init__(self, record):
+        self.record = record
+        self._cache = {}
+
+    def values(self, field):
+        values = self._cache.get(field)
+        if values is not None:
+            return values
+        if field is None:
+            values = _flatten(self.record)
+        elif '.' in field:
+            values = _lookup(self.record, field)
+        else:
+            values = self.record.get(field)
+            if values is None:
+                values = ()
+            elif isinstance(values, string_types):
+                self._cache[field] = values = [values]
+                return values
+            elif not isinstance(values, (list, tuple)):
+                values = (values, )
+        values = self._cache[field] = [
+            value if isinstance(value, string_types) else str(value)
+            for value in values if value is not None
+        ]
+        return values
+
+    def lowered(self, field):
+        key = ('lowered', field)
+        values = self._cache.get(key)
+        if values is None:
+            values = self._cache[key] = [
+                value.lower() for value in self.values(field)]
+        return values
+
+    def text(self, field):
+        """Return all lowercased values of a field as one string."""
+        key = ('text', field)
+        text = self._cache.get(key)
+        if text is None:
+            text = self._cache[key] = '\n'.join(self.lowered(field))
+        return text
+
+    def tokens(self, field):
+        key = ('tokens', field)
+        tokens = self._cache.get(key)
+        if tokens is None:
+            tokens = self._cache[key] = tokenize(self.text(field))
+        return tokens
+
+
+def _number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _comparable(bound):
+    """Return a key function comparing values with ``bound``."""
+    if _number(bound) is not None:
+        return _number
+    return lambda value: value
+
+
+class _Test(object):
+
+    """Value test waiting for the field it applies to.
+
+    ``cost`` is a rough estimate used to order boolean operands so that
+    cheap tests run first.
+    """
+
+    def __init__(self, build, cost):
+        self.build = build
+        self.cost = cost
+
+
+class _Predicate(object):
+
+    def __init__(self, function, cost):
+        self.function = function
+        self.cost = cost
+
+
+class PredicateCompiler(object):
+
+    """Compile a query tree into a ``match(record) -> bool`` function.
+
+    The function also accepts a :class:`RecordView`, which lets several
+    predicates share the work of looking up and tokenizing fields.
+    """
+
+    visitor = make_visitor()
+
+    def compile(self, tree):
+        function = self._bind(tree.accept(self), None).function
+
+        def match(record):
+            if type(record) is not RecordView:
+                record = RecordView(record)
+            return function(record)
+        return match
+
+    @staticmethod
+    def _bind(operand, field):
+        """Return the predicate of an operand applied to ``field``."""
+        if isinstance(operand, _Test):
+            cost = operand.cost + 1 if field is None else operand.cost
+            return _Predicate(operand.build(field), cost)
+        return operand
+
+    def _combine(self, combine, *operands):
+        """Combine predicates, applying a later keyword to pending tests."""
+        if any(isinstance(operand, _Test) for operand in operands):
+            def build(field):
+                return combine(*[self._bind(operand, field)
+                                 for operand in operands]).function
+            return _Test(build, sum(operand.cost for operand in operands))
+        return combine(*operands)
+
+    @staticmethod
+    def _negate(operand):
+        function = operand.function
+        return _Predicate(lambda view: not function(view), operand.cost)
+
+    @staticmethod
+    def _boolean(node_type, left, right):
+        """Flatten chains of the same operator and order them by cost."""
+        operands = []
+        for operand in (left, right):
+            if getattr(operand, 'node_type', None) is node_type:
+                operands.extend(operand.operands)
+            else:
+                operands.append(operand)
+        operands.sort(key=lambda operand: operand.cost)
+        functions = tuple(operand.function for operand in operands)
+        if node_type is AndOp:
+            def function(view):
+                for test in functions:
+                    if not test(view):
+                        return False
+                return True
+        else:
+            def function(view):
+                for test in functions:
+                    if test(view):
+                        return True
+                return False
+        predicate = _Predicate(function, sum(op.cost for op in operands))
+        predicate.operands = operands
+        predicate.node_type = node_type
+        return predicate
+
+    @staticmethod
+    def _compare(compare, bound):
+        key = _comparable(bound)
+        bound = key(bound)
+
+        def build(field):
+            def function(view):
+                for value in view.values(field):
+                    value = key(value)
+                    if value is not None and compare(value, bound):
+                        return True
+                return False
+            return function
+        return _Test(build, 2)
+
+    @staticmethod
+    def _value(node):
+        if '*' in node.value:
+            pattern = re.compile(r'\b%s\b' % '\\w*'.join(
+                re.escape(part) for part in node.value.lower().split('*')
+            ), re.U)
+
+            def build(field):
+                def function(view):
+                    for value in view.lowered(field):
+                        if pattern.search(value):
+                            return True
+                    return False
+                return function
+            return _Test(build, 3)
+
+        terms = tokenize(node.value)
+        if not terms:
+            # Values without words, like ``-``, are never indexed.
+            return _Test(lambda field: lambda view: False, 0)
+
+        def build(field):
+            def function(view):
+                # Cheap substring checks reject most records before the
+                # field gets tokenized.
+                text = view.text(field)
+                for term in terms:
+                    if term not in text:
+                        return False
+                return terms <= view.tokens(field)
+            return function
+        return _Test(build, 1)
+
+    # pylint: disable=W0613,E0102
+
+    @visitor(AndOp)
+    def visit(self, node, left, right):
+        return self._combine(partial(self._boolean, AndOp), left, right)
+
+    @visitor(OrOp)
+    def visit(self, node, left, right):
+        return self._combine(partial(self._boolean, OrOp), left, right)
+
+    @visitor(NotOp)
+    def visit(self, node, op):
+        return self._combine(self._negate, op)
+
+    @visitor(KeywordOp)
+    def visit(self, node, left, right):
+        # Predicates come from keywords inside the value, which apply.
+        return self._bind(right, left)
+
+    @visitor(ValueQuery)
+    def visit(self, node, op):
+        return op
+
+    @visitor(SpiresOp)
+    def visit(self, node, left, right):
+        raise UnsupportedQueryError(
+            'SPIRES trees must be converted with to_invenio first')
+
+    @visitor(NestedKeywordsRule)
+    def visit(self, node, left, right):
+        raise UnsupportedQueryError('Nested keywords are not supported')
+
+    @visitor(MalformedQuery)
+    def visit(self, node):
+        raise UnsupportedQueryError('Malformed query %r' % node.value)
+
+    @visitor(Keyword)
+    def visit(self, node):
+        return node.value
+
+    @visitor(NotKeywordValue)
+    def visit(self, node):
+        return self._value(node)
+
+    @visitor(Value)
+    def visit(self, node):
+        return self._value(node)
+
+    @visitor(SingleQuotedValue)
+    def visit(self, node):
+        phrase = node.value.lower()
+
+        def build(field):
+            def function(view):
+                for value in view.lowered(field):
+                    if phrase in value:
+                        return True
+                return False
+            return function
+        return _Test(build, 2)
+
+    @visitor(DoubleQuotedValue)
+    def visit(self, node):
+        phrase = node.value.lower()
+
+        def build(field):
+            def function(view):
+                return phrase in view.lowered(field)
+            return function
+        return _Test(build, 1)
+
+    @visitor(RegexValue)
+    def visit(self, node):
+        try:
+            pattern = regex_cache.compile(node.value)
+        except re.error as error:
+            raise UnsupportedQueryError(
+                'Invalid regular expression %r: %s' % (node.value, error))
+
+        def build(field):
+            def function(view):
+                for value in view.values(field):
+                    if pattern.search(value):
+                        return True
+                return False
+            return function
+        return _Test(build, 4)
+
+    @visitor(RangeOp)
+    def visit(self, node, left, right):
+        low, high = node.left.value, node.right.value
+        key = _comparable(low)
+        if _number(high) is None:
+            key = _comparable(high)
+        low, high = key(low), key(high)
+
+        def build(field):
+            def function(view):
+                for value in view.values(field):
+                    value = key(value)
+                    if value is not None and low <= value <= high:
+                        return True
+                return False
+            return function
+        return _Test(build, 2)
+
+    @visitor(GreaterOp)
+    def visit(self, node, op):
+        return self._compare(lambda value, bound: value > bound,
+                             node.op.value)
+
+    @visitor(GreaterEqualOp)
+    def visit(self, node, op):
+        return self._compare(lambda value, bound: value >= bound,
+                             node.op.value)
+
+    @visitor(LowerOp)
+    def visit(self, node, op):
+        return self._compare(lambda value, bound: value < bound,
+                             node.op.value)
+
+    @visitor(LowerEqualOp)
+    def visit(self, node, op):
+        return self._compare(lambda value, bound: value <= bound,
+                             node.op.value)
+
+    @visitor(EmptyQuery)
+    def visit(self, node):
+        return _Predicate(lambda view: True, 0)
+
+    # pylint: enable=W0612,E0102
+
+
+def compile_predicate(tree, compiler=None):
+    """Return the cached ``match(record)`` function of ``tree``.
+
+    Only predicates of the default compiler are cached; a custom
+    ``compiler`` compiles the tree on every call.
+    """
+    if compiler is not None:
+        return compiler.compile(tree)
+    try:
+        return tree._predicate
+    except AttributeError:
+        match = tree._predicate = PredicateCompiler().compile(tree)
+        return match
@@ -28,7 +28,10 @@ from ..ast import (
     NotOp, Keyword, Value,
     SingleQuotedValue,
     DoubleQuotedValue,
-    RegexValue, RangeOp
+    RegexValue, RangeOp,
+    ValueQuery, EmptyQuery,
+    GreaterOp, GreaterEqualOp,
+    LowerOp, LowerEqualOp, MalformedQuery
 )
 from ..visitor import make_visitor
 
@@ -60,6 +63,9 @@ class TreePrinter(object):
 
     @visitor(Value)
     def visit(self, node):
+        # Several words are grouped, e.g. the value of SPIRES ``t a b``.
+        if len(node.value.split()) > 1:
+            return "(%s)" % node.value
         return "%s" % node.value
 
     @visitor(SingleQuotedValue)
@@ -78,4 +84,32 @@ class TreePrinter(object):
     def visit(self, node, left, right):
         return "%s->%s" % (left, right)
 
+    @visitor(ValueQuery)
+    def visit(self, node, op):
+        return op
+
+    @visitor(GreaterOp)
+    def visit(self, node, op):
+        return '>%s' % op
+
+    @visitor(GreaterEqualOp)
+    def visit(self, node, op):
+        return '>=%s' % op
+
+    @visitor(LowerOp)
+    def visit(self, node, op):
+        return '<%s' % op
+
+    @visitor(LowerEqualOp)
+    def visit(self, node, op):
+        return '<=%s' % op
+
+    @visitor(EmptyQuery)
+    def visit(self, node):
+        return ''
+
+    @visitor(MalformedQuery)
+    def visit(self, node):
+        return node.value
+
     # pylint: enable=W0612,E0102
@@ -27,6 +27,20 @@ from .. import ast, parser
 from ..visitor import make_visitor
 
 
+def fold(tree, children):
+    """Return ``tree`` combined with the boolean ``children``.
+
+    The children are the :class:`~invenio_query_parser.ast.BinaryOp`
+    nodes of the operands following ``tree`` in a query, with no left
+    operand.
+    """
+    # Build the boolean expression, left to right
+    # x and y or z and ... --> ((x and y) or z) and ...
+    for booleanNode in children:
+        tree = type(booleanNode)(tree, booleanNode.right)
+    return tree
+
+
 class PypegConverter(object):
     visitor = make_visitor()
 
@@ -134,13 +148,7 @@ class PypegConverter(object):
 
     @visitor(parser.Query)
     def visit(self, node, children):
-        # Build the boolean expression, left to right
-        # x and y or z and ... --> ((x and y) or z) and ...
-        tree = children[0]
-        for booleanNode in children[1:]:
-            booleanNode.left = tree
-            tree = booleanNode
-        return tree
+        return fold(children[0], children[1:])
 
     @visitor(parser.EmptyQueryRule)
     def visit(self, node):
@@ -26,7 +26,8 @@
 from ..ast import (
     AndOp, KeywordOp, OrOp, NotOp, Keyword, Value, SingleQuotedValue,
     DoubleQuotedValue, ValueQuery, RegexValue, RangeOp, EmptyQuery,
-    GreaterOp, GreaterEqualOp, LowerOp, LowerEqualOp
+    GreaterOp, GreaterEqualOp, LowerOp, LowerEqualOp,
+    MalformedQuery
 )
 from ..visitor import make_visitor
 
@@ -100,4 +101,8 @@ class TreeRepr(object):
     def visit(self, node):
         return '__empty__'
 
+    @visitor(MalformedQuery)
+    def visit(self, node):
+        return '__malformed__(%s)' % node.value
+
     # pylint: enable=W0612,E0102
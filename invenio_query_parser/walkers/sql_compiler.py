@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Compile query trees into parameterized SQLite WHERE clauses.
+
+The compiler walks the tree once, collecting the bind values and a
+canonical *shape* of the query in which every value is replaced by a
+placeholder.  The SQL text is rendered from the shape and cached, so
+queries differing only in their values produce the very same statement
+string and hit the prepared statement cache of :mod:`sqlite3`.
+
+.. code-block:: python
+
+    compiler = SQLCompiler({'title': 'title', 'author': 'author'},
+                           fts_table='records_fts')
+    where, params = compiler.compile(tree)
+    connection.execute('SELECT * FROM records WHERE ' + where, params)
+"""
+
+import threading
+
+from ..ast import (
+    AndOp, KeywordOp, OrOp, NotOp, Keyword, Value, SingleQuotedValue,
+    DoubleQuotedValue, ValueQuery, RegexValue, RangeOp, EmptyQuery,
+    GreaterOp, GreaterEqualOp, LowerOp, LowerEqualOp, MalformedQuery,
+    NestedKeywordsRule, NotKeywordValue
+)
+from .._compat import OrderedDict
+from ..regex_cache import regex_cache
+from ..visitor import make_visitor
+
+
+def sqlite_regexp(pattern, value):
+    """Implement the ``REGEXP`` operator for :mod:`sqlite3` connections.
+
+    Register it with ``connection.create_function('REGEXP', 2,
+    sqlite_regexp)`` before running queries containing regex values.
+    Patterns are compiled through the shared, screened
+    :data:`~invenio_query_parser.regex_cache.regex_cache`.
+    """
+    if value is None:
+        return False
+    return regex_cache.compile(pattern).search(value) is not None
+
+
+def quote_identifier(name):
+    """Quote a table or column name."""
+    return '"%s"' % name.replace('"', '""')
+
+
+def like_pattern(value):
+    """Translate a value with ``*`` wildcards to a ``LIKE`` pattern."""
+    value = value.replace('\\', '\\\\').replace('%', '\\%').replace(
+        '_', '\\_')
+    return '%%%s%%' % value.replace('*', '%')
+
+
+def fts_pattern(value):
+    """Translate a value to an FTS5 phrase, keeping a trailing wildcard."""
+    prefix = value.endswith('*')
+    if prefix:
+        value = value[:-1]
+    phrase = '"%s"' % value.replace('"', '""')
+    return phrase + ' *' if prefix else phrase
+
+
+class UnsupportedQueryError(ValueError):
+
+    """The query contains nodes that the walker cannot compile."""
+
+
+class _Term(object):
+
+    """Value waiting for the keyword it will be compared with."""
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+
+class _Condition(object):
+
+    """Compiled condition: canonical shape and bind values."""
+
+    def __init__(self, shape, params):
+        self.shape = shape
+        self.params = params
+
+
+class _Pending(object):
+
+    """Free text condition, which a keyword may apply to a column instead.
+
+    ``build(column)`` returns the :class:`_Condition`, of the free text
+    query when ``column`` is ``None``.
+    """
+
+    def __init__(self, build):
+        self.build = build
+
+
+def _bind(operand, column):
+    """Return the condition of an operand for ``column``."""
+    if isinstance(operand, _Pending):
+        return operand.build(column)
+    return operand
+
+
+class SQLCompiler(object):
+
+    """Compile a query tree into a WHERE clause and its bind values.
+
+    :param columns: mapping of query keywords to column names.
+    :param fts_table: FTS5 table (sharing rowids with the queried table)
+        used for free text queries.
+    :param cache_size: number of rendered statements kept.
+
+    A keyword applies to every value of a boolean query, as in Invenio:
+    ``title:(quark or not gluon)`` is
+    ``title:quark or not title:gluon``.  Trees containing
+    :class:`~invenio_query_parser.ast.MalformedQuery` or
+    :class:`~invenio_query_parser.ast.NestedKeywordsRule` nodes raise
+    :exc:`UnsupportedQueryError`.
+    """
+
+    visitor = make_visitor()
+
+    _operators = {
+        'like': "%s LIKE ? ESCAPE '\\'",
+        'equal': '%s = ?',
+        'regexp': '%s REGEXP ?',
+        'range': '%s BETWEEN ? AND ?',
+        '>': '%s > ?',
+        '>=': '%s >= ?',
+        '<': '%s < ?',
+        '<=': '%s <= ?',
+    }
+
+    def __init__(self, columns, fts_table=None, cache_size=256):
+        self.columns = dict((k.lower(), v) for k, v in columns.items())
+        self.fts_table = fts_table
+        self.cache_size = cache_size
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, tree):
+        """Return ``(where, params)`` for the given tree."""
+        condition = _bind(tree.accept(self), None)
+        if not isinstance(condition, _Condition):
+            raise ValueError('Query does not define a condition')
+        shape = condition.shape
+        with self._lock:
+            where = self._statements.pop(shape, None)
+            if where is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if where is None:
+            where = self.render(shape)
+        with self._lock:
+            self._statements.pop(shape, None)
+            if len(self._statements) >= self.cache_size:
+                self._statements.popitem(last=False)
+            self._statements[shape] = where
+        return where, condition.params
+
+    def stats(self):
+        """Return statement cache metrics."""
+        with self._lock:
+            return {'size': len(self._statements),
+                    'maxsize': self.cache_size,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def render(self, shape):
+        """Render the SQL text of a query shape."""
+        kind = shape[0]
+        if kind in ('and', 'or'):
+            return '(%s %s %s)' % (self.render(shape[1]), kind.upper(),
+                                   self.render(shape[2]))
+        if kind == 'not':
+            return 'NOT %s' % self.render(shape[1])
+        if kind == 'fts':
+            table = quote_identifier(self.fts_table)
+            return 'rowid IN (SELECT rowid FROM %s WHERE %s MATCH ?)' % (
+                table, table)
+        if kind == 'all':
+            return '1'
+        return self._operators[shape[2]] % quote_identifier(shape[1])
+
+    def _column(self, keyword):
+        try:
+            return self.columns[keyword.lower()]
+        except KeyError:
+            raise ValueError('Unknown keyword %r' % keyword)
+
+    def _free_text(self, term):
+        if self.fts_table is None:
+            raise ValueError('Free text queries require an FTS table')
+        if term.kind not in ('word', 'phrase', 'exact'):
+            raise ValueError('Unsupported free text value')
+        return _Condition(('fts',), [fts_pattern(term.value)])
+
+    def _match(self, column, term):
+        if not isinstance(term, _Term):
+            raise ValueError('Unsupported value for column %r' % column)
+        if term.kind == 'range':
+            return _Condition(('match', column, 'range'),
+                              [term.value[0].value, term.value[1].value])
+        if term.kind in ('>', '>=', '<', '<='):
+            return _Condition(('match', column, term.kind),
+                              [term.value.value])
+        if term.kind == 'regex':
+            return _Condition(('match', column, 'regexp'), [term.value])
+        if term.kind == 'exact':
+            return _Condition(('match', column, 'equal'), [term.value])
+        return _Condition(('match', column, 'like'),
+                          [like_pattern(term.value)])
+
+    def _combine(self, kind, *operands):
+        """Combine conditions, applying a later keyword to pending ones."""
+        if any(isinstance(operand, _Pending) for operand in operands):
+            return _Pending(lambda column: self._combine(
+                kind, *[_bind(operand, column) for operand in operands]))
+        return _Condition((kind,) + tuple(op.shape for op in operands),
+                          sum((op.params for op in operands), []))
+
+    # pylint: disable=W0613,E0102
+
+    @visitor(AndOp)
+    def visit(self, node, left, right):
+        return self._combine('and', left, right)
+
+    @visitor(OrOp)
+    def visit(self, node, left, right):
+        return self._combine('or', left, right)
+
+    @visitor(NotOp)
+    def visit(self, node, op):
+        return self._combine('not', op)
+
+    @visitor(KeywordOp)
+    def visit(self, node, left, right):
+        if isinstance(right, _Pending):
+            return right.build(left)
+        if isinstance(right, _Condition):
+            # The keywords inside the query apply.
+            return right
+        return self._match(left, right)
+
+    @visitor(ValueQuery)
+    def visit(self, node, op):
+        return _Pending(lambda column: self._free_text(op) if column is None
+                        else self._match(column, op))
+
+    @visitor(NestedKeywordsRule)
+    def visit(self, node, left, right):
+        raise UnsupportedQueryError('Nested keywords are not supported')
+
+    @visitor(MalformedQuery)
+    def visit(self, node):
+        raise UnsupportedQueryError('Malformed query %r' % node.value)
+
+    @visitor(Keyword)
+    def visit(self, node):
+        return self._column(node.value)
+
+    @visitor(Value)
+    def visit(self, node):
+        return _Term('word', node.value)
+
+    @visitor(NotKeywordValue)
+    def visit(self, node):
+        return _Term('word', node.value)
+
+    @visitor(SingleQuotedValue)
+    def visit(self, node):
+        return _Term('phrase', node.value)
+
+    @visitor(DoubleQuotedValue)
+    def visit(self, node):
+        return _Term('exact', node.value)
+
+    @visitor(RegexValue)
+    def visit(self, node):
+        return _Term('regex', node.value)
+
+    @visitor(RangeOp)
+    def visit(self, node, left, right):
+        return _Term('range', (left, right))
+
+    @visitor(GreaterOp)
+    def visit(self, node, op):
+        return _Term('>', op)
+
+    @visitor(GreaterEqualOp)
+    def visit(self, node, op):
+        return _Term('>=', op)
+
+    @visitor(LowerOp)
+    def visit(self, node, op):
+        return _Term('<', op)
+
+    @visitor(LowerEqualOp)
+    def visit(self, node, op):
+        return _Term('<=', op)
+
+    @visitor(EmptyQuery)
+    def visit(self, node):
+        return _Condition(('all',), [])
+
+    # pylint: enable=W0612,E0102
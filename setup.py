@@ -92,6 +92,12 @@ setup(
         'tests': tests_require,
     },
     tests_require=tests_require,
+    entry_points={
+        'console_scripts': [
+            'spires-to-invenio = '
+            'invenio_query_parser.contrib.spires.cli:main',
+        ],
+    },
     cmdclass={'test': PyTest},
     classifiers=[
         'Programming Language :: Python :: 2',
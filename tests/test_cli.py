@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the bulk SPIRES conversion command."""
+
+import gzip
+import json
+import os
+
+import pytest
+
+from invenio_query_parser.contrib.spires import cli
+
+QUERIES = ['find a ellis', 'find t higgs boson and date > 2000',
+           'author:(ellis', 'year:2000->2005', '']
+
+
+def write_input(tmpdir, compress):
+    path = str(tmpdir.join('queries.gz' if compress else 'queries.txt'))
+    data = ('\n'.join(QUERIES) + '\n').encode('utf-8')
+    with (gzip.open(path, 'wb') if compress else open(path, 'wb')) as out:
+        out.write(data)
+    return path
+
+
+def read_jsonl(path):
+    with open(path, 'rb') as stream:
+        return [json.loads(line.decode('utf-8')) for line in stream]
+
+
+class TestConvert(object):
+
+    def test_convert_lines(self):
+        results = cli.convert_lines(QUERIES)
+        assert results[:2] == [
+            ('author:"ellis"', None),
+            ('(title:(higgs boson) and year:>2000)', None),
+        ]
+        assert results[2][0] is None
+        assert results[2][1].startswith('SyntaxError: ')
+        assert results[3:] == [('year:2000->2005', None), ('', None)]
+
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_jsonl(self, tmpdir, compress):
+        output = str(tmpdir.join('out.jsonl'))
+        failures = cli.convert([write_input(tmpdir, compress)], output,
+                               workers=0, chunk_size=2, progress=0)
+        assert failures == 1
+        records = read_jsonl(output)
+        assert [record['line'] for record in records] == [1, 2, 3, 4, 5]
+        assert [record['input'] for record in records] == QUERIES
+        assert records[0]['output'] == 'author:"ellis"'
+        assert 'error' in records[2] and 'output' not in records[2]
+
+    def test_tsv(self, tmpdir):
+        output = str(tmpdir.join('out.tsv'))
+        cli.main(['-f', 'tsv', '-j', '0', '--progress', '0', '-o', output,
+                  write_input(tmpdir, False)])
+        with open(output) as stream:
+            rows = [line.rstrip('\n').split('\t') for line in stream]
+        assert rows[0] == ['1', 'find a ellis', 'author:"ellis"', '']
+        assert rows[2][2] == '' and rows[2][3].startswith('SyntaxError')
+        assert cli.escape('a\tb\\c\n') == 'a\\tb\\\\c\\n'
+
+    def test_resume(self, tmpdir, monkeypatch):
+        path = write_input(tmpdir, True)
+        expected = str(tmpdir.join('expected.jsonl'))
+        cli.convert([path], expected, workers=0, chunk_size=2, progress=0)
+
+        output = str(tmpdir.join('out.jsonl'))
+        checkpoint = str(tmpdir.join('checkpoint.json'))
+        convert_lines = cli.convert_lines
+        calls = []
+
+        def interrupted(queries):
+            calls.append(queries)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return convert_lines(queries)
+
+        monkeypatch.setattr(cli, 'convert_lines', interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            cli.convert([path], output, workers=0, chunk_size=2,
+                        checkpoint_path=checkpoint, progress=0)
+        monkeypatch.undo()
+        with open(checkpoint) as stream:
+            assert json.load(stream)['lines'] == 2
+        # Bytes written after the checkpoint are dropped on resume.
+        with open(output, 'ab') as stream:
+            stream.write(b'partial')
+
+        cli.convert([path], output, workers=0, chunk_size=2,
+                    checkpoint_path=checkpoint, progress=0)
+        assert not os.path.exists(checkpoint)
+        assert read_jsonl(output) == read_jsonl(expected)
+
+        with open(checkpoint, 'w') as stream:
+            json.dump({'inputs': ['other'], 'lines': 0, 'failures': 0,
+                       'output_bytes': 0}, stream)
+        with pytest.raises(ValueError):
+            cli.convert([path], output, workers=0,
+                        checkpoint_path=checkpoint, progress=0)
+
+    def test_write_error(self, tmpdir, monkeypatch):
+        path = write_input(tmpdir, False)
+        output = str(tmpdir.join('out.jsonl'))
+        checkpoint = str(tmpdir.join('checkpoint.json'))
+        open_output = cli.open_output
+
+        class Full(object):
+            def __init__(self, stream):
+                self.stream = stream
+                self.writes = 0
+
+            def write(self, data):
+                self.writes += 1
+                if self.writes == 2:
+                    raise IOError(28, 'No space left on device')
+                return self.stream.write(data)
+
+            def __getattr__(self, name):
+                return getattr(self.stream, name)
+
+        monkeypatch.setattr(cli, 'open_output',
+                            lambda *args: Full(open_output(*args)))
+        with pytest.raises(IOError):
+            cli.convert([path], output, workers=0, chunk_size=2,
+                        checkpoint_path=checkpoint, progress=0)
+        monkeypatch.undo()
+        with open(checkpoint) as stream:
+            assert json.load(stream)['lines'] == 2
+        assert [record['line'] for record in read_jsonl(output)] == [1, 2]
+
+        os.remove(output)
+        with pytest.raises(ValueError):
+            cli.convert([path], output, workers=0,
+                        checkpoint_path=checkpoint, progress=0)
+        with pytest.raises(SystemExit):
+            cli.main(['-j', '0', '--progress', '0', '-o', output,
+                      '--checkpoint', checkpoint, path])
+
+    def test_workers(self, tmpdir):
+        output = str(tmpdir.join('out.jsonl'))
+        cli.convert([write_input(tmpdir, False)], output, workers=2,
+                    chunk_size=1, progress=0)
+        assert [record['input'] for record in read_jsonl(output)] == \
+            QUERIES
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Concurrency tests of the parse, convert and print pipeline."""
+
+import threading
+
+from invenio_query_parser.ast import Keyword
+from invenio_query_parser.config import DEFAULT_KEYWORDS
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresParserConfig, SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParserConfig
+from invenio_query_parser.generator import QueryGenerator
+from invenio_query_parser.keywords import KeywordRegistry
+
+
+def pipeline(converter, query):
+    try:
+        tree = converter.parse_query(query)
+        if hasattr(converter, 'to_invenio'):
+            tree = converter.to_invenio(tree)
+        return converter.print_tree(tree)
+    except Exception as error:
+        return '!%s' % type(error).__name__
+
+
+def run_threads(converter, queries, threads=4, rounds=2):
+    """Return the results of each thread running all queries."""
+    start = threading.Event()
+    results = [[] for _ in range(threads)]
+
+    def work(index):
+        start.wait()
+        for _ in range(rounds):
+            results[index].append(
+                [pipeline(converter, query) for query in queries])
+
+    workers = [threading.Thread(target=work, args=(index,))
+               for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join()
+    return [run for thread in results for run in thread]
+
+
+def keywords_of(node, found):
+    if isinstance(node, Keyword):
+        found.append(node)
+    for name in ('left', 'right', 'op'):
+        child = getattr(node, name, None)
+        if child is not None:
+            keywords_of(child, found)
+    return found
+
+
+class TestConcurrency(object):
+
+    def test_shared_converters(self):
+        for grammar, converter in (
+                ('invenio', InvenioSyntaxConverter()),
+                ('spires', SpiresToInvenioSyntaxConverter())):
+            queries = list(QueryGenerator(7).generate(25, grammar))
+            expected = [pipeline(converter, query) for query in queries]
+            for results in run_threads(converter, queries):
+                assert results == expected
+
+    def test_keyword_swaps(self):
+        registry = KeywordRegistry(DEFAULT_KEYWORDS)
+        extended = dict(DEFAULT_KEYWORDS, unused={})
+        converter = InvenioSyntaxConverter(ParserConfig(registry=registry))
+        queries = list(QueryGenerator(11).generate(20))
+        expected = [pipeline(converter, query) for query in queries]
+        done = threading.Event()
+
+        def swap():
+            while not done.is_set():
+                registry.set_keyword_mapping(extended)
+                registry.set_keyword_mapping(DEFAULT_KEYWORDS)
+
+        swapper = threading.Thread(target=swap)
+        swapper.start()
+        try:
+            runs = run_threads(converter, queries, rounds=1)
+        finally:
+            done.set()
+            swapper.join()
+        for results in runs:
+            assert results == expected
+        assert registry.version > 2
+
+    def test_parse_does_not_share_nodes(self):
+        converter = SpiresToInvenioSyntaxConverter(SpiresParserConfig())
+        tree = converter.parse_query('find a x and y and not z')
+        found = keywords_of(tree, [])
+        assert len(found) == 3
+        assert len(set(map(id, found))) == 3
+        first = converter.parse_query('author:x and y or z')
+        second = converter.parse_query('author:x and y or z')
+        assert first == second
+        assert first is not second
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for per-instance parser configuration."""
+
+from invenio_query_parser import parser
+from invenio_query_parser.ast import AndOp, Keyword, KeywordOp, Value, \
+    ValueQuery
+from invenio_query_parser.contrib.spires.ast import SpiresOp
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresParserConfig, SpiresToInvenioSyntaxConverter
+from invenio_query_parser.contrib.spires.walkers.spires_to_invenio import \
+    SpiresToInvenio
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParseCache, ParserConfig
+from invenio_query_parser.keywords import KeywordRegistry
+from invenio_query_parser.metrics import MetricsCollector
+from invenio_query_parser.prefork import prefork_warmup
+
+
+class TestParserConfig(object):
+
+    def test_tenants(self):
+        books = InvenioSyntaxConverter(ParserConfig({'isbn': []}))
+        papers = InvenioSyntaxConverter(ParserConfig({'doi': []}))
+        assert books.parse_query('isbn: 123') == \
+            KeywordOp(Keyword('isbn'), Value('123'))
+        assert papers.parse_query('isbn: 123') == \
+            AndOp(ValueQuery(Value('isbn:')), ValueQuery(Value('123')))
+
+    def test_default(self):
+        converter = InvenioSyntaxConverter()
+        assert converter.parse_query('author: ellis') == \
+            KeywordOp(Keyword('author'), Value('ellis'))
+
+    def test_shared_matchers(self):
+        first = ParserConfig({'isbn': [], 'doi': []})
+        second = ParserConfig({'doi': [], 'isbn': []})
+        first.warmup()
+        sets = first.keyword_sets()
+        assert second.keyword_sets() == sets
+        rule = parser.KeywordRule.grammar.thing
+        assert rule in sets['invenio']._matchers
+
+    def test_spires_keywords(self):
+        config = SpiresParserConfig(spires_keywords={'ti': 'title'})
+        converter = SpiresToInvenioSyntaxConverter(config)
+        tree = converter.parse_query('find ti quark')
+        assert tree == SpiresOp(Keyword('ti'), Value('quark'))
+        assert tree.accept(SpiresToInvenio(config.spires_keywords)) == \
+            KeywordOp(Keyword('title'), Value('quark'))
+        assert converter.parse_query('find t quark') != \
+            SpiresOp(Keyword('t'), Value('quark'))
+        assert SpiresToInvenioSyntaxConverter().parse_query(
+            'find t quark') == SpiresOp(Keyword('t'), Value('quark'))
+
+
+class TestParseCache(object):
+
+    def test_hits(self):
+        cache = ParseCache()
+        metrics = MetricsCollector(caches={})
+        converter = InvenioSyntaxConverter(cache=cache, metrics=metrics)
+        tree = converter.parse_query('author: ellis')
+        assert converter.parse_query('author: ellis') is tree
+        assert cache.stats() == {'size': 1, 'maxsize': 1024, 'hits': 1,
+                                 'misses': 1}
+        assert metrics.cache_stats() == {'parse': (1, 1)}
+
+    def test_grammars_and_keywords(self):
+        cache = ParseCache()
+        registry = KeywordRegistry({'isbn': []})
+        books = InvenioSyntaxConverter(ParserConfig(registry=registry),
+                                       cache=cache)
+        spires = SpiresToInvenioSyntaxConverter(cache=cache)
+        assert books.parse_query('isbn: 1') == \
+            KeywordOp(Keyword('isbn'), Value('1'))
+        assert spires.parse_query('isbn: 1') != \
+            books.parse_query('isbn: 1')
+        registry.set_keyword_mapping({'doi': []})
+        assert books.parse_query('isbn: 1') == \
+            AndOp(ValueQuery(Value('isbn:')), ValueQuery(Value('1')))
+        assert len(cache) == 3
+
+    def test_eviction(self):
+        cache = ParseCache(maxsize=2)
+        converter = InvenioSyntaxConverter(cache=cache)
+        first = converter.parse_query('a')
+        converter.parse_query('b')
+        assert converter.parse_query('a') is first
+        converter.parse_query('c')
+        assert len(cache) == 2
+        assert converter.parse_query('a') is first
+        assert cache.stats()['hits'] == 2
+
+    def test_prefork_warmup(self):
+        cache = ParseCache()
+        converters = prefork_warmup(['author: ellis', 'find a ellis', '('],
+                                    cache=cache, freeze=False)
+        assert len(converters) == 2
+        assert len(cache) == 4
+        tree = converters[0].parse_query('author: ellis')
+        assert cache.stats()['hits'] == 1
+        assert tree == KeywordOp(Keyword('author'), Value('ellis'))
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Differential tests of the simple query fast path."""
+
+import random
+
+import pypeg2
+
+from invenio_query_parser import fastpath, parser
+from invenio_query_parser.contrib.spires import parser as spires_parser
+from invenio_query_parser.contrib.spires.walkers import \
+    pypeg_to_ast as spires_pypeg_to_ast
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParserConfig
+from invenio_query_parser.generator import QueryGenerator
+from invenio_query_parser.walkers import pypeg_to_ast
+
+PREFIXES = ['', ' ', 'find ', 'fin ', 'f ', 'FIND ', 'Find\t', 'fi ',
+            'findx ']
+KEYWORDS = ['author', 'title', 'AUTHOR', 'a', 't', 'refersto', 'citedby',
+            'date', '100__a', '100', 'foo', 'and', 'not', 'authors', 'j',
+            'refersto:author', 'ti', 'title.x', 'author-x']
+SEPARATORS = [':', ' : ', ': ', ' ', '  ', '\t']
+VALUES = ['ellis', '"ellis, j"', "'x y'", '/^a.*/', '2000->2005', '-x',
+          '+x', '|x', 'x-y', 'after2000', 'before', '2000+', '2000-',
+          '>2000', '<= 1', 'and', 'not', 'x and y', 'a b c', 'a:b', '(x)',
+          'x)', 'nothing', 'e+e-', u'\xfc', '"unterminated', "it's", '*',
+          'f', 'find', ':x', 'x:', 'ellis j', 'x or', 'notx', 'x->',
+          '"a" b', '""', 'x(y)', 'hep-th/0101', '-', 'ellis, j', '1989',
+          "'a->b'", '/a->/']
+
+GRAMMARS = (
+    (fastpath.invenio, parser.Main, pypeg_to_ast.PypegConverter()),
+    (fastpath.spires, spires_parser.Main,
+     spires_pypeg_to_ast.PypegConverter()),
+)
+
+
+def candidates(count=600, seed=0):
+    chooser = random.Random(seed)
+    queries = set(['', '   '])
+    for value in VALUES:
+        queries.add(' %s ' % value)
+        for prefix in PREFIXES:
+            queries.add(prefix + value)
+    for _ in range(count):
+        queries.add(''.join([
+            chooser.choice(PREFIXES), chooser.choice(KEYWORDS),
+            chooser.choice(SEPARATORS), chooser.choice(VALUES),
+            chooser.choice(['', ' '])]))
+    generator = QueryGenerator(seed)
+    queries.update(generator.generate(50, 'invenio', 1))
+    queries.update(generator.generate(50, 'spires', 1))
+    return sorted(queries)
+
+
+def full_parse(query, grammar, converter):
+    try:
+        return pypeg2.parse(query, grammar, whitespace='').accept(converter)
+    except SyntaxError:
+        return None
+
+
+def check(queries):
+    """Return the count of fast parses per grammar and the mismatches."""
+    counts, mismatches = [], []
+    for fast, grammar, converter in GRAMMARS:
+        count = 0
+        for query in queries:
+            tree = fast(query)
+            if tree is None:
+                continue
+            count += 1
+            expected = full_parse(query, grammar, converter)
+            if tree != expected:
+                mismatches.append((query, tree, expected))
+        counts.append(count)
+    return counts, mismatches
+
+
+class TestFastPath(object):
+
+    def test_differential(self):
+        counts, mismatches = check(candidates())
+        assert mismatches == []
+        assert min(counts) > 100
+
+    def test_shapes(self):
+        assert repr(fastpath.invenio(' ellis ')) == \
+            "ValueQuery(Value('ellis'))"
+        assert repr(fastpath.invenio('author : "ellis, j"')) == \
+            "KeywordOp(Keyword('author'), DoubleQuotedValue('ellis, j'))"
+        assert repr(fastpath.spires('find t higgs  boson')) == \
+            "SpiresOp(Keyword('t'), Value('higgs  boson'))"
+        for query in ('a and b', 'author:x y', 'find a x and y',
+                      'find date after 2000', 'year:2000->2005', '-x'):
+            assert fastpath.spires(query) is None
+
+    def test_pinned_keywords(self):
+        converter = InvenioSyntaxConverter(ParserConfig({'isbn': []}))
+        with converter.config.pinned():
+            queries = ['isbn:1', 'author:ellis', 'ISBN:1', 'isbn : x']
+            counts, mismatches = check(queries)
+            assert mismatches == []
+            assert fastpath.invenio('author:ellis') is None
+        assert repr(converter.parse_query('isbn: 1')) == \
+            "KeywordOp(Keyword('isbn'), Value('1'))"
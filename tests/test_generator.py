@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the synthetic query generator."""
+
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter
+from invenio_query_parser.generator import QueryGenerator
+
+
+def nesting(query):
+    depth = deepest = 0
+    for char in query:
+        if char == '(':
+            depth += 1
+            deepest = max(depth, deepest)
+        elif char == ')':
+            depth -= 1
+    return deepest
+
+
+class TestQueryGenerator(object):
+
+    def test_seeded(self):
+        assert list(QueryGenerator(7).generate(5, terms=8, depth=2)) == \
+            list(QueryGenerator(7).generate(5, terms=8, depth=2))
+
+    def test_invenio_queries_parse(self):
+        converter = InvenioSyntaxConverter()
+        generator = QueryGenerator(1)
+        for terms, depth in ((1, 0), (5, 1), (12, 3)):
+            for query in generator.generate(20, 'invenio', terms, depth):
+                converter.parse_query(query)
+                assert nesting(query) == depth
+
+    def test_spires_queries_parse(self):
+        converter = SpiresToInvenioSyntaxConverter()
+        generator = QueryGenerator(2)
+        for terms, depth in ((1, 0), (5, 1), (12, 3)):
+            for query in generator.generate(20, 'spires', terms, depth):
+                assert query.startswith('find ')
+                converter.parse_query(query)
+                assert nesting(query) == depth
+
+    def test_operator_mix(self):
+        generator = QueryGenerator(3, operators={'or': 1})
+        query = generator.invenio(terms=6)
+        assert query.count(' or ') == 5
+        assert ' and ' not in query
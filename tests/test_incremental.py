@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Tests of incremental parsing."""
+
+import random
+
+import pytest
+
+from invenio_query_parser.ast import AndOp, MalformedQuery, Value, ValueQuery
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParserConfig
+
+
+TOKENS = ['a', 'ellis', 'title:', ':', ' ', ' ', ' ', '(', ')', '"',
+          '"x y"', "'", '/', '/b/', ' and ', ' or ', ' not ', 'and', 'or',
+          '-', '+', '|', 'find a ', 'f ', 'x->y', "'a->", '>', 'author:',
+          'refersto ', 'foo:', 'and(', ')or', 't ', 'author:(a b)', '0',
+          'citedby ', 'author ', "'" + '-' * 40 + "x'"]
+
+QUERIES = ['author:ellis and title:"dark matter" or (higgs or boson) -x',
+           'a b and c (d or e) f', 'author:(a b) and c or d',
+           'title: and x or author:"unterminated y and z',
+           'find a ellis and t dark matter or smith and not jones',
+           'find a x and t and y or z', 'find refersto a x or y and z',
+           'f t "a b" and c or date > 2000', "x 'a->b' c",
+           'find refersto author or x', 'FIND refersto author or 999Cb5',
+           'find refersto:author or x and citedby a y or z']
+
+
+def parse(converter, query):
+    try:
+        return converter.parse_query(query)
+    except SyntaxError:
+        return SyntaxError
+
+
+def typed(converter, query, state=None):
+    """Yield the queries typed so far and their incremental trees."""
+    for end in range(len(query) + 1):
+        try:
+            state = converter.parse_incremental(query[:end], state)
+        except SyntaxError:
+            yield query[:end], SyntaxError
+        else:
+            yield query[:end], state.tree
+
+
+@pytest.mark.parametrize('converter', [
+    InvenioSyntaxConverter(), SpiresToInvenioSyntaxConverter()])
+class TestIncremental(object):
+
+    @pytest.mark.parametrize('query', QUERIES)
+    def test_typed(self, converter, query):
+        for text, tree in typed(converter, query):
+            assert tree == parse(converter, text), text
+
+    def test_edited(self, converter):
+        chooser = random.Random(0)
+        for _ in range(50):
+            query = ''.join(chooser.choice(TOKENS)
+                            for _ in range(chooser.randint(1, 12)))
+            state = None
+            for _ in range(10):
+                position = chooser.randint(0, len(query))
+                if chooser.random() < 0.5:
+                    query = query[:position] + chooser.choice(TOKENS)
+                else:
+                    query = query[:position] + chooser.choice(TOKENS) + \
+                        query[position + 1:]
+                try:
+                    state = converter.parse_incremental(query, state)
+                except SyntaxError:
+                    assert parse(converter, query) is SyntaxError, query
+                else:
+                    assert state.tree == parse(converter, query), query
+
+    def test_reuse(self, converter):
+        prefix = 'find a ellis and ' if isinstance(
+            converter, SpiresToInvenioSyntaxConverter) else 'a and '
+        state = converter.parse_incremental(prefix + 'smith')
+        reused = state.checkpoints[0]
+        state = converter.parse_incremental(prefix + 'smithson', state)
+        assert state.checkpoints[0] is reused
+        state = converter.parse_incremental('x' + prefix, state)
+        assert state.checkpoints[0] is not reused
+
+    def test_other_configuration(self, converter):
+        state = converter.parse_incremental('a and b')
+        other = type(converter)(type(converter.config)(malformed=True))
+        assert other.parse_incremental('a and b', state).tree == \
+            AndOp(ValueQuery(Value('a')), ValueQuery(Value('b')))
+
+
+def test_malformed():
+    converter = InvenioSyntaxConverter(ParserConfig(malformed=True))
+    state = converter.parse_incremental('a and (b')
+    assert state.tree == converter.parse_query('a and (b')
+    assert state.tree == AndOp(ValueQuery(Value('a')), ValueQuery(
+        Value('b')))
+    assert converter.parse_incremental(')', state).tree == \
+        MalformedQuery(')')
+
+
+def test_invalid_tail(monkeypatch):
+    converter = InvenioSyntaxConverter()
+    query = ' and '.join('title:x%d' % index for index in range(50))
+    state = converter.parse_incremental(query)
+    parse_text = converter._parse_text
+    parsed = []
+
+    def recording(text):
+        parsed.append(text)
+        return parse_text(text)
+
+    monkeypatch.setattr(converter, '_parse_text', recording)
+    for tail in (' and title:', ' and (', ' title:'):
+        with pytest.raises(SyntaxError) as error:
+            converter.parse_incremental(query + tail, state)
+        assert error.value.text == query + tail
+        # Only the text after the last checkpoint is parsed again.
+        assert max(len(text) for text in parsed) < len(tail) + 20
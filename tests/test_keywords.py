@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the keyword registry."""
+
+import json
+import os
+import threading
+
+import pypeg2
+
+from invenio_query_parser import parser
+from invenio_query_parser.ast import Keyword, KeywordOp, Value
+from invenio_query_parser.keywords import KeywordRegistry, KeywordSet, \
+    current_keywords, pinned
+from invenio_query_parser.walkers.pypeg_to_ast import PypegConverter
+
+
+def write_schema(tmpdir, *fields):
+    path = tmpdir.join('schema.json')
+    path.write(json.dumps({'properties': dict(
+        (field, {'type': 'string'}) for field in fields)}))
+    return str(path)
+
+
+def parse(query):
+    tree = pypeg2.parse(query, parser.Main, whitespace="")
+    return tree.accept(PypegConverter())
+
+
+class TestKeywordSet(object):
+
+    def test_lowered_from_parent(self):
+        parent = KeywordSet(['Title', 'author'])
+        child = KeywordSet(['Title', 'author', 'DOI'], parent)
+        assert child.lowered == frozenset(['title', 'author', 'doi'])
+
+    def test_shared(self):
+        keyword_set = KeywordSet.shared(['title', 'author'])
+        assert KeywordSet.shared(set(['author', 'title'])) is keyword_set
+        assert KeywordSet.shared(['title']) is not keyword_set
+
+    def test_matcher_built_once(self):
+        keyword_set = KeywordSet(['title'])
+        calls = []
+
+        def build(keyword_set):
+            calls.append(keyword_set)
+            return len(calls)
+        assert keyword_set.matcher('owner', build) == 1
+        assert keyword_set.matcher('owner', build) == 1
+        assert calls == [keyword_set]
+
+
+class TestKeywordRegistry(object):
+
+    def setup_method(self, method):
+        os.environ['INVENIO_QUERY_PARSER_CACHE_DIR'] = ''
+
+    def teardown_method(self, method):
+        del os.environ['INVENIO_QUERY_PARSER_CACHE_DIR']
+
+    def test_sources(self, tmpdir):
+        registry = KeywordRegistry({'author': []})
+        assert registry.keywords == frozenset(['author'])
+        registry.add_schema(write_schema(tmpdir, 'doi'))
+        assert registry.keywords == frozenset(['author', 'doi'])
+        registry.set_keyword_mapping({'title': {'t': 1}})
+        assert registry.keywords == frozenset(['title', 't', 'doi'])
+        registry.remove(str(tmpdir.join('schema.json')))
+        assert registry.keywords == frozenset(['title', 't'])
+
+    def test_refresh(self, tmpdir):
+        path = write_schema(tmpdir, 'doi')
+        registry = KeywordRegistry({}, [path])
+        first = registry.current
+        assert registry.refresh() is first
+        assert registry.version == 1
+
+        write_schema(tmpdir, 'doi', 'isbn')
+        os.utime(path, (0, 0))
+        changed = []
+        registry.subscribe(changed.append)
+        current = registry.refresh()
+        assert current.keywords == frozenset(['doi', 'isbn'])
+        assert registry.version == 2
+        assert changed == [current]
+
+    def test_watch(self, tmpdir):
+        path = write_schema(tmpdir, 'doi')
+        registry = KeywordRegistry({}, [path])
+        changed = threading.Event()
+        registry.subscribe(lambda keyword_set: changed.set())
+        stop = registry.watch(interval=0.01)
+        try:
+            write_schema(tmpdir, 'isbn')
+            os.utime(path, (0, 0))
+            assert changed.wait(5)
+        finally:
+            stop.set()
+        assert registry.keywords == frozenset(['isbn'])
+
+    def test_truncated_schema(self, tmpdir):
+        path = write_schema(tmpdir, 'doi')
+        registry = KeywordRegistry({}, [path])
+        first = registry.current
+        with open(path) as source:
+            content = source.read()
+        with open(path, 'w') as source:
+            source.write(content[:len(content) // 2])
+        os.utime(path, (0, 0))
+        assert registry.refresh() is first
+        with open(path, 'w') as source:
+            source.write(content)
+        os.utime(path, (1, 1))
+        assert registry.refresh() is first
+        write_schema(tmpdir, 'isbn')
+        os.utime(path, (2, 2))
+        assert registry.refresh().keywords == frozenset(['isbn'])
+
+    def test_watch_survives_errors(self, tmpdir):
+        registry = KeywordRegistry({'author': []})
+        refreshed = threading.Event()
+
+        def failing():
+            refreshed.set()
+            raise RuntimeError('listener failed')
+        registry.refresh = failing
+        stop = registry.watch(interval=0.01)
+        try:
+            assert refreshed.wait(5)
+            refreshed.clear()
+            assert refreshed.wait(5)
+            assert registry.watch(interval=0.01) is stop
+        finally:
+            stop.set()
+
+    def test_parse_with_new_keywords(self):
+        registry = KeywordRegistry({'author': []})
+        expected = KeywordOp(Keyword('doi'), Value('10.1/x'))
+        with registry.pinned():
+            assert parse('doi: 10.1/x') != expected
+        registry.set_keyword_mapping({'author': [], 'doi': []})
+        with registry.pinned():
+            assert parse('doi: 10.1/x') == expected
+        with pinned(KeywordSet(['author'])):
+            assert parse('doi: 10.1/x') != expected
+
+    def test_pinned(self):
+        registry = KeywordRegistry({'author': []})
+        with registry.pinned() as keyword_set:
+            registry.set_keyword_mapping({})
+            assert current_keywords() is keyword_set
+        assert current_keywords() is not keyword_set
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the metrics collector."""
+
+import pytest
+
+from invenio_query_parser.ast import Keyword, KeywordOp, Value
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.metrics import Histogram, MetricsCollector
+from invenio_query_parser.walkers.sql_compiler import SQLCompiler
+
+
+class TestHistogram(object):
+
+    def test_cumulative(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        assert list(histogram.cumulative()) == [(1, 2), (10, 3),
+                                                ('+Inf', 4)]
+        assert histogram.sum == 56.5 and histogram.count == 4
+
+
+class TestMetricsCollector(object):
+
+    def test_converter(self):
+        metrics = MetricsCollector(caches={})
+        converter = SpiresToInvenioSyntaxConverter(metrics=metrics)
+        tree = converter.parse_query('find t quark')
+        assert converter.to_invenio(tree) == \
+            KeywordOp(Keyword('title'), Value('quark'))
+        converter.convert_query('author:ellis')
+        with pytest.raises(SyntaxError):
+            converter.parse_query('author:(ellis')
+
+        assert metrics.latency['parse'].count == 2
+        assert metrics.latency['convert'].count == 2
+        assert metrics.latency['print'].count == 1
+        assert metrics.length['parse'].sum == len('find t quark') + len(
+            'author:ellis')
+        assert metrics.errors == {('parse', 'SyntaxError'): 1}
+
+    def test_render(self):
+        compiler = SQLCompiler({'title': 'title'})
+        metrics = MetricsCollector(caches={'sql': compiler.stats})
+        metrics.observe('parse', 0.002, 20)
+        metrics.error('parse', ValueError('x'))
+        metrics.cache_access('trees', True)
+        metrics.cache_access('trees', False)
+        compiler.compile(KeywordOp(Keyword('title'), Value('quark')))
+
+        text = metrics.render()
+        lines = text.splitlines()
+        assert '# TYPE invenio_query_parser_duration_seconds histogram' \
+            in lines
+        assert 'invenio_query_parser_duration_seconds_bucket' \
+            '{le="0.0025",operation="parse"} 1' in lines
+        assert 'invenio_query_parser_duration_seconds_bucket' \
+            '{le="+Inf",operation="parse"} 1' in lines
+        assert 'invenio_query_parser_query_length_chars_count' \
+            '{operation="parse"} 1' in lines
+        assert 'invenio_query_parser_errors_total' \
+            '{operation="parse",type="ValueError"} 1' in lines
+        assert 'invenio_query_parser_cache_hit_ratio{cache="trees"} 0.5' \
+            in lines
+        assert 'invenio_query_parser_cache_misses_total{cache="sql"} 1' \
+            in lines
+        assert text.endswith('\n')
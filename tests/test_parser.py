@@ -325,6 +325,10 @@ class TestParser(object):
          SpiresOp(Keyword('da'), Value('today-2'))),
         ("find da today - 2",
          SpiresOp(Keyword('da'), Value('today - 2'))),
+        ("find date-added today",
+         SpiresOp(Keyword('date-added'), Value('today'))),
+        ("find journal-page 5",
+         SpiresOp(Keyword('journal-page'), Value('5'))),
         ("find da 2012-01-01",
          SpiresOp(Keyword('da'), Value('2012-01-01'))),
         ("find t quark andorinword",
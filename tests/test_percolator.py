@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the percolator."""
+
+from invenio_query_parser.ast import AndOp, Keyword, KeywordOp, NotOp, \
+    OrOp, RegexValue, Value, ValueQuery
+from invenio_query_parser.contrib.spires import converter
+from invenio_query_parser.contrib.spires.percolator import SpiresPercolator
+from invenio_query_parser.percolator import Percolator, RequiredTerms
+
+
+class TestRequiredTerms(object):
+
+    def anchors(self, tree):
+        return tree.accept(RequiredTerms())
+
+    def test_keyword(self):
+        tree = KeywordOp(Keyword('title'), Value('quark'))
+        assert self.anchors(tree) == frozenset([('title', 'quark')])
+
+    def test_and_picks_one_side(self):
+        tree = AndOp(KeywordOp(Keyword('title'), Value('quark')),
+                     NotOp(ValueQuery(Value('gluon'))))
+        assert self.anchors(tree) == frozenset([('title', 'quark')])
+
+    def test_or_needs_both_sides(self):
+        tree = OrOp(KeywordOp(Keyword('title'), Value('quark')),
+                    ValueQuery(Value('gluon')))
+        assert self.anchors(tree) == frozenset([('title', 'quark'),
+                                                (None, 'gluon')])
+        tree = OrOp(KeywordOp(Keyword('title'), Value('quark')),
+                    KeywordOp(Keyword('title'), RegexValue('gl.*')))
+        assert self.anchors(tree) is None
+
+
+class TestPercolator(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.parser = converter.SpiresToInvenioSyntaxConverter()
+
+    def make_percolator(self, queries, percolator_class=Percolator):
+        percolator = percolator_class()
+        for query_id, query in enumerate(queries):
+            percolator.add(query_id, self.parser.parse_query(query))
+        return percolator
+
+    def test_percolate(self):
+        percolator = self.make_percolator([
+            'title:quark',
+            'title:gluon and year:1990->2000',
+            'not title:quark',
+            'title:higgs or plasma',
+        ])
+        assert percolator.percolate({'title': 'Quark matter'}) == set([0])
+        assert percolator.percolate(
+            {'title': 'Gluon plasma', 'year': '1999'}) == set([1, 2, 3])
+        assert percolator.candidates_for({'title': 'Dark matter'}) == \
+            set([2])
+        assert percolator.stats()['records'] == 2
+
+    def test_remove(self):
+        percolator = self.make_percolator(['title:quark', 'title:quark'])
+        percolator.remove(0)
+        assert len(percolator) == 1
+        assert percolator.percolate({'title': 'quark'}) == set([1])
+
+    def test_spires(self):
+        percolator = self.make_percolator(
+            ['find t quark and a ellis'], SpiresPercolator)
+        assert percolator.percolate(
+            {'title': 'Quark matter', 'author': ['Ellis']}) == set([0])
+        assert percolator.percolate(
+            {'title': 'Quark matter', 'author': ['Smith']}) == set()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for grammar rule profiling."""
+
+from invenio_query_parser.ast import Value
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.contrib.spires.walkers.spires_to_invenio import \
+    SpiresToInvenio
+from invenio_query_parser.profiling import ParseProfile, WalkerProfile, \
+    profiled
+from invenio_query_parser.walkers.repr_printer import TreeRepr
+
+
+class TestProfiling(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.converter = SpiresToInvenioSyntaxConverter()
+
+    def test_rules(self):
+        queries = ['find a ellis and t quark', 'author:ellis or title:quark']
+        with profiled() as profile:
+            trees = [self.converter.parse_query(q) for q in queries]
+        assert trees == [self.converter.parse_query(q) for q in queries]
+
+        data = profile.as_dict()
+        assert data['parses'] == 2
+        rules = data['rules']
+        for name in ('parser.KeywordQuery', 'parser.NotKeywordValue',
+                     'contrib.spires.parser.SpiresSmartValue'):
+            stats = rules[name]
+            assert stats['attempts'] == \
+                stats['successes'] + stats['failures'] > 0
+            assert 0 <= stats['own_time'] <= stats['time'] <= data['time']
+        assert rules['parser.KeywordQuery']['failures'] > 0
+        assert 'parser.KeywordQuery' in profile.table()
+
+    def test_disabled(self):
+        profile = ParseProfile()
+        with profiled(profile):
+            pass
+        self.converter.parse_query('find a ellis')
+        assert profile.parses == 0 and profile.rules == {}
+
+    def test_syntax_error(self):
+        profile = ParseProfile()
+        with profiled(profile):
+            try:
+                self.converter.parse_query('find a ellis and (t quark')
+            except SyntaxError:
+                pass
+        assert profile.parses == 1
+
+
+class TestWalkerProfile(object):
+
+    def test_node_types(self):
+        converter = SpiresToInvenioSyntaxConverter()
+        tree = converter.parse_query('find a ellis and t quark or t gluon')
+        visit = SpiresToInvenio.visit
+        with WalkerProfile(SpiresToInvenio, TreeRepr) as profile:
+            assert SpiresToInvenio.visit != visit
+            tree.accept(SpiresToInvenio()).accept(TreeRepr())
+        assert SpiresToInvenio.visit == visit
+
+        data = profile.as_dict()
+        types = data['node_types']
+        assert types['SpiresToInvenio.SpiresOp']['calls'] == 3
+        assert types['SpiresToInvenio.Keyword']['calls'] == 3
+        assert types['TreeRepr.KeywordOp']['calls'] == 3
+        root = types['SpiresToInvenio.OrOp']
+        nested = types['SpiresToInvenio.AndOp']
+        assert root['calls'] == 1
+        assert root['own_time'] <= nested['time'] <= root['time']
+        for stats in types.values():
+            assert stats['own_time'] <= stats['time'] + 1e-9
+        assert sum(stats['calls'] for stats in data['methods'].values()) \
+            == sum(stats['calls'] for stats in types.values())
+        assert 'SpiresToInvenio.SpiresOp' in profile.table()
+
+    def test_disabled(self):
+        profile = WalkerProfile(TreeRepr)
+        with profile:
+            pass
+        Value('x').accept(TreeRepr())
+        assert profile.as_dict() == {'node_types': {}, 'methods': {}}
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Tests of the recovery of malformed queries."""
+
+import random
+
+import pytest
+
+from invenio_query_parser.ast import AndOp, DoubleQuotedValue, Keyword, \
+    KeywordOp, MalformedQuery, NotOp, OrOp, Value, ValueQuery
+from invenio_query_parser.contrib.spires.ast import SpiresOp
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParserConfig
+from invenio_query_parser.recovery import Diagnostic
+
+
+TOKENS = ['a', 'title:', ' ', ' ', '(', ')', '"', '"x y"', '/', ' and ',
+          ' or ', ' not ', '-', '|', 'find ', 'f a ', 'x->y', 'author:',
+          'foo:', '100:', 'and(', ')or']
+
+
+def value(text):
+    return ValueQuery(Value(text))
+
+
+class TestRecovery(object):
+
+    def test_valid(self):
+        converter = SpiresToInvenioSyntaxConverter()
+        for query in ('author:(ellis or smith)', 'find a x and y', ''):
+            assert converter.recover_query(query) == \
+                (converter.parse_query(query), [])
+
+    @pytest.mark.parametrize('query, tree, diagnostics', [
+        ('title:higgs and (author:ellis or',
+         AndOp(KeywordOp(Keyword('title'), Value('higgs')),
+               KeywordOp(Keyword('author'), Value('ellis'))),
+         [Diagnostic('Unclosed (', 16, 17),
+          Diagnostic('Missing operand after or', 30, 32)]),
+        ('a or b c)', AndOp(OrOp(value('a'), value('b')), value('c')),
+         [Diagnostic('Unbalanced )', 8, 9)]),
+        ('author:(ellis or (x', KeywordOp(Keyword('author'), OrOp(
+            value('ellis'), value('x'))),
+         [Diagnostic('Unclosed (', 7, 8), Diagnostic('Unclosed (', 17, 18)]),
+        ('a and not (b or c', AndOp(value('a'), NotOp(OrOp(
+            value('b'), value('c')))), [Diagnostic('Unclosed (', 10, 11)]),
+        ('"a" and author: or (', AndOp(
+            ValueQuery(DoubleQuotedValue('a')),
+            KeywordOp(Keyword('author'), Value('or'))),
+         [Diagnostic('Unclosed (', 19, 20)]),
+        ('year:2000 and author: and (', AndOp(
+            KeywordOp(Keyword('year'), Value('2000')),
+            KeywordOp(Keyword('author'), Value('and'))),
+         [Diagnostic('Unclosed (', 26, 27)]),
+        ('x and author:)', AndOp(value('x'), MalformedQuery('author:')),
+         [Diagnostic('Invalid query', 6, 13),
+          Diagnostic('Unbalanced )', 13, 14)]),
+        (')', MalformedQuery(')'), [Diagnostic('Unbalanced )', 0, 1)]),
+    ])
+    def test_recover(self, query, tree, diagnostics):
+        assert InvenioSyntaxConverter().recover_query(query) == \
+            (tree, diagnostics)
+
+    def test_spires(self):
+        converter = SpiresToInvenioSyntaxConverter()
+        tree, diagnostics = converter.recover_query(
+            'find a ellis or smith) and (t quark or higgs')
+        assert tree == AndOp(
+            OrOp(SpiresOp(Keyword('a'), Value('ellis')),
+                 SpiresOp(Keyword('a'), Value('smith'))),
+            OrOp(SpiresOp(Keyword('t'), Value('quark')),
+                 SpiresOp(Keyword('t'), Value('higgs'))))
+        assert diagnostics == [Diagnostic('Unbalanced )', 21, 22),
+                               Diagnostic('Unclosed (', 27, 28)]
+        tree, diagnostics = converter.recover_query('a and b)')
+        assert tree == AndOp(value('a'), value('b'))
+        tree, diagnostics = converter.recover_query(
+            'find a ellis and t (higgs or boson')
+        assert tree == AndOp(
+            SpiresOp(Keyword('a'), Value('ellis')),
+            OrOp(SpiresOp(Keyword('t'), Value('higgs')),
+                 SpiresOp(Keyword('t'), Value('boson'))))
+        assert diagnostics == [Diagnostic('Unclosed (', 19, 20)]
+
+    def test_nesting(self):
+        tree, diagnostics = InvenioSyntaxConverter().recover_query(
+            '(' * 1000 + 'a')
+        assert tree == value('a')
+        assert len(diagnostics) == 1000
+
+    def test_strict_quotes(self):
+        converter = InvenioSyntaxConverter(ParserConfig(strict_quotes=True))
+        assert converter.recover_query('a or author:"ellis') == (
+            OrOp(value('a'), MalformedQuery('author:"ellis')),
+            [Diagnostic('Unterminated "', 5, 18)])
+
+    def test_malformed(self):
+        converter = InvenioSyntaxConverter(ParserConfig(malformed=True))
+        assert converter.parse_query('a and (b') == \
+            AndOp(value('a'), value('b'))
+        assert converter.convert_query('x and author:)') == \
+            "('x' and __malformed__(author:))"
+
+    def test_never_raises(self):
+        converters = (InvenioSyntaxConverter(),
+                      SpiresToInvenioSyntaxConverter())
+        chooser = random.Random(0)
+        for _ in range(200):
+            query = ''.join(chooser.choice(TOKENS)
+                            for _ in range(chooser.randint(1, 12)))
+            for converter in converters:
+                tree, diagnostics = converter.recover_query(query)
+                for diagnostic in diagnostics:
+                    assert 0 <= diagnostic.start < diagnostic.end <= \
+                        len(query)
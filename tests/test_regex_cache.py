@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the compiled regex cache."""
+
+import pytest
+
+import itertools
+import re
+
+from invenio_query_parser.regex_cache import ATOMIC_GROUPS, RegexCache, \
+    UnsafeRegexError, find_nested_quantifiers, is_atomic_safe
+
+
+class TestScreen(object):
+
+    def test_nested_quantifiers(self):
+        assert find_nested_quantifiers('(a+)+') == [(0, 5)]
+        assert find_nested_quantifiers(r'^(\w+\s?)*$') == [(1, 10)]
+        assert find_nested_quantifiers('x(y(a*)*)') == [(3, 8)]
+
+    def test_safe_patterns(self):
+        for pattern in ('a+b+', '(a|b)+', '(a+)?', r'\(a+\)+', '[(a+)+]',
+                        '(ab){2}'):
+            assert find_nested_quantifiers(pattern) == []
+
+
+class TestRegexCache(object):
+
+    def test_hits_and_evictions(self):
+        cache = RegexCache(maxsize=2)
+        first = cache.compile('a')
+        assert cache.compile('a') is first
+        cache.compile('b')
+        cache.compile('c')
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['evictions']) == \
+            (1, 3, 1)
+        assert stats['size'] == 2
+
+    def test_reject(self):
+        cache = RegexCache()
+        with pytest.raises(UnsafeRegexError):
+            cache.compile('(a+)+$')
+        assert cache.stats()['rejected'] == 1
+
+    @pytest.mark.skipif(not ATOMIC_GROUPS, reason='no atomic groups')
+    def test_rewrite(self):
+        cache = RegexCache(on_unsafe='rewrite')
+        regex = cache.compile('(a+)+$')
+        assert regex.pattern == '(?>(a+)+)$'
+        assert regex.search('a' * 64 + '!') is None
+        assert cache.stats()['rewritten'] == 1
+
+    @pytest.mark.skipif(not ATOMIC_GROUPS, reason='no atomic groups')
+    def test_rewrite_keeps_matches(self):
+        cache = RegexCache(on_unsafe='rewrite')
+        strings = [''.join(chars) for length in range(7)
+                   for chars in itertools.product('ab \n', repeat=length)]
+        for pattern in ('(a+)+$', r'^(\w+)*\Z', '(?:[ab]*)+ ', 'x|(a+)+b',
+                        r'(\s+)*a+', '(a+b)+', 'a(a+)+|b'):
+            regex = cache.compile(pattern)
+            assert regex.pattern != pattern
+            for string in strings:
+                expected = re.search(pattern, string)
+                found = regex.search(string)
+                assert (found and found.span()) == \
+                    (expected and expected.span()), (pattern, string)
+        assert cache.stats()['rewritten'] == 7
+
+    @pytest.mark.skipif(not ATOMIC_GROUPS, reason='no atomic groups')
+    def test_rewrite_rejects_changed_matches(self):
+        cache = RegexCache(on_unsafe='rewrite')
+        # Atomic groups would not give back the characters needed by
+        # what follows, or would keep another split of the run.
+        for pattern in ('(a+)+a', '(a|ab+)+c', '(a+b?)+$', '(a+)+$\n',
+                        '(a+)+b\\1', '((a+)+)+c'):
+            assert not is_atomic_safe(
+                pattern, find_nested_quantifiers(pattern)[0])
+            with pytest.raises(UnsafeRegexError):
+                cache.compile(pattern)
+        assert not is_atomic_safe('(a+)+$', (0, 5), re.M)
+
+    def test_budget(self):
+        cache = RegexCache(budget=-1)
+        assert cache.compile('a+').search('aaa')
+        assert cache.stats()['over_budget'] == 1
+        with pytest.raises(UnsafeRegexError):
+            cache.compile('a+')
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the parse service."""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from invenio_query_parser import service
+from invenio_query_parser.service import ParseService, make_server, \
+    read_request, tcp_address
+
+
+def failing_batch(keys):
+    raise RuntimeError('worker lost')
+
+
+def exchange(address, requests):
+    """Send the request lines and return the responses by ``id``."""
+    if isinstance(address, tuple):
+        connection = socket.create_connection(address)
+    else:
+        connection = socket.socket(socket.AF_UNIX)
+        connection.connect(address)
+    connection.sendall(b''.join(
+        request if isinstance(request, bytes)
+        else (json.dumps(request) + '\n').encode('utf-8')
+        for request in requests))
+    connection.shutdown(socket.SHUT_WR)
+    responses = [json.loads(line.decode('utf-8'))
+                 for line in connection.makefile('rb')]
+    connection.close()
+    return dict((response['id'], response) for response in responses)
+
+
+class Server(object):
+
+    def __init__(self, address, limits=None, **kwargs):
+        self.service = ParseService(**kwargs)
+        self.service.start()
+        self.server = make_server(address, self.service, **(limits or {}))
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.service.stop()
+
+
+class TestParseService(object):
+
+    def test_read_request(self):
+        assert read_request(b'{"id": 1, "query": "a"}') == \
+            (1, ('invenio', 'a', False))
+        assert read_request(
+            b'{"query": "find a x", "grammar": "spires", "convert": true}'
+        ) == (None, ('spires', 'find a x', True))
+        for line in (b'[]', b'{"id": 2}', b'{"query": 1}',
+                     b'{"query": "a", "grammar": "cql"}',
+                     b'{"query": "a", "convert": true}', b'{'):
+            with pytest.raises(ValueError):
+                read_request(line)
+
+    @pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                        reason='needs Unix sockets')
+    def test_unix_socket(self):
+        directory = tempfile.mkdtemp()
+        server = Server(os.path.join(directory, 'service.sock'), workers=0)
+        try:
+            responses = exchange(server.address, [
+                {'id': 1, 'query': 'author:ellis'},
+                {'id': 2, 'query': 'find a ellis', 'grammar': 'spires',
+                 'convert': True},
+                {'id': 3, 'query': 'author:(ellis'},
+                {'id': 4, 'query': 'a', 'grammar': 'cql'},
+                b'not json\n',
+            ])
+        finally:
+            server.close()
+            shutil.rmtree(directory)
+        assert responses[1]['tree'] == {
+            'type': 'KeywordOp',
+            'left': {'type': 'Keyword', 'value': 'author'},
+            'right': {'type': 'Value', 'value': 'ellis'}}
+        assert responses[2]['tree']['left'] == \
+            {'type': 'Keyword', 'value': 'author'}
+        assert responses[3]['error']['type'] == 'SyntaxError'
+        assert responses[3]['error']['position'] == 7
+        assert responses[4]['error']['type'] == 'ValueError'
+        assert responses[None]['error']['type'] == 'ValueError'
+
+    def test_tcp_workers(self):
+        server = Server(('127.0.0.1', 0), workers=1, batch_delay=0.05)
+        try:
+            responses = exchange(server.address, [
+                {'id': index, 'query': 'title:quark'}
+                for index in range(20)])
+            stats = server.service.stats()
+        finally:
+            server.close()
+        assert len(responses) == 20
+        assert len(set(json.dumps(response['tree'])
+                       for response in responses.values())) == 1
+        assert stats['requests'] == 20
+        assert stats['coalesced'] > 0
+
+    def test_connection_limits(self):
+        server = Server(('127.0.0.1', 0),
+                        {'max_inflight': 2, 'max_line': 64}, workers=0)
+        try:
+            responses = exchange(server.address, [
+                {'id': index, 'query': 'title:quark'}
+                for index in range(20)] + [
+                b'{"id": "long", "query": "' + b'a' * 100 + b'"}\n',
+                {'id': 'next', 'query': 'author:ellis'}])
+        finally:
+            server.close()
+        assert len(responses) == 22
+        assert responses[None]['error']['message'] == \
+            'Request longer than 64 bytes'
+        assert 'tree' in responses['next']
+
+    def test_coalescing(self):
+        service = ParseService(workers=0)
+        results = []
+        key = ('invenio', 'title:quark', False)
+        service._dispatch([(key, results.append), (key, results.append),
+                           (('invenio', 'a', False), results.append)])
+        assert len(results) == 3
+        assert results[0] is results[1]
+        assert service.stats() == {'requests': 3, 'batches': 1,
+                                   'coalesced': 1, 'pending': 0}
+
+    @pytest.mark.parametrize('workers', [0, 1])
+    def test_failed_batch(self, workers, monkeypatch):
+        parse_service = ParseService(workers=workers, max_batches=1)
+        parse_service.start()
+        monkeypatch.setattr(service, 'parse_batch', failing_batch)
+        try:
+            for _ in range(2):
+                results = []
+                done = threading.Event()
+
+                def answer(response):
+                    results.append(response)
+                    if len(results) == 2:
+                        done.set()
+                key = ('invenio', 'a', False)
+                parse_service._dispatch([(key, answer), (key, answer)])
+                assert done.wait(10)
+                assert results[0]['error'] == {'type': 'RuntimeError',
+                                               'message': 'worker lost'}
+            assert parse_service._inflight == {}
+        finally:
+            parse_service.stop()
+
+    def test_tcp_address(self):
+        assert tcp_address('7070') == ('127.0.0.1', 7070)
+        assert tcp_address('localhost:7070') == ('localhost', 7070)
+        assert service.is_loopback('localhost')
+        assert not service.is_loopback('0.0.0.0')
+        with pytest.raises(SystemExit):
+            service.main(['--tcp', '0.0.0.0:7070'])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Unit tests for the keyword discovery utilities."""
+
+import json
+import os
+
+from invenio_query_parser import utils
+
+SCHEMA = {'properties': {
+    'title': {'type': 'object', 'properties': {'title': {'type': 'string'}}},
+    'authors': {'type': 'array', 'items': {'type': 'object', 'properties': {
+        'full_name': {'type': 'string'}}}},
+}}
+
+
+class TestLoadKeywords(object):
+
+    def write_schema(self, tmpdir, schema=SCHEMA):
+        path = tmpdir.join('schema.json')
+        path.write(json.dumps(schema))
+        return str(path)
+
+    def test_mapping_and_schema(self, tmpdir, monkeypatch):
+        path = self.write_schema(tmpdir)
+        monkeypatch.setenv('INVENIO_QUERY_PARSER_CACHE_DIR', '')
+        keywords = utils.load_keywords({'author': []}, [path], [])
+        assert keywords == frozenset(['author', 'authors',
+                                      'authors.full_name', 'title.title'])
+
+    def test_disk_cache(self, tmpdir, monkeypatch):
+        path = self.write_schema(tmpdir)
+        monkeypatch.setenv('INVENIO_QUERY_PARSER_CACHE_DIR',
+                           str(tmpdir.join('cache')))
+        keywords = utils.load_keywords({}, [path], [])
+        assert len(tmpdir.join('cache').listdir()) == 1
+
+        # Warm start: the schema must not be parsed again.
+        monkeypatch.setattr(utils, '_schema_keywords', None)
+        assert utils.load_keywords({}, [path], []) == keywords
+
+        # Changed content invalidates the cached entry.
+        monkeypatch.undo()
+        monkeypatch.setenv('INVENIO_QUERY_PARSER_CACHE_DIR',
+                           str(tmpdir.join('cache')))
+        self.write_schema(tmpdir, {'properties': {
+            'doi': {'type': 'object', 'properties': {
+                'value': {'type': 'string'}}}}})
+        os.utime(path, (0, 0))
+        assert utils.load_keywords({}, [path], []) == frozenset(['doi.value'])
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio-Query-Parser.
+# Copyright (C) 2016 CERN.
+#
+# Invenio-Query-Parser is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio-Query-Parser is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+#
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization
+# or submit itself to any jurisdiction.
+
+"""Tests of the syntax checks run before parsing."""
+
+import random
+import time
+
+import pypeg2
+import pytest
+
+from invenio_query_parser import ast, parser, scanning, validation
+from invenio_query_parser.contrib.spires import parser as spires_parser
+from invenio_query_parser.contrib.spires.converter import \
+    SpiresToInvenioSyntaxConverter
+from invenio_query_parser.converter import InvenioSyntaxConverter, \
+    ParseCache, ParserConfig
+
+TOKENS = ['a', 'ellis', 'title', 'title:', ':', ' ', ' ', '(', '(', ')',
+          ')', '"', '"x y"', "'", '/', '/b/', ' and ', ' or ', ' not ', '-',
+          '+', '|', 'find ', 'f a ', 'x->y', '>', 'author:', 'refersto:',
+          'foo:', '100:', 'and(', ')or', "'a->", '/x->', '->']
+
+GRAMMARS = (
+    (validation.invenio, parser.Main),
+    (validation.spires, spires_parser.Main),
+)
+
+
+def candidates(count=300, seed=0):
+    chooser = random.Random(seed)
+    return [''.join(chooser.choice(TOKENS)
+                    for _ in range(chooser.randint(1, 12)))
+            for _ in range(count)]
+
+
+def rejected(query, grammar):
+    try:
+        pypeg2.parse(query, grammar, whitespace='')
+    except SyntaxError:
+        return True
+    return False
+
+
+class TestValidation(object):
+
+    def test_differential(self):
+        caught = 0
+        for validate, grammar in GRAMMARS:
+            for query in candidates():
+                error = validate(query)
+                if error is not None:
+                    assert rejected(query, grammar), query
+                    caught += 1
+        assert caught > 150
+
+    @pytest.mark.parametrize('query, reason, position', [
+        ('author:(ellis', 'unclosed', 7),
+        ('(a) and (b', 'unclosed', 8),
+        ('a and b)', 'unbalanced', 7),
+        ('title:"a (b" and (c', 'unclosed', 17),
+        ('title:"a) b" and c)', 'unbalanced', 18),
+        ('(' * 65 + 'a' + ')' * 65, 'nesting', 64),
+    ])
+    def test_errors(self, query, reason, position):
+        error = validation.invenio(query)
+        assert (error.reason, error.position) == (reason, position)
+        assert error.offset == position + 1
+        assert error.text == query
+        assert rejected(query, parser.Main) or reason == 'nesting'
+
+    @pytest.mark.parametrize('query', [
+        'title:(a or (b and c))', 'f(x)', 'title:"a (b"', '"abc', "it's",
+        'hep-th/0101', 'x(y:(z', "'a->b)'", '', 'find t quark and (',
+    ])
+    def test_valid(self, query):
+        assert validation.invenio(query) is None or \
+            query.startswith('find')
+        assert validation.spires(query) is None
+
+    def test_quotes(self):
+        error = validation.invenio('author:"ellis', quotes=True)
+        assert (error.reason, error.position) == ('unterminated', 7)
+        assert validation.invenio('author:"ellis') is None
+        assert validation.invenio("it's", quotes=True) is None
+        error = validation.spires('find t quark and (', quotes=True)
+        assert (error.reason, error.position) == ('unclosed', 17)
+
+    @pytest.mark.parametrize('tail', ["x'", "x", " ", "->", "->x'"])
+    def test_dashes(self, tail):
+        query = "'" + '-' * 2000 + tail
+        start = time.time()
+        for check in (validation.invenio, validation.spires):
+            check(query, quotes=True)
+        assert time.time() - start < 1
+        bound = parser.SimpleRangeValue.grammar.thing.match(query)
+        assert scanning.is_range(query, 0) == \
+            query.startswith('->', bound.end())
+
+    def test_converter(self):
+        converter = InvenioSyntaxConverter()
+        with pytest.raises(validation.QuerySyntaxError):
+            converter.parse_query('(' * 200 + 'a' + ')' * 200)
+        with pytest.raises(SyntaxError):
+            converter.parse_query('a and (b')
+        converter = SpiresToInvenioSyntaxConverter()
+        assert repr(converter.parse_query('find t quark and (')) == \
+            "AndOp(SpiresOp(Keyword('t'), Value('quark')), EmptyQuery(''))"
+
+    def test_malformed(self):
+        cache = ParseCache()
+        strict = InvenioSyntaxConverter(
+            ParserConfig(strict_quotes=True, malformed=True), cache=cache)
+        assert strict.parse_query('a and (b') == \
+            ast.AndOp(ast.ValueQuery(ast.Value('a')),
+                      ast.ValueQuery(ast.Value('b')))
+        assert strict.convert_query('"a') == '__malformed__("a)'
+        converter = InvenioSyntaxConverter(cache=cache)
+        assert repr(converter.parse_query('"a')) == \
+            "ValueQuery(Value('\"a'))"
+        assert len(cache) == 3
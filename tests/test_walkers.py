@@ -23,11 +23,20 @@
 
 """Unit tests for the search engine query parsers."""
 
+import datetime
+from functools import partial
+
 from pytest import generate_tests
 
-from invenio_query_parser.contrib.spires.walkers import spires_to_invenio
+from invenio_query_parser.contrib.spires.walkers import dates, \
+    json_tree, spires_to_invenio
+from invenio_query_parser.walkers import predicate, sql_compiler
 from invenio_query_parser.contrib.spires import converter
-from invenio_query_parser.ast import KeywordOp, Keyword, Value, GreaterOp
+from invenio_query_parser.contrib.spires.aliases import AliasTable
+from invenio_query_parser.contrib.spires.ast import SpiresOp
+from invenio_query_parser.ast import AndOp, KeywordOp, Keyword, Value, \
+    DoubleQuotedValue, GreaterOp, LowerEqualOp, MalformedQuery, \
+    NestedKeywordsRule, RangeOp
 
 
 def generate_walker_test(query, expected):
@@ -53,4 +62,284 @@ class TestSpiresToInvenio(object):
          KeywordOp(Keyword('title'), Value('quark'))),
         ("find d after yesterday",
          KeywordOp(Keyword('year'), GreaterOp(Value('yesterday')))),
+        ("find A ellis",
+         KeywordOp(Keyword('author'), DoubleQuotedValue('ellis'))),
+        ("find a \"ellis, j\"",
+         KeywordOp(Keyword('author'), DoubleQuotedValue('ellis, j'))),
+        ("find a ellis and T quark",
+         AndOp(KeywordOp(Keyword('author'), DoubleQuotedValue('ellis')),
+               KeywordOp(Keyword('title'), Value('quark')))),
+        ("find ac > 10",
+         KeywordOp(Keyword('authorcount'), GreaterOp(Value('10')))),
+    )
+
+
+class TestAliasTable(object):
+
+    """Test SPIRES alias resolution."""
+
+    def test_case_insensitive(self):
+        table = AliasTable({'arXiv': 'arxiv', 'a': 'author'})
+        assert table['ARXIV'] == 'arxiv'
+        assert 'A' in table
+        assert table.get('unknown', 'unknown') == 'unknown'
+
+    def test_convert_does_not_mutate(self):
+        table = AliasTable({'a': 'author'})
+        keyword, value = Keyword('a'), Value('ellis')
+        tree = SpiresOp(keyword, value)
+        assert table.convert('A', value) == \
+            KeywordOp(Keyword('author'), DoubleQuotedValue('ellis'))
+        assert tree == SpiresOp(Keyword('a'), Value('ellis'))
+        assert tree.left is keyword and tree.right is value
+
+    def test_quoted_targets(self):
+        table = AliasTable({'a': 'author', 't': 'title'}, quoted=('title', ))
+        assert table.convert('t', Value('quark')) == \
+            KeywordOp(Keyword('title'), DoubleQuotedValue('quark'))
+        assert table.convert('a', Value('ellis')) == \
+            KeywordOp(Keyword('author'), Value('ellis'))
+
+
+def fixed_clock():
+    return datetime.date(2016, 3, 1)
+
+
+@generate_tests(generate_walker_test)  # pylint: disable=R0903
+class TestDateResolver(object):
+
+    """Test relative date resolution."""
+
+    @classmethod
+    def setup_class(cls):
+        cls.walker = partial(dates.DateResolver, clock=fixed_clock)
+        cls.parser = converter.SpiresToInvenioSyntaxConverter()
+
+    queries = (
+        ("find da today-2",
+         SpiresOp(Keyword('da'), RangeOp(Value('2016-02-28'),
+                                         Value('2016-02-28')))),
+        ("find du today - 2",
+         SpiresOp(Keyword('du'), RangeOp(Value('2016-02-28'),
+                                         Value('2016-02-28')))),
+        ("find d after yesterday",
+         SpiresOp(Keyword('d'), GreaterOp(Value('2016-02-29')))),
+        ("find da today + 1",
+         SpiresOp(Keyword('da'), RangeOp(Value('2016-03-02'),
+                                         Value('2016-03-02')))),
+        ("find du <= today",
+         SpiresOp(Keyword('du'), LowerEqualOp(Value('2016-03-01')))),
+        ("find da today and t today",
+         AndOp(SpiresOp(Keyword('da'), RangeOp(Value('2016-03-01'),
+                                               Value('2016-03-01'))),
+               SpiresOp(Keyword('t'), Value('today')))),
+        ("year: yesterday",
+         KeywordOp(Keyword('year'), RangeOp(Value('2016-02-29'),
+                                            Value('2016-02-29')))),
+        ("find da 2016-01-01",
+         SpiresOp(Keyword('da'), Value('2016-01-01'))),
+    )
+
+    def test_memo_holds_one_clock(self):
+        for day in range(1, 29):
+            clock = partial(datetime.date, 2016, 2, day)
+            assert dates.resolve_date('today', clock) == \
+                '2016-02-%02d' % day
+        assert dates._current[0] is clock
+        assert dates._current[2] == {'today': '2016-02-28'}
+        assert dates.resolve_date('today', fixed_clock) == '2016-03-01'
+
+    def test_out_of_range(self):
+        for expression in ('today+99999999999', 'today-' + '9' * 5000):
+            assert dates.resolve_date(expression, fixed_clock) is None
+
+
+def generate_sql_test(query, expected):
+    def func(self):
+        tree = self.parser.parse_query(query)
+        assert self.compiler.compile(tree) == expected
+    return func
+
+
+@generate_tests(generate_sql_test)  # pylint: disable=R0903
+class TestSQLCompiler(object):
+
+    """Test compilation to SQL WHERE clauses."""
+
+    @classmethod
+    def setup_class(cls):
+        cls.compiler = sql_compiler.SQLCompiler(
+            {'title': 'title', 'author': 'author', 'year': 'year'},
+            fts_table='records_fts')
+        cls.parser = converter.SpiresToInvenioSyntaxConverter()
+
+    queries = (
+        ("title:quark",
+         ('"title" LIKE ? ESCAPE \'\\\'', ['%quark%'])),
+        ("author:\"Ellis, J\" and year:2000->2012",
+         ('("author" = ? AND "year" BETWEEN ? AND ?)',
+          ['Ellis, J', '2000', '2012'])),
+        ("title:/^qu+ark/ or not author:'el_is'",
+         ('("title" REGEXP ? OR NOT "author" LIKE ? ESCAPE \'\\\')',
+          ['^qu+ark', '%el\\_is%'])),
+        ("quark glu*",
+         ('(rowid IN (SELECT rowid FROM "records_fts" WHERE "records_fts" '
+          'MATCH ?) AND rowid IN (SELECT rowid FROM "records_fts" WHERE '
+          '"records_fts" MATCH ?))', ['"quark"', '"glu" *'])),
+        ("title:(quark or not gluon)",
+         ('("title" LIKE ? ESCAPE \'\\\' OR NOT "title" LIKE ? '
+          'ESCAPE \'\\\')', ['%quark%', '%gluon%'])),
+        ("title:(quark author:'ellis')",
+         ('("title" LIKE ? ESCAPE \'\\\' AND "author" LIKE ? '
+          'ESCAPE \'\\\')', ['%quark%', '%ellis%'])),
+        ("",
+         ('1', [])),
+    )
+
+    def test_unsupported_nodes(self):
+        import pytest
+        for tree in (MalformedQuery(['quark', ')']),
+                     NestedKeywordsRule(Keyword('title'),
+                                        Value('quark'))):
+            with pytest.raises(sql_compiler.UnsupportedQueryError):
+                self.compiler.compile(tree)
+
+    def test_unknown_keyword(self):
+        import pytest
+        tree = self.parser.parse_query("refersto:quark")
+        with pytest.raises(ValueError):
+            self.compiler.compile(tree)
+
+    def test_shape_cache(self):
+        first, _ = self.compiler.compile(
+            self.parser.parse_query("title:quark and year:2000"))
+        second, params = self.compiler.compile(
+            self.parser.parse_query("title:gluon and year:2001"))
+        assert first is second
+        assert params == ['%gluon%', '%2001%']
+
+    def test_sqlite(self):
+        import sqlite3
+        db = sqlite3.connect(':memory:')
+        db.create_function('REGEXP', 2, sql_compiler.sqlite_regexp)
+        db.execute('CREATE TABLE records (title, author, year)')
+        db.execute('CREATE VIRTUAL TABLE records_fts USING fts5(title)')
+        for rowid, title, author, year in (
+                (1, 'Quark matter', 'Ellis, J', '2001'),
+                (2, 'Gluon plasma', 'Smith, A', '1999')):
+            db.execute('INSERT INTO records VALUES (?, ?, ?)',
+                       (title, author, year))
+            db.execute('INSERT INTO records_fts(rowid, title) VALUES (?, ?)',
+                       (rowid, title))
+        where, params = self.compiler.compile(self.parser.parse_query(
+            "plasma or (author:/^Ell/ and year:2000->2012)"))
+        rows = db.execute('SELECT rowid FROM records WHERE ' + where +
+                          ' ORDER BY rowid', params)
+        assert [row[0] for row in rows] == [1, 2]
+
+
+RECORDS = (
+    {'title': 'Quark matter', 'author': ['Ellis, J'], 'year': 2001},
+    {'title': 'Gluon plasma', 'author': ['Smith, A', 'Ellis, R'],
+     'year': '1999', 'authors': [{'full_name': 'Smith, A'}]},
+    {'title': 'Higgs boson searches', 'author': 'Okada, H', 'year': '2012'},
+)
+
+
+def generate_predicate_test(query, expected):
+    def func(self):
+        tree = self.parser.parse_query(query)
+        match = predicate.compile_predicate(tree)
+        assert [i for i, r in enumerate(RECORDS) if match(r)] == expected
+    return func
+
+
+@generate_tests(generate_predicate_test)  # pylint: disable=R0903
+class TestPredicateCompiler(object):
+
+    """Test compilation to record predicates."""
+
+    @classmethod
+    def setup_class(cls):
+        cls.parser = converter.SpiresToInvenioSyntaxConverter()
+
+    queries = (
+        ("title:quark", [0]),
+        ("title:QUARK and not author:smith", [0]),
+        ("author:\"Ellis, R\"", [1]),
+        ("author:'ellis'", [0, 1]),
+        ("title:/^G.*a$/ or year:2012", [1, 2]),
+        ("year:1999->2005", [0, 1]),
+        ("title:bo* or higgs", [2]),
+        ("gluon or matter", [0, 1]),
+        ("title:(quark or not gluon)", [0, 2]),
+        ("title:(plasma author:smith)", [1]),
+        ("title:-", []),
+        ("", [0, 1, 2]),
+    )
+
+    def test_dotted_keyword(self):
+        tree = KeywordOp(Keyword('authors.full_name'), Value('smith'))
+        match = predicate.compile_predicate(tree)
+        assert [i for i, r in enumerate(RECORDS) if match(r)] == [1]
+
+    def test_cached_on_tree(self):
+        tree = self.parser.parse_query("title:quark")
+        assert predicate.compile_predicate(tree) is \
+            predicate.compile_predicate(tree)
+
+    def test_unsupported(self):
+        import pytest
+        for tree in (self.parser.parse_query("find a ellis"),
+                     self.parser.parse_query("title:/[/"),
+                     MalformedQuery(['quark', ')'])):
+            with pytest.raises(sql_compiler.UnsupportedQueryError):
+                predicate.compile_predicate(tree)
+        tree = self.parser.parse_query("find a ellis, r")
+        match = predicate.compile_predicate(self.parser.to_invenio(tree))
+        assert [i for i, r in enumerate(RECORDS) if match(r)] == [1]
+
+    def test_custom_compiler_not_cached(self):
+        class Everything(predicate.PredicateCompiler):
+            def compile(self, tree):
+                return lambda record: True
+
+        tree = self.parser.parse_query("title:quark")
+        assert not predicate.compile_predicate(tree)(RECORDS[1])
+        assert predicate.compile_predicate(tree, Everything())(RECORDS[1])
+
+
+@generate_tests(generate_walker_test)  # pylint: disable=R0903
+class TestJsonTree(object):
+
+    """Test conversion to JSON trees."""
+
+    @classmethod
+    def setup_class(cls):
+        cls.walker = json_tree.JsonTree
+        cls.parser = converter.SpiresToInvenioSyntaxConverter()
+
+    queries = (
+        ("author:ellis",
+         {'type': 'KeywordOp',
+          'left': {'type': 'Keyword', 'value': 'author'},
+          'right': {'type': 'Value', 'value': 'ellis'}}),
+        ("find t quark and not year > 2000",
+         {'type': 'AndOp',
+          'left': {'type': 'SpiresOp',
+                   'left': {'type': 'Keyword', 'value': 't'},
+                   'right': {'type': 'Value', 'value': 'quark'}},
+          'right': {'type': 'NotOp',
+                    'op': {'type': 'SpiresOp',
+                           'left': {'type': 'Keyword', 'value': 'year'},
+                           'right': {'type': 'GreaterOp',
+                                     'op': {'type': 'Value',
+                                            'value': '2000'}}}}}),
+        ("'higgs' or /^b.*$/",
+         {'type': 'OrOp',
+          'left': {'type': 'ValueQuery',
+                   'op': {'type': 'SingleQuotedValue', 'value': 'higgs'}},
+          'right': {'type': 'ValueQuery',
+                    'op': {'type': 'RegexValue', 'value': '^b.*$'}}}),
+        ("", {'type': 'EmptyQuery', 'value': ''}),
     )